@@ -0,0 +1,161 @@
+"""
+תשתית לוגים: מזהה בקשה, דגימה, השחרת נתונים עסקיים, פורמט JSON
+ו-handler שמעביר את הכתיבה לדיסק ל-thread נפרד דרך תור
+"""
+import atexit
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from logging.config import ConvertingList
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue
+
+request_id_var = ContextVar('request_id', default='-')
+
+# שדות LogRecord סטנדרטיים - כל שדה אחר הגיע מ-extra
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+def get_request_id():
+    return request_id_var.get()
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED_ATTRS}
+
+
+class RequestIdFilter(logging.Filter):
+    """הוספת מזהה הבקשה הנוכחית לכל רשומה"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    דגימת אירועים רועשים: רשומות מתחת לרמה `level` עוברות בהסתברות
+    `rate`, ולכל הודעה (לפי logger ותבנית) לכל היותר `per_second` בשנייה
+    """
+
+    def __init__(self, level='DEBUG', rate=1.0, per_second=20):
+        super().__init__()
+        self.level = logging._checkLevel(level)
+        self.rate = float(rate)
+        self.per_second = int(per_second)
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        if self.rate < 1.0 and random.random() >= self.rate:
+            return False
+        key = (record.name, record.msg)
+        second = int(time.monotonic())
+        with self._lock:
+            window, count = self._windows.get(key, (second, 0))
+            if window != second:
+                window, count = second, 0
+            if count >= self.per_second:
+                return False
+            self._windows[key] = (window, count + 1)
+        return True
+
+
+class RedactingFilter(logging.Filter):
+    """
+    השחרת נתונים עסקיים: שדות extra רגישים מוחלפים בגיבוב קצר (כך שעדיין
+    אפשר לקשר בין רשומות), ומפתחות API מוסרים מההודעה המלאה (כולל
+    הארגומנטים שלה) ומטקסט החריגה
+    """
+
+    SECRET_PATTERNS = [
+        re.compile(r'(Bearer\s+)[A-Za-z0-9._\-]+'),
+        re.compile(r'(pplx-)[A-Za-z0-9]+'),
+    ]
+
+    def __init__(self, fields=()):
+        super().__init__()
+        self.fields = set(fields)
+
+    @staticmethod
+    def _digest(value):
+        return 'h:' + hashlib.sha256(str(value).encode('utf-8')).hexdigest()[:10]
+
+    @classmethod
+    def scrub(cls, text):
+        for pattern in cls.SECRET_PATTERNS:
+            text = pattern.sub(r'\1[REDACTED]', text)
+        return text
+
+    def filter(self, record):
+        for field in self.fields & set(vars(record)):
+            setattr(record, field, self._digest(getattr(record, field)))
+        try:
+            message = record.getMessage()
+        except Exception:
+            # תבנית שלא מתאימה לארגומנטים - ה-handler ידווח עליה
+            return True
+        redacted = self.scrub(message)
+        if redacted != message:
+            record.msg, record.args = redacted, ()
+        if record.exc_info and not record.exc_text:
+            # ה-formatters משתמשים ב-exc_text אם כבר קיים
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = self.scrub(record.exc_text)
+        if record.stack_info:
+            record.stack_info = self.scrub(record.stack_info)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """פורמט JSON בשורה אחת, כולל שדות extra"""
+
+    def format(self, record):
+        payload = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        payload.update(_extra_fields(record))
+        if record.exc_info:
+            payload['exc_info'] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _resolve_handlers(handlers):
+    # dictConfig מעביר ConvertingList; גישה לפי אינדקס מחזירה את ה-handler שכבר הוגדר
+    if not isinstance(handlers, ConvertingList):
+        return handlers
+    return [handlers[i] for i in range(len(handlers))]
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Handler שמכניס רשומות לתור בלבד; QueueListener ב-thread רקע כותב
+    אותן ל-handlers האמיתיים (קובץ, קונסולה), כך ש-thread הבקשה לא ממתין לדיסק
+    """
+
+    def __init__(self, handlers, respect_handler_level=True, queue_size=10000):
+        super().__init__(Queue(queue_size))
+        self.listener = QueueListener(
+            self.queue, *_resolve_handlers(handlers), respect_handler_level=respect_handler_level
+        )
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        # תור מלא - מוותרים על הרשומה במקום לחסום את הבקשה
+        try:
+            self.queue.put_nowait(record)
+        except Exception:
+            pass
@@ -0,0 +1,109 @@
+"""
+Middleware ברמת הפרויקט
+"""
+import logging
+import random
+import re
+import uuid
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from . import profiling
+from .logging_utils import request_id_var
+
+logger = logging.getLogger(__name__)
+
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9\-_.]{8,64}$')
+
+
+class RequestIdMiddleware:
+    """
+    מזהה מתאם (correlation ID) לכל בקשה: נלקח מכותרת X-Request-ID אם היא
+    תקינה או נוצר חדש, זמין ללוגים דרך contextvar ומוחזר בתגובה
+    """
+
+    header = 'HTTP_X_REQUEST_ID'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        incoming = request.META.get(self.header, '')
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        request.request_id = request_id
+        token = request_id_var.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    פרופיילינג של בקשות לפי דרישה: משתמש צוות ששולח כותרת X-Profile: 1 או
+    פרמטר ?_profile=1, או דגימה אקראית בהסתברות PROFILE_SAMPLE_RATE.
+    הפרופיל נשמר לפי מזהה הבקשה ומוצג באדמין. תגובות בזרימה נמדדות עד
+    תחילת הזרימה בלבד.
+
+    חייב לבוא אחרי AuthenticationMiddleware.
+    """
+
+    header = 'HTTP_X_PROFILE'
+    query_flag = '_profile'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def trigger(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            if request.META.get(self.header) == '1':
+                return 'header'
+            if request.GET.get(self.query_flag) == '1':
+                return 'query'
+        rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+        if rate and random.random() < rate and not request.path.startswith(settings.STATIC_URL):
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        try:
+            response, stats, queries, duration_ms = profiling.profile_call(self.get_response, request)
+        except profiling.ProfilerBusy:
+            return self.get_response(request)
+
+        request_id = getattr(request, 'request_id', '') or uuid.uuid4().hex
+        try:
+            self.store(request, response, request_id, trigger, stats, queries, duration_ms)
+        except DatabaseError:
+            logger.warning("Failed to store request profile", exc_info=True)
+        else:
+            response['X-Profile-ID'] = request_id
+        return response
+
+    def store(self, request, response, request_id, trigger, stats, queries, duration_ms):
+        from questionnaire.models import RequestProfile
+
+        profile = RequestProfile.objects.create(
+            request_id=request_id,
+            method=request.method,
+            path=request.get_full_path()[:500],
+            status_code=response.status_code,
+            trigger=trigger,
+            duration_ms=round(duration_ms, 3),
+            sql_count=len(queries.queries),
+            sql_ms=round(queries.total_ms, 3),
+            profile=profiling.summarize(stats),
+            queries=queries.summary(),
+        )
+        max_stored = getattr(settings, 'PROFILE_MAX_STORED', 500)
+        RequestProfile.objects.filter(pk__lte=profile.pk - max_stored).delete()
+        logger.info("Request profiled", extra={
+            'path': request.path, 'duration_ms': profile.duration_ms, 'sql_count': profile.sql_count,
+        })
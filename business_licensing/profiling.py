@@ -0,0 +1,184 @@
+"""
+פרופיילינג לפי דרישה של בקשה בודדת: cProfile ושאילתות SQL
+
+הפרופיל נשמר כסיכום קומפקטי: הפונקציות הכבדות (לפי זמן מצטבר), הקשתות
+קורא -> נקרא ביניהן ושאילתות ה-SQL מקובצות לפי הטקסט שלהן. מהקשתות נבנים
+עץ הקריאות ותצוגת ה-flame באדמין.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+MAX_FUNCTIONS = 300
+MAX_QUERIES = 50
+MIN_TREE_FRACTION = 0.01
+MAX_TREE_DEPTH = 30
+
+
+class ProfilerBusy(Exception):
+    """כבר פועל profiler אחר בתהליך (Python 3.12 ומעלה)"""
+
+
+class QueryLog:
+    """execute_wrapper שרושם כל שאילתה וזמן הריצה שלה"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - start) * 1000))
+
+    def summary(self, limit=MAX_QUERIES):
+        """שאילתות מקובצות לפי הטקסט (פרמטרים לא נכללים) - חושף N+1"""
+        groups = {}
+        for sql, ms in self.queries:
+            group = groups.setdefault(sql, {'sql': sql, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            group['count'] += 1
+            group['total_ms'] += ms
+            group['max_ms'] = max(group['max_ms'], ms)
+        ranked = sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)[:limit]
+        for group in ranked:
+            group['total_ms'] = round(group['total_ms'], 3)
+            group['max_ms'] = round(group['max_ms'], 3)
+        return ranked
+
+    @property
+    def total_ms(self):
+        return sum(ms for _, ms in self.queries)
+
+
+def profile_call(func, *args, **kwargs):
+    """
+    הרצת func תחת cProfile ורישום שאילתות בכל מסדי הנתונים
+
+    Returns:
+        (תוצאת func, pstats.Stats, QueryLog, משך במילישניות)
+    """
+    profiler = cProfile.Profile()
+    queries = QueryLog()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        raise ProfilerBusy(str(e)) from e
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(queries))
+            result = func(*args, **kwargs)
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        profiler.disable()
+    return result, pstats.Stats(profiler), queries, duration_ms
+
+
+def _short_path(filename):
+    for prefix in sorted({str(settings.BASE_DIR), *sys.path}, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        # פונקציות מובנות: "<built-in method ...>"
+        return name
+    return f"{_short_path(filename)}:{line}({name})"
+
+
+def summarize(stats, limit=MAX_FUNCTIONS):
+    """
+    הפונקציות הכבדות והקשתות ביניהן בפורמט JSON
+
+    Returns:
+        {'total': שניות, 'functions': [{id, label, calls, tottime, cumtime}],
+         'edges': [[מזהה קורא, מזהה נקרא, קריאות, זמן מצטבר]]}
+    """
+    entries = stats.stats
+    kept = sorted(entries, key=lambda func: entries[func][3], reverse=True)[:limit]
+    ids = {func: index for index, func in enumerate(kept)}
+    functions = [
+        {
+            'id': ids[func],
+            'label': function_label(func),
+            'calls': entries[func][1],
+            'tottime': round(entries[func][2], 6),
+            'cumtime': round(entries[func][3], 6),
+        }
+        for func in kept
+    ]
+    edges = []
+    for callee in kept:
+        for caller, (_, calls, _, cumtime) in entries[callee][4].items():
+            if caller in ids:
+                edges.append([ids[caller], ids[callee], calls, round(cumtime, 6)])
+    return {'total': round(stats.total_tt, 6), 'functions': functions, 'edges': edges}
+
+
+def call_tree(summary, min_fraction=MIN_TREE_FRACTION, max_depth=MAX_TREE_DEPTH):
+    """
+    עץ קריאות מהסיכום: צמתים {label, time, calls, children}. הזמן של צומת
+    הוא הזמן המצטבר של הקשת מההורה; ענפים קטנים מ-min_fraction מהסך מושמטים.
+    """
+    functions = {function['id']: function for function in summary['functions']}
+    children, has_caller = {}, set()
+    for caller, callee, calls, cumtime in summary['edges']:
+        if caller != callee:
+            children.setdefault(caller, []).append((callee, calls, cumtime))
+            has_caller.add(callee)
+    total = max((function['cumtime'] for function in functions.values()), default=0) or summary['total']
+    threshold = total * min_fraction
+
+    def build(function_id, time_spent, calls, path, depth):
+        node = {'label': functions[function_id]['label'], 'time': time_spent, 'calls': calls, 'children': []}
+        if depth >= max_depth:
+            return node
+        for callee, edge_calls, cumtime in sorted(children.get(function_id, ()), key=lambda edge: -edge[2]):
+            if cumtime < threshold or callee in path:
+                continue
+            node['children'].append(build(callee, cumtime, edge_calls, path | {callee}, depth + 1))
+        return node
+
+    roots = [
+        function for function in functions.values()
+        if function['id'] not in has_caller and function['cumtime'] >= threshold
+    ]
+    if not roots and functions:
+        # רקורסיה (שרשרת ה-middleware) משאירה לכל פונקציה קורא - מתחילים מהכבדה ביותר
+        roots = [max(functions.values(), key=lambda function: function['cumtime'])]
+    roots.sort(key=lambda function: -function['cumtime'])
+    return [build(root['id'], root['cumtime'], root['calls'], {root['id']}, 0) for root in roots]
+
+
+def flame_rows(tree):
+    """
+    פריסת העץ לתצוגת flame: רשימת (עומק, תווית, התחלה, רוחב) כשבר מהסך.
+    ילדים מסודרים משמאל לימין בתוך הטווח של ההורה.
+    """
+    total = sum(root['time'] for root in tree) or 1
+    rows = []
+
+    def place(node, depth, start):
+        width = node['time'] / total
+        rows.append((depth, node['label'], start, width))
+        offset = start
+        for child in node['children']:
+            place(child, depth + 1, offset)
+            offset += child['time'] / total
+
+    offset = 0.0
+    for root in tree:
+        place(root, 0, offset)
+        offset += root['time'] / total
+    return rows
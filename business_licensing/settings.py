@@ -2,6 +2,7 @@
 Django settings for business_licensing project.
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -33,12 +34,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'business_licensing.middleware.RequestIdMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'business_licensing.middleware.ProfilingMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -70,8 +73,18 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Cold storage for assessments older than ARCHIVE_RETENTION_DAYS, filled by
+    # `manage.py archive_assessments`. Create it once with
+    # `manage.py migrate --database archive`.
+    'archive': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'archive.sqlite3',
+    },
 }
+DATABASE_ROUTERS = ['questionnaire.routers.ArchiveRouter']
+ARCHIVE_RETENTION_DAYS = 365
+ARCHIVE_BATCH_SIZE = 200
 
 
 # Password validation
@@ -111,48 +124,144 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# Rendered report exports (DOCX), stored under the report id and content hash.
+# Only the newest REPORT_EXPORT_KEEP versions of each report are kept.
+REPORT_EXPORT_DIR = BASE_DIR / 'exports'
+REPORT_EXPORT_KEEP = 3
+
+# BM25 retrieval index over the requirements corpus (build_retrieval_index)
+RETRIEVAL_INDEX_DIR = BASE_DIR / 'indexes'
+RETRIEVAL_TOP_K = 8
+RETRIEVAL_TOKEN_BUDGET = 1200
+
+# Admission control for outbound LLM calls. The concurrency cap is shared by
+# all worker processes through lock files; rate buckets live in the database.
+LLM_MAX_CONCURRENCY = 4
+LLM_QUEUE_LIMIT = 8
+LLM_RATE_PER_MINUTE = 50
+LLM_SLOT_TIMEOUT = 60
+LLM_LOCK_DIR = BASE_DIR / 'run' / 'llm-slots'
+SUBMISSIONS_PER_CLIENT_PER_MINUTE = 5
+
+# LLM backends in routing order. When the primary is slower than its own
+# LLM_HEDGE_PERCENTILE latency, a duplicate request goes to the next backend
+# and the first good answer wins. Example secondary (OpenAI-compatible server):
+#   {'kind': 'openai', 'name': 'local', 'model': 'llama3',
+#    'base_url': 'http://localhost:8080/v1/chat/completions'}
+LLM_BACKENDS = [
+    {'kind': 'perplexity', 'name': 'perplexity', 'api_key_env': 'PERPLEXITY_API_KEY'},
+]
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_DEFAULT_DELAY = 5.0
+
+# Set to a path to append every successful LLM exchange (messages, response,
+# latency, usage) as JSONL. Recordings can be served back offline with:
+#   {'kind': 'replay', 'path': BASE_DIR / 'recordings' / 'llm.jsonl', 'latency': 'sampled'}
+LLM_RECORD_PATH = None
+
+# Identical submissions in flight share one LLM call through a lease row.
+# Waiters give up and call the LLM themselves after SINGLE_FLIGHT_WAIT_SECONDS;
+# a lease older than SINGLE_FLIGHT_LEASE_SECONDS is taken over (crashed worker).
+SINGLE_FLIGHT_LEASE_SECONDS = 180
+SINGLE_FLIGHT_WAIT_SECONDS = 150
+SINGLE_FLIGHT_RESULT_SECONDS = 60
+
+# Business types and aliases are resolved from an in-process table. Changes in
+# other processes bump a version stamp that is checked at most every
+# BUSINESS_TYPE_STAMP_SECONDS; the table is reloaded after
+# BUSINESS_TYPE_CACHE_SECONDS regardless.
+BUSINESS_TYPE_CACHE_SECONDS = 300
+BUSINESS_TYPE_STAMP_SECONDS = 2
+
+# Unfiltered admin changelists of large tables show a row count that is
+# refreshed at most this often (PostgreSQL uses the planner estimate instead).
+ADMIN_COUNT_CACHE_SECONDS = 60
+
+# The report's size compliance check warns when the business is within this
+# fraction of a requirement's area/capacity limit (at least one unit).
+COMPLIANCE_NEAR_FRACTION = 0.1
+
+# Request profiling (cProfile + SQL), viewable in the admin. Staff can profile
+# a single request with the X-Profile: 1 header or ?_profile=1; set a sample
+# rate (e.g. 0.01) to also profile a random share of all requests.
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_MAX_STORED = 500
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Logging configuration for AI operations
+# Records are filtered (request id, sampling, redaction) on the request thread
+# and handed to a QueueListener thread that does the actual file/console I/O.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'business_licensing.logging_utils.RequestIdFilter',
+        },
+        'sampling': {
+            '()': 'business_licensing.logging_utils.SamplingFilter',
+            'level': 'DEBUG',
+            'rate': 0.1,
+            'per_second': 20,
+        },
+        'redact': {
+            '()': 'business_licensing.logging_utils.RedactingFilter',
+            # the business profile logged with every submission
+            'fields': ['business_name', 'business_type', 'area_sqm', 'seating_capacity'],
+        },
+    },
     'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
+        'json': {
+            '()': 'business_licensing.logging_utils.JsonFormatter',
         },
         'simple': {
-            'format': '{levelname} {message}',
+            'format': '{levelname} [{request_id}] {message}',
             'style': '{',
         },
     },
     'handlers': {
-        'file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'django.log',
-            'formatter': 'verbose',
-        },
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
+        'file': {
+            'level': 'DEBUG',
+            'class': 'logging.FileHandler',
+            'filename': BASE_DIR / 'django.log',
+            'formatter': 'json',
+        },
+        'queue': {
+            '()': 'business_licensing.logging_utils.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'filters': ['request_id', 'sampling', 'redact'],
+        },
     },
     'loggers': {
-        'services.ai_service': {
-            'handlers': ['file', 'console'],
-            'level': 'INFO',
-            'propagate': True,
+        'services': {
+            'handlers': ['queue'],
+            'level': 'DEBUG' if DEBUG else 'INFO',
+            'propagate': False,
         },
-        'questionnaire.views': {
-            'handlers': ['file', 'console'],
-            'level': 'INFO',
-            'propagate': True,
+        'questionnaire': {
+            'handlers': ['queue'],
+            'level': 'DEBUG' if DEBUG else 'INFO',
+            'propagate': False,
+        },
+        'business_licensing': {
+            'handlers': ['queue'],
+            'level': 'DEBUG' if DEBUG else 'INFO',
+            'propagate': False,
         },
     },
-}
\ No newline at end of file
+}
+
+# The test run keeps the filters (tests exercise them) but writes nothing to
+# django.log or the console.
+if sys.argv[1:2] == ['test']:
+    LOGGING['handlers']['console'] = {'class': 'logging.NullHandler'}
+    LOGGING['handlers']['file'] = {'class': 'logging.NullHandler'}
@@ -0,0 +1,136 @@
+"""
+פענוח שדות העלות וזמן הטיפול של דרישה לטווחים מספריים
+
+"500-1000 ש"ח" -> (500, 1000), "עד 3,000 ₪" -> (0, 3000), "2-4 שבועות" ->
+(14, 28) ימים, "2 שבועות עד חודשיים" -> (14, 60). גבול שאינו ידוע
+("החל מ-500") נשאר None. טקסט שאין בו מספר מוכר מחזיר (None, None).
+"""
+import re
+
+DECIMAL = r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?'
+NUM = rf'({DECIMAL})'
+RANGE_SEP = r'\s*(?:[-–—]|עד|ל-?|to)\s*'
+UPPER_WORDS = r'(?:עד|לכל\s+היותר|מקסימום|לא\s+יותר\s+מ-?|up\s+to)'
+LOWER_WORDS = r'(?:החל\s+מ-?|לפחות|מעל|מינימום|from)'
+
+FREE_WORDS = ('חינם', 'ללא עלות', 'ללא תשלום', 'אין עלות', 'free')
+THOUSANDS_RE = re.compile(r'^\s*(?:אלף|אלפים|אלפי|k)\b', re.IGNORECASE)
+
+# יחידות זמן -> ימים
+DURATION_UNITS = [
+    (r'ימי\s+עבודה|ימים|יום|days?', 1),
+    (r'שבועות|שבוע|weeks?', 7),
+    (r'חודשים|חודש|months?', 30),
+    (r'שנים|שנה|years?', 365),
+]
+# צורות זוגיות: "שבועיים" = 2 שבועות
+DUAL_UNITS = {'יומיים': 2, 'שבועיים': 14, 'חודשיים': 60, 'שנתיים': 730}
+
+# יחידה היא מילה שלמה - "יום" שבתוך "סיום" או "שנה" שבתוך "לשנה" אינם זמן
+_WORD_START = r'(?<![^\W\d_])'
+_WORD_END = r'(?![^\W\d_])'
+_UNIT_PATTERN = _WORD_START + '(?:' + '|'.join(f'(?:{pattern})' for pattern, _ in DURATION_UNITS) + ')' + _WORD_END
+_DUAL_PATTERN = rf'{_WORD_START}(?:{"|".join(DUAL_UNITS)}){_WORD_END}'
+# כמות זמן: צורה זוגית, מספר עם יחידה או בלעדיה, או יחידה לבדה ("שבוע")
+_QUANTITY_RE = re.compile(
+    rf'(?P<dual>{_DUAL_PATTERN})|(?P<number>{DECIMAL})\s*(?P<unit>{_UNIT_PATTERN})?|(?P<bare>{_UNIT_PATTERN})',
+    re.IGNORECASE,
+)
+_SEPARATOR_RE = re.compile(RANGE_SEP, re.IGNORECASE)
+_UPPER_PREFIX_RE = re.compile(rf'{UPPER_WORDS}\s*$', re.IGNORECASE)
+_LOWER_PREFIX_RE = re.compile(rf'{LOWER_WORDS}\s*$', re.IGNORECASE)
+_RANGE_RE = re.compile(rf'{NUM}{RANGE_SEP}{NUM}')
+_NUMBER_RE = re.compile(NUM)
+_UPPER_RE = re.compile(rf'{UPPER_WORDS}\s*{NUM}', re.IGNORECASE)
+_LOWER_RE = re.compile(rf'{LOWER_WORDS}\s*{NUM}', re.IGNORECASE)
+
+
+def _number(text):
+    return float(text.replace(',', ''))
+
+
+def _bounds(text):
+    """(גבול תחתון, גבול עליון, המיקום שאחרי המספר האחרון) או None"""
+    match = _RANGE_RE.search(text)
+    if match:
+        low, high = sorted((_number(match.group(1)), _number(match.group(2))))
+        return low, high, match.end()
+    match = _UPPER_RE.search(text)
+    if match:
+        return 0.0, _number(match.group(1)), match.end()
+    match = _LOWER_RE.search(text)
+    if match:
+        return _number(match.group(1)), None, match.end()
+    match = _NUMBER_RE.search(text)
+    if match:
+        value = _number(match.group(1))
+        return value, value, match.end()
+    return None
+
+
+def _scale(low, high, factor):
+    return (
+        None if low is None else int(round(low * factor)),
+        None if high is None else int(round(high * factor)),
+    )
+
+
+def parse_cost(text):
+    """עלות בש"ח: (מינימום, מקסימום)"""
+    text = (text or '').strip()
+    if not text:
+        return None, None
+    if any(word in text.lower() for word in FREE_WORDS):
+        return 0, 0
+    bounds = _bounds(text)
+    if bounds is None:
+        return None, None
+    low, high, end = bounds
+    factor = 1000 if THOUSANDS_RE.match(text[end:]) else 1
+    return _scale(low, high, factor)
+
+
+def _unit_days(unit):
+    return next(days for pattern, days in DURATION_UNITS if re.fullmatch(pattern, unit, re.IGNORECASE))
+
+
+def _quantity(match):
+    """(כמות, ימים ליחידה או None אם היחידה לא צוינה)"""
+    if match.group('dual'):
+        return DUAL_UNITS[match.group('dual')], 1
+    if match.group('bare'):
+        return 1.0, _unit_days(match.group('bare'))
+    unit = match.group('unit')
+    return _number(match.group('number')), _unit_days(unit) if unit else None
+
+
+def parse_duration(text):
+    """
+    זמן טיפול בימים: (מינימום, מקסימום)
+
+    בטווח כל צד יכול להיות ביחידה אחרת ("2 שבועות עד חודשיים"); מספר בלי
+    יחידה מקבל את היחידה של הצד השני ("2-4 שבועות").
+    """
+    text = (text or '').strip()
+    first = _QUANTITY_RE.search(text)
+    if first is None:
+        return None, None
+    quantities = [_quantity(first)]
+    separator = _SEPARATOR_RE.match(text, first.end())
+    second = separator and _QUANTITY_RE.match(text, separator.end())
+    if second:
+        quantities.append(_quantity(second))
+
+    known = [days for _, days in quantities if days is not None]
+    if not known:
+        return None, None
+    values = [amount * (days if days is not None else known[-1]) for amount, days in quantities]
+    if len(values) == 2:
+        return _scale(min(values), max(values), 1)
+
+    prefix = text[:first.start()]
+    if _UPPER_PREFIX_RE.search(prefix):
+        return _scale(0.0, values[0], 1)
+    if _LOWER_PREFIX_RE.search(prefix):
+        return _scale(values[0], None, 1)
+    return _scale(values[0], values[0], 1)
@@ -0,0 +1,154 @@
+"""
+זיהוי פסקאות כמעט-זהות וצמצום המאגר בזמן הקליטה (MinHash + LSH)
+
+כל פסקה מיוצגת בחתימת MinHash על shingles של מילים. LSH מחלק את החתימה
+לפסים (bands), ורק פסקאות שחולקות פס זהה נבדקות זו מול זו - כך הזמן
+כמעט ליניארי במספר הפסקאות. פסקאות דומות מקובצות (union-find), ומכל
+קבוצה נשמרת שורה קנונית אחת עם הפניות לשאר.
+"""
+import hashlib
+import re
+from collections import defaultdict
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.8
+# מספר מקסימלי של השוואות לכל פס, כדי שפס עמוס לא יהפוך את המעבר לריבועי
+MAX_CANDIDATES_PER_BUCKET = 8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _permutations(count, seed=1):
+    """מקדמי a, b קבועים לפונקציות הגיבוב (דטרמיניסטיים בין הרצות)"""
+    params = []
+    for i in range(count):
+        digest = hashlib.sha256(f'{seed}:{i}'.encode()).digest()
+        a = int.from_bytes(digest[:8], 'big') % (_MERSENNE_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:16], 'big') % _MERSENNE_PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _permutations(NUM_PERM)
+
+
+def normalize(text):
+    """טקסט לצורך השוואה: מילים בלבד, ללא פיסוק ורווחים כפולים"""
+    return ' '.join(_WORD_RE.findall((text or '').lower()))
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """קבוצת רצפי מילים באורך size (או המילים עצמן בפסקה קצרה)"""
+    words = normalize(text).split()
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(shingle_set):
+    """חתימת MinHash באורך NUM_PERM"""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for shingle in shingle_set
+    ]
+    if not hashes:
+        return (_MAX_HASH,) * NUM_PERM
+    return tuple(
+        min(((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH for value in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(sig_a, sig_b):
+    """הערכת דמיון Jaccard משתי חתימות"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # השורש הוא תמיד המופע הראשון במסמך
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def cluster(texts, threshold=DEFAULT_THRESHOLD):
+    """
+    קיבוץ טקסטים כמעט-זהים
+
+    Returns:
+        רשימת קבוצות (רשימות אינדקסים), כל קבוצה ממוינת לפי סדר ההופעה
+    """
+    groups = _UnionFind(len(texts))
+    exact = {}
+    signatures = {}
+    buckets = defaultdict(list)
+
+    for index, text in enumerate(texts):
+        key = normalize(text)
+        # כפילות מדויקת - בלי לחשב חתימה
+        if key in exact:
+            groups.union(exact[key], index)
+            continue
+        exact[key] = index
+
+        signature = minhash(shingles(text))
+        signatures[index] = signature
+        for band in range(BANDS):
+            bucket = buckets[(band, signature[band * ROWS:(band + 1) * ROWS])]
+            for other in bucket[:MAX_CANDIDATES_PER_BUCKET]:
+                if groups.find(other) != groups.find(index) and \
+                        similarity(signature, signatures[other]) >= threshold:
+                    groups.union(other, index)
+            bucket.append(index)
+
+    clusters = defaultdict(list)
+    for index in range(len(texts)):
+        clusters[groups.find(index)].append(index)
+    return sorted(clusters.values(), key=lambda members: members[0])
+
+
+def compact_requirements(requirements, text_key='description', threshold=DEFAULT_THRESHOLD):
+    """
+    צמצום רשימת דרישות: שורה קנונית אחת לכל קבוצת פסקאות כמעט-זהות
+
+    השורה הקנונית היא הארוכה בקבוצה (המלאה ביותר), במיקום המופע הראשון.
+    לכל שורה נוספים source_index (מיקום הפסקה במסמך) ו-duplicate_indices
+    (מיקומי הפסקאות שאוחדו לתוכה, מופרדים ב-';').
+
+    Returns:
+        (רשימת דרישות מצומצמת, מילון סיכום עם compaction_ratio)
+    """
+    groups = cluster([req.get(text_key, '') for req in requirements], threshold)
+
+    compacted = []
+    for members in groups:
+        canonical = max(members, key=lambda index: len(requirements[index].get(text_key, '')))
+        row = dict(requirements[canonical])
+        row['source_index'] = canonical
+        row['duplicate_indices'] = ';'.join(str(index) for index in members if index != canonical)
+        compacted.append(row)
+
+    total = len(requirements)
+    summary = {
+        'input_rows': total,
+        'output_rows': len(compacted),
+        'merged_rows': total - len(compacted),
+        'clusters_with_duplicates': sum(1 for members in groups if len(members) > 1),
+        'compaction_ratio': round(total / len(compacted), 3) if compacted else 1.0,
+    }
+    return compacted, summary
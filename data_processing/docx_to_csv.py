@@ -8,6 +8,24 @@ import polars as pl
 from docx import Document
 import re
 
+try:
+    from .dedup import compact_requirements
+    from .thresholds import extract_thresholds, table_rows
+except ImportError:  # הרצה כסקריפט מתוך התיקייה
+    from dedup import compact_requirements
+    from thresholds import extract_thresholds, table_rows
+
+
+def size_columns(provenance):
+    """עמודות area/capacity_requirements: הקטעים שמהם חולצו הספים"""
+    return {
+        'area_requirements': '; '.join(span['text'] for span in provenance if span['field'].endswith('_area')),
+        'capacity_requirements': '; '.join(
+            span['text'] for span in provenance if span['field'].endswith('_capacity')
+        ),
+    }
+
+
 def extract_requirements_from_docx(docx_path):
     """חילוץ דרישות מקובץ Word"""
     
@@ -39,12 +57,27 @@ def extract_requirements_from_docx(docx_path):
                     'category': extract_category(text),
                     'priority': determine_priority(text),
                     'estimated_cost': '',
-                    'processing_time': ''
+                    'processing_time': '',
+                    **size_columns(extract_thresholds(text)[1]),
                 }
         
         # הוסף את הדרישה האחרונה
         if current_requirement.get('title'):
             requirements.append(current_requirement)
+        
+        # שורות טבלאות - ספי שטח ותפוסה לפי כותרות העמודות
+        for table in doc.tables:
+            for text, _, provenance in table_rows(table):
+                requirements.append({
+                    'title': text[:200],
+                    'description': text,
+                    'authority': extract_authority(text),
+                    'category': extract_category(text),
+                    'priority': determine_priority(text),
+                    'estimated_cost': '',
+                    'processing_time': '',
+                    **size_columns(provenance),
+                })
             
         print(f"Extracted {len(requirements)} requirements")
         return requirements
@@ -177,6 +210,14 @@ def main():
         print("No requirements extracted. Please check the input file.")
         return
     
+    # איחוד פסקאות כמעט-זהות
+    requirements, summary = compact_requirements(requirements)
+    print(
+        f"Near-duplicate pass: {summary['input_rows']} -> {summary['output_rows']} rows "
+        f"({summary['clusters_with_duplicates']} clusters merged, "
+        f"compaction ratio {summary['compaction_ratio']}x)"
+    )
+    
     # שמור ל-CSV
     if save_to_csv(requirements, csv_path):
         print("Conversion completed successfully!")
@@ -0,0 +1,156 @@
+"""
+קריאת מסמכי מקור של דרישות רישוי (DOCX, XLSX, CSV) לשורות אחידות
+
+הפונקציות כאן אינן תלויות ב-Django, כך שאפשר להריץ אותן בתהליכי עבודה
+נפרדים (process pool) בזמן הקליטה.
+"""
+import csv
+import hashlib
+from pathlib import Path
+
+try:
+    from .dedup import compact_requirements, normalize
+    from .thresholds import extract_thresholds
+    from .docx_to_csv import determine_priority, extract_authority, extract_requirements_from_docx
+except ImportError:  # הרצה כסקריפט מתוך התיקייה
+    from dedup import compact_requirements, normalize
+    from thresholds import extract_thresholds
+    from docx_to_csv import determine_priority, extract_authority, extract_requirements_from_docx
+
+SUPPORTED_SUFFIXES = {'.docx', '.xlsx', '.csv'}
+
+# שם עמודה במקור -> שדה בדרישה
+COLUMN_ALIASES = {
+    'title': 'title', 'כותרת': 'title',
+    'description': 'description', 'תיאור': 'description',
+    'authority': 'authority', 'רשות': 'authority', 'רשות מוסמכת': 'authority',
+    'category': 'category', 'קטגוריה': 'category',
+    'priority': 'priority', 'עדיפות': 'priority',
+    'estimated_cost': 'estimated_cost', 'cost_estimate': 'estimated_cost', 'עלות': 'estimated_cost',
+    'processing_time': 'processing_time', 'זמן טיפול': 'processing_time', 'זמן': 'processing_time',
+    'area_requirements': 'area_requirements', 'דרישות שטח': 'area_requirements', 'שטח': 'area_requirements',
+    'capacity_requirements': 'capacity_requirements', 'דרישות תפוסה': 'capacity_requirements',
+    'תפוסה': 'capacity_requirements',
+}
+SIZE_FIELDS = ['min_area', 'max_area', 'min_capacity', 'max_capacity']
+
+# קטגוריות שמחלץ docx_to_csv -> קטגוריות המודל
+CATEGORY_MAP = {
+    'בריאות ותברואה': 'health',
+    'בטיחות אש': 'safety',
+    'בטיחות גז': 'safety',
+    'רישיון אלכוהול': 'bar',
+    'תכנון ובנייה': 'municipal',
+    'מיסוי': 'municipal',
+    'רישיון עסק': 'municipal',
+}
+CATEGORIES = {'restaurant', 'bar', 'health', 'safety', 'municipal', 'general'}
+PRIORITIES = {'high', 'medium', 'low'}
+
+FIELD_LIMITS = {'title': 300, 'authority': 200, 'estimated_cost': 100, 'processing_time': 100}
+
+
+def file_hash(path):
+    """גיבוב SHA-256 של תוכן הקובץ"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _rows_from_table(header, rows):
+    fields = [COLUMN_ALIASES.get(str(name or '').strip().lower()) for name in header]
+    for values in rows:
+        row = {}
+        for field, value in zip(fields, values):
+            if field and value not in (None, ''):
+                row[field] = str(value).strip()
+        if row.get('description') or row.get('title'):
+            yield row
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        return list(_rows_from_table(header, reader))
+
+
+def read_xlsx(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = []
+        for sheet in workbook.worksheets:
+            values = sheet.iter_rows(values_only=True)
+            header = next(values, None)
+            if header:
+                rows.extend(_rows_from_table(header, values))
+        return rows
+    finally:
+        workbook.close()
+
+
+def read_docx(path):
+    return extract_requirements_from_docx(str(path))
+
+
+READERS = {'.docx': read_docx, '.xlsx': read_xlsx, '.csv': read_csv}
+
+
+def clean_row(row):
+    """השלמת שדות חסרים והתאמה לערכים ולאורכים של המודל"""
+    description = row.get('description') or row.get('title', '')
+    cleaned = {
+        'title': row.get('title') or description[:200],
+        'description': description,
+        'authority': row.get('authority') or extract_authority(description),
+        'category': CATEGORY_MAP.get(row.get('category'), row.get('category')),
+        'priority': (row.get('priority') or determine_priority(description)).lower(),
+        'estimated_cost': row.get('estimated_cost', ''),
+        'processing_time': row.get('processing_time', ''),
+    }
+    if cleaned['category'] not in CATEGORIES:
+        cleaned['category'] = 'general'
+    if cleaned['priority'] not in PRIORITIES:
+        cleaned['priority'] = 'medium'
+    if cleaned['authority'] == 'לא צוין':
+        cleaned['authority'] = ''
+    for field, limit in FIELD_LIMITS.items():
+        cleaned[field] = cleaned[field][:limit]
+
+    thresholds, provenance = extract_thresholds(
+        description, row.get('area_requirements', ''), row.get('capacity_requirements', '')
+    )
+    for field in SIZE_FIELDS:
+        cleaned[field] = thresholds.get(field)
+    cleaned['size_provenance'] = provenance
+    return cleaned
+
+
+def source_key(row):
+    """מפתח יציב לשורה בתוך הקובץ - גיבוב הטקסט המנורמל"""
+    return hashlib.sha1(normalize(row['description']).encode('utf-8')).hexdigest()
+
+
+def load_source(path):
+    """
+    קריאת קובץ מקור, ניקוי, איחוד כפילויות וחישוב מפתחות
+
+    Returns:
+        (גיבוב הקובץ, רשימת שורות עם source_key, סיכום איחוד הכפילויות)
+    """
+    path = Path(path)
+    content_hash = file_hash(path)
+    rows = [clean_row(row) for row in READERS[path.suffix.lower()](path)]
+    rows, summary = compact_requirements(rows)
+    unique = {}
+    for row in rows:
+        row.pop('source_index', None)
+        row.pop('duplicate_indices', None)
+        unique.setdefault(source_key(row), row)
+    for key, row in unique.items():
+        row['source_key'] = key
+    return content_hash, list(unique.values()), summary
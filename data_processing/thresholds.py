@@ -0,0 +1,230 @@
+"""
+חילוץ ספי שטח ותפוסה מטקסט התקנות ומטבלאות
+
+מזהה ביטויים כמו "מעל 100 מ"ר", "עד 50 מקומות ישיבה", "בין 50 ל-200 מ"ר"
+ו-"300 מ"ר ומעלה", וממיר אותם לשדות min_area / max_area / min_capacity /
+max_capacity. לכל ערך נשמר מקור (provenance): המיקום בטקסט והקטע שממנו נלקח.
+"""
+import re
+
+AREA = 'area'
+CAPACITY = 'capacity'
+
+
+def _num(group=''):
+    """מספר שלם ולא חלק ממספר אחר - "סעיף 3.2" אינו מתחיל טווח מ-2"""
+    return rf'(?<![\d.,])({group}\d{{1,3}}(?:,\d{{3}})+|\d+)(?!\d|[.,]\d)'
+
+
+NUM = _num()
+LOW, HIGH = _num('?P<low>'), _num('?P<high>')
+
+# יחידות שטח בלבד - "מטר" לבדו הוא מידת אורך (מרחק, גובה) ואינו סף שטח
+AREA_UNIT = r'(?:מ["״\']{1,2}ר|מטר(?:ים)?\s+רבוע(?:ים)?|מ2|מ²|sqm)'
+CAPACITY_UNIT = r'(?:מקומות ישיבה|מקומות|סועדים|איש|אנשים|משתתפים|מבקרים)'
+# היחידה היא מילה שלמה - "איש" אינו תחילת "אישור"
+_WORD_END = r'(?![^\W\d_])'
+UNIT = rf'(?:(?P<area>{AREA_UNIT})|(?P<capacity>{CAPACITY_UNIT})){_WORD_END}'
+ANY_UNIT = rf'(?:{AREA_UNIT}|{CAPACITY_UNIT}){_WORD_END}'
+
+# אופרטור לפני המספר -> (גבול, תיקון לגבול חזק)
+PREFIX_OPERATORS = [
+    (r'מעל\s*ל?-?|יותר\s+מ-?|למעלה\s+מ-?|העולה\s+על|עולה\s+על', 'min', 1),
+    (r'לפחות|מינימום|החל\s+מ-?|לא\s+פחות\s+מ-?', 'min', 0),
+    (r'פחות\s+מ-?|מתחת\s+ל-?', 'max', -1),
+    (r'עד|לא\s+יותר\s+מ-?|מקסימום|שאינו\s+עולה\s+על|שלא\s+עולה\s+על|לכל\s+היותר', 'max', 0),
+]
+SUFFIX_OPERATORS = [
+    (r'ומעלה|או\s+יותר', 'min', 0),
+    (r'ומטה|או\s+פחות|לכל\s+היותר', 'max', 0),
+]
+
+_PREFIX_RE = re.compile(
+    '|'.join(f'(?P<op{i}>{pattern})' for i, (pattern, _, _) in enumerate(PREFIX_OPERATORS))
+)
+_PREFIXED = re.compile(rf'(?:{_PREFIX_RE.pattern})\s*{NUM}\s*{UNIT}')
+_SUFFIXED = re.compile(
+    rf'{NUM}\s*{UNIT}\s*(?:' + '|'.join(f'(?P<post{i}>{pattern})' for i, (pattern, _, _) in enumerate(SUFFIX_OPERATORS)) + ')'
+)
+# טווח רק בצורה "בין X ל-Y <יחידה>" או עם יחידה בשני הצדדים ("50 מ"ר עד
+# 200 מ"ר") - "תקנה 12 עד 100 איש" או "בשעות 8 עד 22" אינם טווחים
+_RANGE = re.compile(rf'בין\s+{LOW}\s*(?:[-–]|ו?עד|ול?-?|ל-?)\s*{HIGH}\s*{UNIT}')
+_UNIT_RANGE = re.compile(rf'{LOW}\s*(?P<first_unit>{ANY_UNIT})\s*(?:[-–]|ו?עד)\s*{HIGH}\s*{UNIT}')
+_BARE_PREFIXED = re.compile(rf'(?:{_PREFIX_RE.pattern})\s*{NUM}')
+# מספר בודד - לא צד אחד של טווח ללא יחידה ("50-200")
+_BARE_NUMBER = re.compile(rf'^\s*{NUM}(?!\s*(?:[-–]|עד|ל-?)\s*\d)')
+
+# מילים בכותרת עמודה שמעידות על המימד
+AREA_HEADERS = ('שטח', 'מ"ר', 'מ״ר', 'area')
+CAPACITY_HEADERS = ('תפוסה', 'מקומות', 'ישיבה', 'סועדים', 'capacity', 'seats')
+
+
+def _number(text):
+    return int(text.replace(',', ''))
+
+
+def _operator(match, operators, prefix):
+    for i, (_, bound, adjust) in enumerate(operators):
+        if match.group(f'{prefix}{i}'):
+            return bound, adjust
+    return None, 0
+
+
+def _dimension(match):
+    return AREA if match.group('area') else CAPACITY
+
+
+def _unit_dimension(unit):
+    return AREA if re.fullmatch(AREA_UNIT, unit) else CAPACITY
+
+
+def find_spans(text, offset=0, dimension=None):
+    """
+    כל ביטויי הסף בטקסט
+
+    Args:
+        dimension: אם ידוע (למשל מכותרת עמודה), מספרים ללא יחידה מתפרשים לפיו
+    Returns:
+        רשימת מילונים: field, value, start, end, text
+    """
+    text = text or ''
+    spans = []
+
+    def add(dimension_name, bound, value, match):
+        spans.append({
+            'field': f'{bound}_{dimension_name}',
+            'value': value,
+            'start': offset + match.start(),
+            'end': offset + match.end(),
+            'text': match.group(0).strip(),
+        })
+
+    taken = []
+
+    def free(match):
+        return not any(match.start() < end and start < match.end() for start, end in taken)
+
+    for match in (*_RANGE.finditer(text), *_UNIT_RANGE.finditer(text)):
+        low, high = _number(match.group('low')), _number(match.group('high'))
+        if not free(match) or low > high:
+            continue
+        first_unit = match.groupdict().get('first_unit')
+        if first_unit and _unit_dimension(first_unit) != _dimension(match):
+            continue
+        add(_dimension(match), 'min', low, match)
+        add(_dimension(match), 'max', high, match)
+        taken.append(match.span())
+    for match in _PREFIXED.finditer(text):
+        if free(match):
+            bound, adjust = _operator(match, PREFIX_OPERATORS, 'op')
+            value = _number(match.group(len(PREFIX_OPERATORS) + 1))
+            add(_dimension(match), bound, value + adjust, match)
+            taken.append(match.span())
+    for match in _SUFFIXED.finditer(text):
+        if free(match):
+            bound, adjust = _operator(match, SUFFIX_OPERATORS, 'post')
+            add(_dimension(match), bound, _number(match.group(1)) + adjust, match)
+            taken.append(match.span())
+
+    if dimension and not spans:
+        # תא בטבלה או עמודה ייעודית: היחידה ידועה מהכותרת
+        match = _BARE_PREFIXED.search(text)
+        if match:
+            bound, adjust = _operator(match, PREFIX_OPERATORS, 'op')
+            add(dimension, bound, _number(match.group(len(PREFIX_OPERATORS) + 1)) + adjust, match)
+            return spans
+        match = _BARE_NUMBER.search(text)
+        if match:
+            # מספר בודד בעמודת סף - הסף שממנו הדרישה חלה
+            add(dimension, 'min', _number(match.group(1)), match)
+    return spans
+
+
+def thresholds_from_spans(spans):
+    """
+    צמצום הביטויים לערך אחד לכל שדה: הגבול המחמיר ביותר.
+    מימד שבו המינימום גדול מהמקסימום (טקסט שמתאר כמה מקרים) נשמט.
+    """
+    values = {}
+    for span in spans:
+        field, value = span['field'], span['value']
+        if field not in values:
+            values[field] = value
+        elif field.startswith('min'):
+            values[field] = max(values[field], value)
+        else:
+            values[field] = min(values[field], value)
+
+    for dimension_name in (AREA, CAPACITY):
+        low, high = values.get(f'min_{dimension_name}'), values.get(f'max_{dimension_name}')
+        if low is not None and high is not None and low > high:
+            values.pop(f'min_{dimension_name}')
+            values.pop(f'max_{dimension_name}')
+
+    provenance = [span for span in spans if values.get(span['field']) == span['value']]
+    return values, provenance
+
+
+def extract_thresholds(text, area_text='', capacity_text=''):
+    """
+    ספי שטח ותפוסה מתיאור הדרישה ומעמודות area/capacity_requirements
+
+    Returns:
+        (מילון שדות -> ערך, רשימת provenance)
+    """
+    spans = []
+    for source, column_text, dimension in (
+        ('area_requirements', area_text, AREA),
+        ('capacity_requirements', capacity_text, CAPACITY),
+    ):
+        for span in find_spans(column_text, dimension=dimension):
+            span['source'] = source
+            spans.append(span)
+    # ערך מעמודה ייעודית קודם לערך שנמצא בטקסט החופשי
+    explicit = {span['field'] for span in spans}
+    for span in find_spans(text):
+        if span['field'] not in explicit:
+            span['source'] = 'description'
+            spans.append(span)
+    return thresholds_from_spans(spans)
+
+
+def header_dimension(header):
+    header = (header or '').lower()
+    if any(word in header for word in AREA_HEADERS):
+        return AREA
+    if any(word in header for word in CAPACITY_HEADERS):
+        return CAPACITY
+    return None
+
+
+def table_rows(table):
+    """
+    שורות טבלת DOCX כדרישות: טקסט השורה (כותרת: ערך) וספים מהעמודות
+    שהכותרת שלהן מציינת שטח או תפוסה
+
+    Returns:
+        רשימת (טקסט, מילון ספים, provenance)
+    """
+    rows = [[cell.text.strip() for cell in row.cells] for row in table.rows]
+    if len(rows) < 2:
+        return []
+    header = rows[0]
+    dimensions = [header_dimension(name) for name in header]
+    results = []
+    for cells in rows[1:]:
+        parts = [f'{name}: {value}' if name else value for name, value in zip(header, cells) if value]
+        text = ' | '.join(parts)
+        if not text:
+            continue
+        spans = []
+        for name, value, dimension in zip(header, cells, dimensions):
+            if dimension and value:
+                for span in find_spans(value, dimension=dimension):
+                    span['source'] = f'table:{name}'
+                    spans.append(span)
+        if not spans:
+            spans = find_spans(text)
+        values, provenance = thresholds_from_spans(spans)
+        results.append((text, values, provenance))
+    return results
@@ -1,49 +1,149 @@
-from django.contrib import admin
-from .models import BusinessType, BusinessAssessment, LicensingRequirement, AssessmentReport
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from business_licensing.profiling import call_tree, flame_rows
+from .models import BusinessType, BusinessTypeAlias, BusinessAssessment, Jurisdiction, LicensingRequirement, AssessmentReport, ReportVersion, RequestProfile, RequirementChange, SourceDocument
+from .tasks import regenerate_reports_async
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator שמשתמש בהערכת מספר שורות לטבלאות גדולות ללא סינון,
+    במקום COUNT(*) מלא על כל הטבלה בכל טעינת עמוד
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        estimate = self._estimate_rows(self.object_list)
+        if estimate is None or estimate < self.exact_count_threshold:
+            return super().count
+        return estimate
+
+    @staticmethod
+    def _estimate_rows(queryset):
+        """
+        הערכת מספר השורות: ב-PostgreSQL מהסטטיסטיקה של הטבלה, ובשאר המסדים
+        COUNT(*) אמיתי שנשמר במטמון ל-ADMIN_COUNT_CACHE_SECONDS (המזהה הגבוה
+        ביותר אינו ספירה - אחרי מחיקה או ארכוב הוא מפנה לעמודים ריקים)
+        """
+        model = queryset.model
+        connection = connections[queryset.db]
+        table = model._meta.db_table
+        if connection.vendor != 'postgresql':
+            return cache.get_or_set(
+                f'admin-row-count:{queryset.db}:{table}',
+                lambda: model._base_manager.using(queryset.db).count(),
+                getattr(settings, 'ADMIN_COUNT_CACHE_SECONDS', 60),
+            )
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            row = cursor.fetchone()
+        if not row or row[0] is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+
+class DeferredChangeList(ChangeList):
+    """ChangeList שדוחה טעינה של שדות טקסט כבדים בעמודי הרשימה"""
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.model_admin.list_defer:
+            queryset = queryset.defer(*self.model_admin.list_defer)
+        return queryset
+
+
+class ScalableAdminMixin:
+    """הגדרות משותפות לרשימות אדמין של טבלאות גדולות"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_defer = ()
+
+    def get_changelist(self, request, **kwargs):
+        return DeferredChangeList
+
+
+class BusinessTypeAliasInline(admin.TabularInline):
+    model = BusinessTypeAlias
+    extra = 0
+    fields = ['name', 'key']
+    readonly_fields = ['key']
 
 
 @admin.register(BusinessType)
 class BusinessTypeAdmin(admin.ModelAdmin):
-    list_display = ['name', 'description']
-    search_fields = ['name', 'description']
+    list_display = ['name', 'key', 'description']
+    search_fields = ['name', 'key', 'description', 'aliases__name']
+    readonly_fields = ['key']
+    inlines = [BusinessTypeAliasInline]
+
+
+@admin.register(Jurisdiction)
+class JurisdictionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'code']
+    search_fields = ['name', 'code']
+    prepopulated_fields = {'code': ('name',)}
 
 
 @admin.register(LicensingRequirement)
-class LicensingRequirementAdmin(admin.ModelAdmin):
-    list_display = ['title', 'category', 'priority', 'authority']
-    list_filter = ['category', 'priority', 'requires_gas', 'meat_related', 'delivery_related', 'alcohol_related']
+class LicensingRequirementAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['title', 'category', 'priority', 'authority', 'jurisdiction']
+    list_filter = ['jurisdiction', 'category', 'priority', 'requires_gas', 'meat_related', 'delivery_related', 'alcohol_related', 'source_file']
+    list_select_related = ['jurisdiction']
     search_fields = ['title', 'description', 'authority']
-    filter_horizontal = ['business_types']
+    autocomplete_fields = ['business_types', 'jurisdiction']
+    list_defer = ['description']
     
     fieldsets = (
         ('מידע בסיסי', {
-            'fields': ('title', 'description', 'authority', 'category', 'priority')
+            'fields': ('title', 'description', 'authority', 'jurisdiction', 'category', 'priority')
         }),
         ('תנאי שטח ותפוסה', {
-            'fields': ('min_area', 'max_area', 'min_capacity', 'max_capacity')
+            'fields': ('min_area', 'max_area', 'min_capacity', 'max_capacity', 'size_provenance')
         }),
         ('מאפיינים מיוחדים', {
             'fields': ('requires_gas', 'meat_related', 'delivery_related', 'outdoor_related', 'alcohol_related')
         }),
+        ('כלל תחולה', {
+            'fields': ('applicability_rule',)
+        }),
         ('עלות וזמן', {
-            'fields': ('estimated_cost', 'processing_time')
+            'fields': ('estimated_cost', 'processing_time', ('cost_min', 'cost_max'), ('days_min', 'days_max'))
         }),
         ('סוגי עסקים', {
             'fields': ('business_types',)
         }),
+        ('מקור', {
+            'fields': ('source_file', 'source_key'),
+            'classes': ('collapse',),
+        }),
     )
+    readonly_fields = ['size_provenance', 'source_file', 'source_key', 'cost_min', 'cost_max', 'days_min', 'days_max']
 
 
 @admin.register(BusinessAssessment)
-class BusinessAssessmentAdmin(admin.ModelAdmin):
-    list_display = ['business_name', 'business_type', 'area_sqm', 'seating_capacity', 'created_at']
-    list_filter = ['business_type', 'uses_gas', 'serves_meat', 'offers_delivery', 'serves_alcohol', 'created_at']
+class BusinessAssessmentAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['business_name', 'business_type', 'jurisdiction', 'area_sqm', 'seating_capacity', 'created_at']
+    list_filter = ['business_type', 'jurisdiction', 'uses_gas', 'serves_meat', 'offers_delivery', 'serves_alcohol', 'created_at']
+    list_select_related = ['business_type', 'jurisdiction']
     search_fields = ['business_name']
     readonly_fields = ['created_at', 'updated_at']
+    autocomplete_fields = ['business_type', 'jurisdiction']
+    date_hierarchy = 'created_at'
     
     fieldsets = (
         ('פרטי העסק', {
-            'fields': ('business_name', 'business_type', 'area_sqm', 'seating_capacity')
+            'fields': ('business_name', 'business_type', 'jurisdiction', 'area_sqm', 'seating_capacity')
         }),
         ('מאפיינים מיוחדים', {
             'fields': ('uses_gas', 'serves_meat', 'offers_delivery', 'has_outdoor_seating', 'serves_alcohol')
@@ -54,10 +154,132 @@ class BusinessAssessmentAdmin(admin.ModelAdmin):
     )
 
 
+class ReportVersionInline(admin.TabularInline):
+    model = ReportVersion
+    extra = 0
+    can_delete = False
+    fields = ['number', 'created_at', 'corpus_version', 'regenerated_sections', 'requirement_ids']
+    readonly_fields = fields
+    ordering = ['-number']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(AssessmentReport)
-class AssessmentReportAdmin(admin.ModelAdmin):
-    list_display = ['assessment', 'created_at']
-    list_filter = ['created_at']
+class AssessmentReportAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['assessment', 'created_at', 'needs_regeneration']
+    list_filter = ['needs_regeneration', 'created_at']
+    list_select_related = ['assessment', 'assessment__business_type']
     search_fields = ['assessment__business_name']
-    readonly_fields = ['created_at']
-    filter_horizontal = ['relevant_requirements']
\ No newline at end of file
+    readonly_fields = ['created_at', 'corpus_version']
+    autocomplete_fields = ['assessment', 'relevant_requirements']
+    actions = ['regenerate_reports']
+    inlines = [ReportVersionInline]
+
+    @admin.action(description='יצירה מחדש של הדוחות שנבחרו (ברקע)')
+    def regenerate_reports(self, request, queryset):
+        report_ids = list(queryset.values_list('pk', flat=True))
+        regenerate_reports_async(report_ids)
+        self.message_user(
+            request,
+            f'{len(report_ids)} דוחות נשלחו ליצירה מחדש ברקע',
+            messages.SUCCESS,
+        )
+
+
+@admin.register(RequirementChange)
+class RequirementChangeAdmin(admin.ModelAdmin):
+    list_display = ['id', 'requirement_id', 'action', 'created_at', 'applied_at']
+    list_filter = ['action', 'applied_at']
+    readonly_fields = ['requirement_id', 'action', 'before', 'after', 'created_at', 'applied_at']
+
+
+@admin.register(SourceDocument)
+class SourceDocumentAdmin(admin.ModelAdmin):
+    list_display = ['path', 'row_count', 'ingested_at']
+    search_fields = ['path']
+    readonly_fields = ['path', 'content_hash', 'row_count', 'ingested_at']
+
+
+def _render_tree(nodes, total):
+    """עץ הקריאות כרשימות מקוננות: זמן מצטבר, אחוז מהסך ומספר קריאות"""
+    if not nodes:
+        return ''
+    items = format_html_join('', '<li><code>{}</code> — {} ms ({}%), {} קריאות{}</li>', (
+        (
+            node['label'], round(node['time'] * 1000, 1), round(100 * node['time'] / total, 1),
+            node['calls'], mark_safe(_render_tree(node['children'], total)),
+        )
+        for node in nodes
+    ))
+    return format_html('<ul style="margin-right: 1em">{}</ul>', items)
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    """הבקשות האיטיות ביותר שנאספו, עם עץ קריאות, flame ושאילתות"""
+    list_display = ['path', 'method', 'status_code', 'duration_ms', 'sql_count', 'sql_ms', 'trigger', 'created_at']
+    list_filter = ['trigger', 'method', 'status_code']
+    search_fields = ['request_id', 'path']
+    ordering = ['-duration_ms']
+    list_defer = ('profile', 'queries')
+    fields = [
+        'request_id', 'method', 'path', 'status_code', 'trigger', 'duration_ms', 'sql_count', 'sql_ms',
+        'created_at', 'flame_graph', 'call_tree_view', 'top_functions', 'query_table',
+    ]
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Flame')
+    def flame_graph(self, obj):
+        rows = flame_rows(call_tree(obj.profile))
+        if not rows:
+            return '-'
+        depth = max(row[0] for row in rows) + 1
+        bars = format_html_join('', (
+            '<div title="{0}" style="position: absolute; top: {1}px; left: {2}%; width: {3}%; height: 17px; '
+            'overflow: hidden; white-space: nowrap; font-size: 11px; direction: ltr; '
+            'background: hsl({4}, 70%, 65%); border: 1px solid #fff; box-sizing: border-box">{0}</div>'
+        ), (
+            (label, level * 18, round(start * 100, 3), round(width * 100, 3), 10 + (level * 37) % 50)
+            for level, label, start, width in rows
+        ))
+        return format_html(
+            '<div style="position: relative; width: 100%; height: {}px; direction: ltr">{}</div>', depth * 18, bars
+        )
+
+    @admin.display(description='עץ קריאות')
+    def call_tree_view(self, obj):
+        tree = call_tree(obj.profile)
+        total = sum(node['time'] for node in tree) or 1
+        return format_html('<div style="direction: ltr">{}</div>', mark_safe(_render_tree(tree, total))) if tree else '-'
+
+    @admin.display(description='פונקציות (לפי זמן עצמי)')
+    def top_functions(self, obj):
+        functions = sorted(obj.profile.get('functions', []), key=lambda function: -function['tottime'])[:30]
+        rows = format_html_join('', '<tr><td><code>{}</code></td><td>{}</td><td>{}</td><td>{}</td></tr>', (
+            (function['label'], function['calls'], round(function['tottime'] * 1000, 2),
+             round(function['cumtime'] * 1000, 2))
+            for function in functions
+        ))
+        return format_html(
+            '<table style="direction: ltr"><tr><th>function</th><th>calls</th><th>self ms</th>'
+            '<th>cumulative ms</th></tr>{}</table>', rows
+        )
+
+    @admin.display(description='שאילתות SQL')
+    def query_table(self, obj):
+        rows = format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td><td><code>{}</code></td></tr>', (
+            (query['count'], query['total_ms'], query['max_ms'], query['sql'])
+            for query in obj.queries
+        ))
+        return format_html(
+            '<table style="direction: ltr"><tr><th>count</th><th>total ms</th><th>max ms</th><th>SQL</th></tr>'
+            '{}</table>', rows
+        )
@@ -0,0 +1,153 @@
+"""
+העברת הערכות ודוחות ישנים למסד ארכיון (hot/cold)
+
+כל מנה מועתקת לארכיון ורק אחר כך נמחקת מהמסד הראשי. ההעתקה היא upsert לפי
+מזהה, כך שהרצה חוזרת אחרי כשל באמצע משלימה את המנה בלי כפילויות. המזהים
+נשמרים, ולכן דוח בארכיון נגיש באותה כתובת. הדרישות שהדוח מקושר אליהן
+מועתקות כפי שהן בזמן הארכוב.
+
+המחיקה נעשית כשהמונים מושבתים: מוני לוח הבקרה הם סכומים לכל התקופה,
+והארכוב אינו משנה אותם.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import stats
+from .models import (
+    AssessmentReport, BusinessAssessment, BusinessType, Jurisdiction, LicensingRequirement, ReportVersion,
+)
+from .routers import ARCHIVE_DB
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+
+
+def archive_configured():
+    return ARCHIVE_DB in settings.DATABASES
+
+
+def archive_ready():
+    """האם מסד הארכיון מוגדר ויש בו את טבלאות השאלון"""
+    if not archive_configured():
+        return False
+    return BusinessAssessment._meta.db_table in connections[ARCHIVE_DB].introspection.table_names()
+
+
+def cutoff(retention_days=None):
+    if retention_days is None:
+        retention_days = getattr(settings, 'ARCHIVE_RETENTION_DAYS', 365)
+    return timezone.now() - timedelta(days=retention_days)
+
+
+def _upsert(model, objects):
+    """העתקה לארכיון: הכנסה, או עדכון של שורה שכבר הועתקה"""
+    if not objects:
+        return
+    pk = model._meta.pk
+    update_fields = [field.name for field in model._meta.concrete_fields if field is not pk]
+    model._base_manager.using(ARCHIVE_DB).bulk_create(
+        objects, update_conflicts=True, unique_fields=[pk.name], update_fields=update_fields,
+    )
+
+
+def _copy_batch(assessment_ids):
+    """העתקת הערכות, הדוחות, הגרסאות והקישורים שלהן, וכל מה שהן מפנות אליו"""
+    assessments = list(BusinessAssessment.objects.filter(pk__in=assessment_ids))
+    reports = list(AssessmentReport.objects.with_content().filter(assessment__in=assessment_ids))
+    report_ids = [report.pk for report in reports]
+    versions = list(ReportVersion.objects.filter(report__in=report_ids))
+    through = AssessmentReport.relevant_requirements.through
+    links = list(through.objects.filter(assessmentreport__in=report_ids))
+
+    requirements = list(LicensingRequirement.objects.filter(pk__in={link.licensingrequirement_id for link in links}))
+    jurisdiction_ids = {assessment.jurisdiction_id for assessment in assessments}
+    jurisdiction_ids |= {requirement.jurisdiction_id for requirement in requirements}
+    jurisdiction_ids.discard(None)
+
+    with transaction.atomic(using=ARCHIVE_DB):
+        _upsert(BusinessType, list(BusinessType.objects.filter(
+            pk__in={assessment.business_type_id for assessment in assessments}
+        )))
+        _upsert(Jurisdiction, list(Jurisdiction.objects.filter(pk__in=jurisdiction_ids)))
+        _upsert(LicensingRequirement, requirements)
+        _upsert(BusinessAssessment, assessments)
+        _upsert(AssessmentReport, reports)
+        _upsert(ReportVersion, versions)
+        through.objects.using(ARCHIVE_DB).bulk_create(links, ignore_conflicts=True)
+    return assessments, reports, links
+
+
+def archive_batch(assessment_ids):
+    """
+    ארכוב מנה אחת: העתקה לארכיון ומחיקה מהמסד הראשי
+
+    Returns:
+        מילון עם assessments, reports
+    """
+    assessments, reports, _ = _copy_batch(assessment_ids)
+
+    with transaction.atomic(), stats.suspended():
+        BusinessAssessment.objects.filter(pk__in=[assessment.pk for assessment in assessments]).delete()
+    return {'assessments': len(assessments), 'reports': len(reports)}
+
+
+def archive_older_than(before, batch_size=None, limit=None):
+    """
+    ארכוב כל ההערכות שנוצרו לפני before, במנות
+
+    Returns:
+        מילון עם batches, assessments, reports
+    """
+    batch_size = batch_size or getattr(settings, 'ARCHIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    result = {'batches': 0, 'assessments': 0, 'reports': 0}
+    while limit is None or result['assessments'] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - result['assessments'])
+        ids = list(
+            BusinessAssessment.objects.filter(created_at__lt=before)
+            .order_by('created_at', 'pk').values_list('pk', flat=True)[:size]
+        )
+        if not ids:
+            break
+        batch = archive_batch(ids)
+        result['batches'] += 1
+        result['assessments'] += batch['assessments']
+        result['reports'] += batch['reports']
+        logger.info("Archived batch", extra={'batch': result['batches'], **batch})
+    return result
+
+
+def get_archived_report(report_id, queryset=None):
+    """דוח מהארכיון לפי מזהה, או None (גם כשאין ארכיון)"""
+    if not archive_ready():
+        return None
+    queryset = queryset if queryset is not None else AssessmentReport.objects.with_content()
+    return queryset.using(ARCHIVE_DB).filter(pk=report_id).first()
+
+
+def is_archived(obj):
+    return obj._state.db == ARCHIVE_DB
+
+
+def hot_table_sizes():
+    """מספר השורות בטבלאות הראשיות ובארכיון"""
+    sizes = {'hot': {}, 'archive': {}}
+    for model in (BusinessAssessment, AssessmentReport):
+        sizes['hot'][model.__name__] = model._base_manager.count()
+        if archive_ready():
+            sizes['archive'][model.__name__] = model._base_manager.using(ARCHIVE_DB).count()
+    return sizes
+
+
+def vacuum():
+    """שחרור המקום שהתפנה במסד הראשי (SQLite בלבד)"""
+    connection = connections['default']
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+    return True
@@ -0,0 +1,116 @@
+"""
+זיהוי סוג העסק מקלט חופשי (מזהה, שם או כינוי) בלי שאילתות
+
+טבלת הסוגים והכינויים קטנה, ולכן נטענת פעם אחת לזיכרון התהליך כמילון
+מפתח מנורמל -> סוג. כל שמירה או מחיקה של סוג או כינוי מעלה חותמת גרסה
+במסד הנתונים; המילון נבנה מחדש כשהחותמת השתנתה (נבדקת לכל היותר פעם
+ב-BUSINESS_TYPE_STAMP_SECONDS), ובכל מקרה אחרי BUSINESS_TYPE_CACHE_SECONDS.
+מזהה שאינו במילון נבדק מול המסד, כך שסוג שנוסף בתהליך אחר אינו הופך
+לסוג חדש בשם המספר.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from . import stats
+from .models import BusinessType, BusinessTypeAlias, StatCounter
+from .normalization import fallback_categories, normalize_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SECONDS = 300
+DEFAULT_STAMP_SECONDS = 2
+
+# חותמת הגרסה נשמרת בטבלת המונים
+STAMP_SCOPE = 'business_types'
+STAMP_KEY = 'version'
+
+_table = None
+_stamp = None
+_loaded_at = 0.0
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _read_stamp():
+    return StatCounter.objects.filter(scope=STAMP_SCOPE, key=STAMP_KEY).values_list('value', flat=True).first() or 0
+
+
+def _load():
+    types = {business_type.pk: business_type for business_type in BusinessType.objects.all()}
+    by_key = {business_type.key: business_type for business_type in types.values()}
+    for key, type_id in BusinessTypeAlias.objects.values_list('key', 'business_type_id'):
+        by_key.setdefault(key, types[type_id])
+    return {'by_pk': types, 'by_key': by_key}
+
+
+def _get_table():
+    global _table, _stamp, _loaded_at, _checked_at
+    ttl = getattr(settings, 'BUSINESS_TYPE_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+    check_every = getattr(settings, 'BUSINESS_TYPE_STAMP_SECONDS', DEFAULT_STAMP_SECONDS)
+    with _lock:
+        now = time.monotonic()
+        if _table is not None and now - _loaded_at <= ttl:
+            if now - _checked_at <= check_every:
+                return _table
+            _checked_at = now
+            if _read_stamp() == _stamp:
+                return _table
+        _stamp = _read_stamp()
+        _table = _load()
+        _loaded_at = _checked_at = time.monotonic()
+        logger.debug("Business types loaded", extra={'keys': len(_table['by_key']), 'stamp': _stamp})
+        return _table
+
+
+def invalidate(**kwargs):
+    """העלאת חותמת הגרסה וביטול המילון של התהליך (נקרא מ-signals)"""
+    global _table
+    if kwargs.get('using', DEFAULT_DB_ALIAS) != DEFAULT_DB_ALIAS:
+        return
+    stats.bump(STAMP_SCOPE, STAMP_KEY, 1)
+    with _lock:
+        _table = None
+
+
+def resolve(value, create=False):
+    """
+    סוג העסק לפי מזהה, שם או כינוי
+
+    Args:
+        create: ליצור סוג חדש לשם שאינו מוכר (אחרת מוחזר None)
+    """
+    value = str(value or '').strip()
+    if not value:
+        return None
+    table = _get_table()
+    if value.isdigit():
+        # מזהה מהרשימה בטופס; סוג שנוסף זה עתה בתהליך אחר עוד לא במילון.
+        # מספר לעולם אינו הופך לשם של סוג חדש
+        return table['by_pk'].get(int(value)) or BusinessType.objects.filter(pk=int(value)).first()
+    key = normalize_name(value)
+    business_type = table['by_key'].get(key)
+    if business_type is not None or not create or not key:
+        return business_type
+
+    # אילוץ הייחודיות על המפתח מונע יצירה כפולה גם בבקשות מקבילות
+    business_type, created = BusinessType.objects.get_or_create(
+        key=key, defaults={'name': value, 'description': f"סוג עסק: {value}"}
+    )
+    if created:
+        logger.info("Creating new business type", extra={'business_type': value})
+    return business_type
+
+
+def unsaved_type(value):
+    """סוג לא שמור לשם שאינו מוכר (לתצוגה המקדימה - ללא דרישות משלו)"""
+    value = str(value or '').strip()
+    return BusinessType(pk=0, name=value, key=normalize_name(value))
+
+
+def fallback_categories_for(business_type):
+    """הקטגוריות לסוג שאין לו דרישות משויכות"""
+    return fallback_categories(business_type.key or normalize_name(business_type.name))
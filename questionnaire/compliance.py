@@ -0,0 +1,106 @@
+"""
+בדיקת התאמה מקומית בין גודל העסק למגבלות השטח והתפוסה של הדרישות
+
+הבדיקה רצה על הדרישות שחלות על העסק בכל השאר (sized_requirements), בלי
+שאילתות ובלי מודל שפה, ומחזירה ממצאים מובנים:
+
+- הפרה: העסק גדול מהמקסימום של דרישה, ואין בקטגוריה שלה דרישה אחרת
+  שחלה על עסק בגודל הזה
+- אזהרה: העסק קרוב לגבול העליון של דרישה שחלה עליו, או מעט מתחת לסף
+  שממנו חלה דרישה (דרישה כזו אינה נכללת בדוח)
+"""
+import math
+
+from django.conf import settings
+from django.db import models
+
+DEFAULT_NEAR_FRACTION = 0.1
+
+SIZED = (
+    models.Q(min_area__isnull=False) | models.Q(max_area__isnull=False)
+    | models.Q(min_capacity__isnull=False) | models.Q(max_capacity__isnull=False)
+)
+
+# (מימד, שדה בהערכה, גבול תחתון, גבול עליון, תווית, יחידה)
+DIMENSIONS = [
+    ('area', 'area_sqm', 'min_area', 'max_area', 'שטח העסק', 'מ"ר'),
+    ('capacity', 'seating_capacity', 'min_capacity', 'max_capacity', 'תפוסת העסק', 'מקומות ישיבה'),
+]
+
+
+def margin(limit, fraction):
+    """המרחק מהגבול שנחשב "קרוב" - לפחות יחידה אחת"""
+    return max(1, math.ceil(abs(limit) * fraction))
+
+
+def within_limits(requirement, assessment):
+    """אותו תנאי כמו סינון הגודל של find_relevant_requirements"""
+    for _, field, low_field, high_field, _, _ in DIMENSIONS:
+        value = getattr(assessment, field)
+        if not value:
+            continue
+        low, high = getattr(requirement, low_field), getattr(requirement, high_field)
+        if (low is not None and value < low) or (high is not None and value > high):
+            return False
+    return True
+
+
+def _finding(requirement, dimension, kind, value, limit, message):
+    return {
+        'requirement': requirement,
+        'dimension': dimension,
+        'kind': kind,
+        'value': value,
+        'limit': limit,
+        'message': message,
+    }
+
+
+def check(assessment, requirements, near_fraction=None):
+    """
+    הפרות ואזהרות סף של העסק מול מגבלות הגודל של הדרישות
+
+    Args:
+        requirements: הדרישות עם מגבלות גודל (גם אלה שהעסק מחוץ לטווח שלהן)
+        near_fraction: חלק מהגבול שנחשב קרוב אליו (ברירת מחדל
+            COMPLIANCE_NEAR_FRACTION)
+
+    Returns:
+        {'violations': [...], 'warnings': [...]} - כל ממצא הוא מילון עם
+        requirement, dimension, kind, value, limit ו-message
+    """
+    if near_fraction is None:
+        near_fraction = getattr(settings, 'COMPLIANCE_NEAR_FRACTION', DEFAULT_NEAR_FRACTION)
+    requirements = list(requirements)
+    applicable = {req.pk for req in requirements if within_limits(req, assessment)}
+    covered_categories = {req.category for req in requirements if req.pk in applicable}
+
+    violations, warnings = [], []
+    for req in requirements:
+        for dimension, field, low_field, high_field, label, unit in DIMENSIONS:
+            value = getattr(assessment, field)
+            if not value:
+                continue
+            low, high = getattr(req, low_field), getattr(req, high_field)
+
+            if high is not None and value > high:
+                if req.category not in covered_categories:
+                    violations.append(_finding(
+                        req, dimension, 'exceeds_max', value, high,
+                        f"{label} ({value} {unit}) חורג מהמקסימום של {high} {unit} שנקבע בדרישה, "
+                        f"ואין דרישה אחרת בקטגוריה שחלה על עסק בגודל הזה",
+                    ))
+            elif high is not None and req.pk in applicable and high - value < margin(high, near_fraction):
+                warnings.append(_finding(
+                    req, dimension, 'near_max', value, high,
+                    f"{label} ({value} {unit}) קרוב לגבול העליון של הדרישה ({high} {unit}) - "
+                    f"הגדלה של {high - value + 1} {unit} תוציא את העסק מתחולתה",
+                ))
+
+            if low is not None and value < low and low - value <= margin(low, near_fraction):
+                warnings.append(_finding(
+                    req, dimension, 'below_min', value, low,
+                    f"{label} ({value} {unit}) מתחת לסף של {low} {unit} שממנו חלה הדרישה - "
+                    f"הדרישה תחול בהגדלה של {low - value} {unit}",
+                ))
+    return {'violations': violations, 'warnings': warnings}
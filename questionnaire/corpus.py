@@ -0,0 +1,244 @@
+"""
+גרסאות של מאגר הדרישות והתאמה מחדש הדרגתית
+
+כל שינוי בדרישה נרשם ב-RequirementChange עם תמונת מצב של האילוצים לפני
+ואחרי. מתמונת המצב נבנית שאילתה הפוכה: אילו הערכות עסק עשויות להיות
+מושפעות מהדרישה. רק הן מותאמות מחדש, והדוחות שהשתנו מסומנים ליצירה מחדש.
+"""
+import hashlib
+import logging
+from itertools import islice
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import FEATURE_FLAGS, AssessmentReport, BusinessAssessment, RequirementChange
+from .rules import VARIABLES, compile_polars
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+
+# שדות התוכן שמופיעים בדוח - שינוי בהם מחייב יצירה מחדש גם ללא שינוי בהתאמה
+CONTENT_FIELDS = ['title', 'description', 'authority', 'priority', 'estimated_cost', 'processing_time']
+
+# מפתחות בתמונת המצב שאינם משפיעים על ההתאמה
+NON_MATCHING_KEYS = {'content_hash', 'reports'}
+
+
+def snapshot(requirement, business_type_ids=None):
+    """תמונת מצב של אילוצי ההתאמה ותוכן הדרישה"""
+    if business_type_ids is None:
+        business_type_ids = (
+            list(requirement.business_types.values_list('pk', flat=True))
+            if requirement.pk else []
+        )
+    content = '\x1f'.join(str(getattr(requirement, field) or '') for field in CONTENT_FIELDS)
+    return {
+        'category': requirement.category,
+        'business_types': sorted(business_type_ids),
+        'min_area': requirement.min_area,
+        'max_area': requirement.max_area,
+        'min_capacity': requirement.min_capacity,
+        'max_capacity': requirement.max_capacity,
+        'feature_mask': requirement.compute_feature_mask(),
+        'applicability_rule': requirement.applicability_rule,
+        'jurisdiction': requirement.jurisdiction_id,
+        'content_hash': hashlib.sha1(content.encode('utf-8')).hexdigest(),
+    }
+
+
+def change_scope(before, after):
+    """
+    הרשות שהשינוי נוגע לה. דרישה ארצית, או דרישה שעברה בין רשויות,
+    משפיעה על כולן (None).
+    """
+    scopes = {state.get('jurisdiction') for state in (before, after) if state}
+    return scopes.pop() if len(scopes) == 1 else None
+
+
+def record_change(requirement_id, action, before, after):
+    """רישום שינוי ביומן; שינוי שלא משנה דבר אינו נרשם"""
+    if before == after:
+        return None
+    return RequirementChange.objects.create(
+        requirement_id=requirement_id, action=action, before=before, after=after,
+        jurisdiction_id=change_scope(before, after),
+    )
+
+
+def current_version():
+    """גרסת המאגר הנוכחית = מזהה השינוי האחרון"""
+    return RequirementChange.objects.aggregate(version=models.Max('id'))['version'] or 0
+
+
+def partition(jurisdiction_id, field='jurisdiction'):
+    """תנאי Q למחיצה של רשות: הדרישות שלה והדרישות הארציות"""
+    scope = models.Q(**{f'{field}__isnull': True})
+    if jurisdiction_id is not None:
+        scope |= models.Q(**{field: jurisdiction_id})
+    return scope
+
+
+def jurisdiction_version(jurisdiction_id):
+    """
+    גרסת המחיצה של רשות: השינוי האחרון בדרישות שלה או בדרישות הארציות.
+    משמשת כמפתח מטמון, כך ששינוי בעיר אחת לא מבטל את המטמון של האחרות.
+    """
+    return (
+        RequirementChange.objects.filter(partition(jurisdiction_id, 'jurisdiction_id'))
+        .aggregate(version=models.Max('id'))['version'] or 0
+    )
+
+
+def population_query(constraints):
+    """
+    אינדקס הפוך: תנאי Q על הערכות עסק שהדרישה עשויה לחול עליהן.
+    התנאי רחב במכוון (למשל מתעלם מהתאמה לפי קטגוריה) - ההתאמה המדויקת
+    נעשית אחר כך על ידי find_relevant_requirements.
+    """
+    q = models.Q()
+    if constraints.get('jurisdiction') is not None:
+        q &= models.Q(jurisdiction=constraints['jurisdiction'])
+    if constraints.get('business_types'):
+        q &= models.Q(business_type__in=constraints['business_types'])
+    if constraints.get('min_area') is not None:
+        q &= models.Q(area_sqm__gte=constraints['min_area'])
+    if constraints.get('max_area') is not None:
+        q &= models.Q(area_sqm__lte=constraints['max_area'])
+    if constraints.get('min_capacity') is not None:
+        q &= models.Q(seating_capacity__gte=constraints['min_capacity'])
+    if constraints.get('max_capacity') is not None:
+        q &= models.Q(seating_capacity__lte=constraints['max_capacity'])
+    mask = constraints.get('feature_mask') or 0
+    for _, field, bit in FEATURE_FLAGS:
+        if mask & bit:
+            q &= models.Q(**{field: True})
+    return q
+
+
+def _matching_constraints(state):
+    """אילוצי ההתאמה בתמונת המצב, בלי התוכן ובלי הדוחות המצטטים"""
+    if not state:
+        return None
+    return {key: value for key, value in state.items() if key not in NON_MATCHING_KEYS}
+
+
+def affected_assessment_ids(change):
+    """
+    מזהי ההערכות שהשינוי עשוי להשפיע עליהן. שינוי בתוכן בלבד (אילוצי
+    ההתאמה זהים) משפיע רק על הדוחות שמצטטים את הדרישה.
+    """
+    ids = set(
+        AssessmentReport.objects.filter(
+            models.Q(relevant_requirements=change.requirement_id) | models.Q(pk__in=_cited_by(change))
+        ).values_list('assessment_id', flat=True)
+    )
+    if _matching_constraints(change.before) == _matching_constraints(change.after):
+        return ids
+    for constraints in (change.before, change.after):
+        if not constraints:
+            continue
+        candidates = BusinessAssessment.objects.filter(
+            population_query(constraints), assessmentreport__isnull=False
+        )
+        rule = constraints.get('applicability_rule')
+        if rule:
+            ids.update(_rule_matching_ids(candidates, rule))
+        else:
+            ids.update(candidates.values_list('pk', flat=True))
+    return ids
+
+
+def _rule_matching_ids(candidates, rule, batch_size=DEFAULT_BATCH_SIZE):
+    """המועמדות שהכלל חל עליהן - הערכה וקטורית של הכלל על כל מנה בבת אחת"""
+    import polars as pl
+
+    schema = {'id': pl.Int64}
+    schema.update(
+        (field, pl.Int64 if kind is int else pl.Boolean) for field, kind in VARIABLES.values()
+    )
+    expression = compile_polars(rule)
+    rows = candidates.values_list(*schema).iterator(chunk_size=batch_size)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return
+        frame = pl.DataFrame(chunk, schema=schema, orient='row')
+        yield from frame.filter(expression).get_column('id').to_list()
+
+
+def _cited_by(change):
+    """הדוחות שציטטו דרישה שנמחקה (הקישורים עצמם כבר נמחקו)"""
+    return (change.before or {}).get('reports', []) if change.action == 'deleted' else []
+
+
+def _content_changed_ids(changes):
+    """דרישות שהתוכן שלהן השתנה (לא רק תנאי ההתאמה)"""
+    return {
+        change.requirement_id for change in changes
+        if (change.before or {}).get('content_hash') != (change.after or {}).get('content_hash')
+    }
+
+
+def apply_pending_changes(batch_size=DEFAULT_BATCH_SIZE, limit=None):
+    """
+    החלת השינויים הממתינים: התאמה מחדש של ההערכות המושפעות בלבד
+    וסימון הדוחות שההתאמה או התוכן שלהם השתנו.
+
+    Returns:
+        מילון עם מספר השינויים, ההערכות שנבדקו והדוחות שסומנו
+    """
+    from .views import find_relevant_requirements
+
+    pending = RequirementChange.objects.filter(applied_at__isnull=True).order_by('id')
+    if limit:
+        pending = pending[:limit]
+    changes = list(pending)
+    result = {'changes': len(changes), 'checked': 0, 'flagged': 0}
+    if not changes:
+        return result
+
+    version = changes[-1].pk
+    content_changed = _content_changed_ids(changes)
+    cited_deleted = {report_id for change in changes for report_id in _cited_by(change)}
+    affected = set()
+    for change in changes:
+        affected |= affected_assessment_ids(change)
+
+    affected = sorted(affected)
+    for start in range(0, len(affected), batch_size):
+        batch = (
+            BusinessAssessment.objects
+            .filter(pk__in=affected[start:start + batch_size])
+            .select_related('business_type', 'assessmentreport')
+            .defer('assessmentreport__ai_generated_content')
+            .prefetch_related('assessmentreport__relevant_requirements')
+        )
+        with transaction.atomic():
+            for assessment in batch:
+                report = assessment.assessmentreport
+                old_ids = {req.pk for req in report.relevant_requirements.all()}
+                new_requirements = find_relevant_requirements(assessment)
+                new_ids = {req.pk for req in new_requirements}
+                result['checked'] += 1
+
+                update_fields = ['corpus_version']
+                report.corpus_version = version
+                if new_ids != old_ids or old_ids & content_changed or report.pk in cited_deleted:
+                    if new_ids != old_ids:
+                        report.relevant_requirements.set(new_requirements)
+                    if not report.needs_regeneration:
+                        result['flagged'] += 1
+                    report.needs_regeneration = True
+                    update_fields.append('needs_regeneration')
+                report.save(update_fields=update_fields)
+
+    RequirementChange.objects.filter(pk__in=[change.pk for change in changes]).update(
+        applied_at=timezone.now()
+    )
+    logger.info(
+        "Applied %d requirement changes: %d assessments re-matched, %d reports flagged",
+        result['changes'], result['checked'], result['flagged'],
+    )
+    return result
@@ -0,0 +1,68 @@
+"""
+סיכום עלויות וזמני טיפול של דוח מתוך הטווחים המספריים של הדרישות
+
+החישוב נעשה בשאילתת aggregate אחת על הדרישות של הדוח, כך שהמספרים
+עקביים בין דוחות ואינם תלויים בחישוב של המודל.
+"""
+from django.db import models
+from django.db.models.functions import Coalesce
+
+PRICED = models.Q(cost_min__isnull=False) | models.Q(cost_max__isnull=False)
+TIMED = models.Q(days_min__isnull=False) | models.Q(days_max__isnull=False)
+
+
+def format_amount(value):
+    return f"₪{value:,}"
+
+
+def format_range(low, high, formatter=str, open_ended=False):
+    """טווח לתצוגה: "a – b", ערך יחיד, או "a ומעלה" כשחסר גבול עליון"""
+    if low is None and high is None:
+        return ''
+    if high is None or open_ended:
+        return f"{formatter(low or 0)} ומעלה"
+    if not low or low == high:
+        return formatter(high) if low == high else f"עד {formatter(high)}"
+    return f"{formatter(low)} – {formatter(high)}"
+
+
+def format_days(value):
+    return f"{value:,} ימים" if value != 1 else "יום אחד"
+
+
+def summarize(requirements):
+    """
+    עלות כוללת וזמני טיפול לקבוצת דרישות (QuerySet)
+
+    העלויות מצטברות. זמני הטיפול מוצגים בהנחה שההליכים מתנהלים במקביל
+    (הארוך ביותר קובע), ולצידם הסכום אם הם מתנהלים בזה אחר זה.
+
+    Returns:
+        מילון עם הספירות, הגבולות המספריים ומחרוזות תצוגה (cost_range, days_range,
+        days_sequential)
+    """
+    totals = requirements.order_by().aggregate(
+        total=models.Count('pk'),
+        priced=models.Count('pk', filter=PRICED),
+        cost_low=Coalesce(models.Sum(Coalesce('cost_min', models.Value(0)), filter=PRICED), 0),
+        cost_high=models.Sum('cost_max', filter=PRICED),
+        cost_open=models.Count('pk', filter=models.Q(cost_max__isnull=True) & PRICED),
+        timed=models.Count('pk', filter=TIMED),
+        days_low=models.Max('days_min', filter=TIMED),
+        days_high=models.Max('days_max', filter=TIMED),
+        days_total=models.Sum('days_max', filter=TIMED),
+        days_open=models.Count('pk', filter=models.Q(days_max__isnull=True) & TIMED),
+    )
+    totals['unpriced'] = totals['total'] - totals['priced']
+    totals['cost_range'] = format_range(
+        totals['cost_low'] if totals['priced'] else None, totals['cost_high'],
+        format_amount, open_ended=bool(totals['cost_open']),
+    )
+    totals['days_range'] = format_range(
+        totals['days_low'], totals['days_high'], format_days, open_ended=bool(totals['days_open']),
+    )
+    totals['days_sequential'] = (
+        format_days(totals['days_total'])
+        if totals['timed'] > 1 and not totals['days_open'] and totals['days_total'] != totals['days_high'] else ''
+    )
+    return totals
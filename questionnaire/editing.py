@@ -0,0 +1,138 @@
+"""
+עריכת הערכה קיימת ועדכון הדוח שלה
+
+אחרי שינוי בפרטי העסק מחושבות מחדש הדרישות, ורק הסעיפים בדוח שמזכירים
+נתון שהשתנה או דרישה שנוספה/הוסרה נשלחים למודל. כל מצב של הדוח נשמר
+כגרסה (ReportVersion), כך שאפשר לראות מה השתנה בין עריכות.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Max
+
+from services.ai_service import generate_ai_report, generate_ai_sections
+from services.report_sections import (
+    FULL_REGENERATION, affected_sections, join_sections, merge_sections, split_sections,
+)
+
+from .corpus import current_version as current_corpus_version
+from .models import FEATURE_FLAGS, ReportVersion
+
+logger = logging.getLogger(__name__)
+
+EDITABLE_FIELDS = ['business_name', 'business_type', 'jurisdiction', 'area_sqm', 'seating_capacity'] + [
+    field for _, field, _ in FEATURE_FLAGS
+]
+
+
+def assessment_snapshot(assessment):
+    """פרטי העסק כמילון JSON (סוג העסק והרשות לפי שם)"""
+    snapshot = {
+        field: getattr(assessment, field) for field in EDITABLE_FIELDS if field not in ('business_type', 'jurisdiction')
+    }
+    snapshot['business_type'] = assessment.business_type.name
+    snapshot['jurisdiction'] = assessment.jurisdiction.name if assessment.jurisdiction_id else None
+    return snapshot
+
+
+def diff_snapshots(before, after):
+    """שדה -> (ערך ישן, ערך חדש) עבור השדות שהשתנו"""
+    return {
+        field: (before.get(field), after.get(field))
+        for field in EDITABLE_FIELDS
+        if before.get(field) != after.get(field)
+    }
+
+
+def record_version(report, regenerated_sections, snapshot=None):
+    """שמירת המצב הנוכחי של הדוח כגרסה הבאה"""
+    last = report.versions.aggregate(last=Max('number'))['last'] or 0
+    return ReportVersion.objects.create(
+        report=report,
+        number=last + 1,
+        content=report.ai_generated_content,
+        requirement_ids=sorted(report.relevant_requirements.values_list('pk', flat=True)),
+        assessment_snapshot=snapshot or assessment_snapshot(report.assessment),
+        corpus_version=report.corpus_version,
+        regenerated_sections=list(regenerated_sections),
+    )
+
+
+def ensure_initial_version(report, snapshot=None):
+    """דוחות שנוצרו לפני ניהול הגרסאות מקבלים גרסה 1 מהתוכן הקיים"""
+    if not report.versions.exists():
+        record_version(report, [FULL_REGENERATION], snapshot)
+
+
+def apply_edit(report, data):
+    """
+    עדכון פרטי העסק של הדוח ויצירה מחדש של הסעיפים שהושפעו
+
+    הקריאה למודל נעשית לפני כל כתיבה, כך שכישלון שלה משאיר את ההערכה
+    והדוח ללא שינוי.
+
+    Args:
+        data: שדה -> ערך חדש (business_type כאובייקט BusinessType)
+
+    Returns:
+        מילון עם changed_fields, added, removed, regenerated (כותרות; '*' = הדוח כולו)
+    """
+    assessment = report.assessment
+    before = assessment_snapshot(assessment)
+    for field, value in data.items():
+        if field in EDITABLE_FIELDS:
+            setattr(assessment, field, value)
+    changed = diff_snapshots(before, assessment_snapshot(assessment))
+    result = {'changed_fields': changed, 'added': [], 'removed': [], 'regenerated': []}
+    if not changed:
+        return result
+
+    # ייבוא מקומי - views מייבא את המודול הזה
+    from .views import find_relevant_requirements
+
+    corpus_version = current_corpus_version()
+    old_requirements = list(report.relevant_requirements.all())
+    new_requirements = find_relevant_requirements(assessment)
+    old_ids = {req.pk for req in old_requirements}
+    new_ids = {req.pk for req in new_requirements}
+    result['added'] = [req for req in new_requirements if req.pk not in old_ids]
+    result['removed'] = [req for req in old_requirements if req.pk not in new_ids]
+
+    content = report.ai_generated_content
+    sections = split_sections(content)
+    targets = affected_sections(sections, changed, result['added'], result['removed'])
+    # דוח שסומן בגלל שינוי במאגר מפנה לנוסח ישן של דרישות - נוצר מחדש כולו
+    if report.needs_regeneration or len(sections) < 2 or len(targets) == len(sections):
+        content = generate_ai_report(assessment, new_requirements)
+        result['regenerated'] = [FULL_REGENERATION]
+    elif targets:
+        replacements = generate_ai_sections(
+            assessment,
+            {'changed_fields': changed, 'added': result['added'], 'removed': result['removed']},
+            [section for section in sections if section[0] in targets],
+        )
+        merged, result['regenerated'] = merge_sections(sections, replacements)
+        content = join_sections(merged)
+
+    logger.info("Report edited", extra={
+        'report_id': report.pk,
+        'changed_fields': sorted(changed),
+        'sections': len(sections),
+        'regenerated': len(result['regenerated']),
+    })
+
+    with transaction.atomic():
+        ensure_initial_version(report, before)
+        assessment.save()
+        report.ai_generated_content = content
+        update_fields = ['ai_generated_content']
+        if result['regenerated'] == [FULL_REGENERATION]:
+            # רק יצירה מלאה מעדכנת את הדוח לגרסת המאגר הנוכחית
+            report.corpus_version = corpus_version
+            report.needs_regeneration = False
+            update_fields += ['corpus_version', 'needs_regeneration']
+        report.save(update_fields=update_fields)
+        if old_ids != new_ids:
+            report.relevant_requirements.set(new_requirements)
+        record_version(report, result['regenerated'])
+    return result
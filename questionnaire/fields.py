@@ -0,0 +1,81 @@
+"""
+שדה טקסט שנשמר דחוס (zlib) במסד הנתונים
+
+הערך בעמודה הוא בית כותרת ואחריו הגוף: b'z' + zlib לטקסט שהדחיסה מקטינה,
+b't' + UTF-8 לטקסט קצר שלא כדאי לדחוס. ערכים ישנים (טקסט לא דחוס שנשאר
+בעמודה מלפני ההמרה) נקראים כפי שהם, כך שאפשר להמיר שורות בהדרגה.
+"""
+import zlib
+
+from django import forms
+from django.db import models
+
+COMPRESSED = b'z'
+PLAIN = b't'
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(text):
+    raw = text.encode('utf-8')
+    packed = zlib.compress(raw, COMPRESSION_LEVEL)
+    if len(packed) < len(raw):
+        return COMPRESSED + packed
+    return PLAIN + raw
+
+
+def decompress_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value[:1] == COMPRESSED:
+        return zlib.decompress(value[1:]).decode('utf-8')
+    if value[:1] == PLAIN:
+        return value[1:].decode('utf-8')
+    # BLOB ללא כותרת - טקסט שנכתב לפני ההמרה
+    return value.decode('utf-8')
+
+
+class CompressedTextField(models.BinaryField):
+    """TextField שנשמר דחוס; בקוד ובטפסים הערך הוא str רגיל"""
+
+    description = "Compressed text"
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.editable:
+            kwargs.pop('editable', None)
+        else:
+            kwargs['editable'] = False
+        return name, path, args, kwargs
+
+    def get_default(self):
+        if self.has_default() and not callable(self.default):
+            return self.default
+        default = super().get_default()
+        return '' if default == b'' else default
+
+    def from_db_value(self, value, expression, connection):
+        return decompress_text(value)
+
+    def to_python(self, value):
+        return decompress_text(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, str):
+            value = compress_text(value)
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj) or ''
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{
+            'form_class': forms.CharField,
+            'widget': forms.Textarea,
+            'required': not self.blank,
+            **kwargs,
+        })
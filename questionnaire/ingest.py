@@ -0,0 +1,178 @@
+"""
+קליטת מסמכי מקור למאגר הדרישות
+
+הקבצים נקראים במקביל בתהליכים נפרדים; הכתיבה למסד הנתונים נעשית בתהליך
+הראשי, קובץ אחר קובץ. קובץ שהגיבוב שלו לא השתנה מאז הקליטה הקודמת מדולג,
+ובקובץ שהשתנה נכתבות רק השורות שנוספו, השתנו או נמחקו.
+
+bulk_create אינו שולח signals, ולכן יומן השינויים והמונים מעודכנים כאן
+במפורש; מחיקה עוברת דרך QuerySet.delete ומעדכנת אותם דרך ה-signals.
+
+קבצים בתת-תיקייה ששמה הוא קוד של רשות מקומית (למשל tel-aviv/bylaws.docx)
+נקלטים כדרישות של אותה רשות; כל השאר ארציים.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.db import transaction
+
+from data_processing.sources import SUPPORTED_SUFFIXES, file_hash, load_source
+
+from . import corpus, stats
+from .models import AMOUNT_FIELDS, Jurisdiction, LicensingRequirement, SourceDocument
+
+logger = logging.getLogger(__name__)
+
+INGESTED_FIELDS = [
+    'title', 'description', 'authority', 'category', 'priority', 'estimated_cost', 'processing_time',
+    'min_area', 'max_area', 'min_capacity', 'max_capacity', 'size_provenance',
+]
+BULK_BATCH_SIZE = 500
+
+
+def discover(directory):
+    """קבצי המקור הנתמכים בתיקייה (כולל תתי-תיקיות), בסדר קבוע"""
+    directory = Path(directory)
+    return sorted(
+        path for path in directory.rglob('*')
+        if path.is_file() and path.suffix.lower() in SUPPORTED_SUFFIXES and not path.name.startswith('~$')
+    )
+
+
+def source_name(path, directory):
+    return Path(path).relative_to(directory).as_posix()
+
+
+def source_jurisdiction(name, jurisdictions):
+    """מזהה הרשות לפי התיקייה העליונה של הקובץ, או None לקובץ ארצי"""
+    parts = Path(name).parts
+    return jurisdictions.get(parts[0]) if len(parts) > 1 else None
+
+
+def upsert_source(name, content_hash, rows, jurisdiction_id=None):
+    """
+    כתיבת שורות קובץ אחד: יצירה או עדכון ב-bulk_create עם update_conflicts
+    ומחיקת שורות שכבר אינן בקובץ
+
+    Returns:
+        מילון עם created, updated, unchanged, deleted
+    """
+    result = {'created': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+    with transaction.atomic():
+        existing = {
+            req.source_key: req
+            for req in LicensingRequirement.objects.filter(source_file=name).prefetch_related('business_types')
+        }
+
+        pending, previous = [], {}
+        for row in rows:
+            requirement = LicensingRequirement(source_file=name, jurisdiction_id=jurisdiction_id, **row)
+            requirement.feature_mask = requirement.compute_feature_mask()
+            requirement.parse_amounts()
+            old = existing.get(row['source_key'])
+            if old is not None:
+                if all(
+                    getattr(old, field) == getattr(requirement, field)
+                    for field in INGESTED_FIELDS + ['jurisdiction_id']
+                ):
+                    result['unchanged'] += 1
+                    continue
+                previous[row['source_key']] = old
+            pending.append(requirement)
+
+        if pending:
+            LicensingRequirement.objects.bulk_create(
+                pending,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['source_file', 'source_key'],
+                update_fields=INGESTED_FIELDS + ['jurisdiction', 'feature_mask'] + AMOUNT_FIELDS,
+            )
+            saved = LicensingRequirement.objects.filter(
+                source_file=name, source_key__in=[req.source_key for req in pending]
+            )
+            track_stats = not stats.is_suspended()
+            for requirement in saved:
+                old = previous.get(requirement.source_key)
+                if old is None:
+                    corpus.record_change(requirement.pk, 'created', None, corpus.snapshot(requirement, []))
+                    old_keys = []
+                    result['created'] += 1
+                else:
+                    type_ids = [business_type.pk for business_type in old.business_types.all()]
+                    corpus.record_change(
+                        requirement.pk, 'updated',
+                        corpus.snapshot(old, type_ids), corpus.snapshot(requirement, type_ids),
+                    )
+                    old_keys = stats.requirement_contributions(old)
+                    result['updated'] += 1
+                if track_stats:
+                    stats.apply_diff(old_keys, stats.requirement_contributions(requirement))
+
+        keys = {row['source_key'] for row in rows}
+        stale = [req.pk for key, req in existing.items() if key not in keys]
+        if stale:
+            LicensingRequirement.objects.filter(pk__in=stale).delete()
+            result['deleted'] = len(stale)
+
+        SourceDocument.objects.update_or_create(
+            path=name, defaults={'content_hash': content_hash, 'row_count': len(rows)}
+        )
+    return result
+
+
+def remove_source(name):
+    """מחיקת כל הדרישות של קובץ שהוסר מהתיקייה"""
+    with transaction.atomic():
+        deleted = LicensingRequirement.objects.filter(source_file=name).count()
+        LicensingRequirement.objects.filter(source_file=name).delete()
+        SourceDocument.objects.filter(path=name).delete()
+    return deleted
+
+
+def ingest_directory(directory, workers=None, force=False, prune=False):
+    """
+    קליטת כל קבצי המקור בתיקייה
+
+    Args:
+        workers: מספר תהליכי הקריאה (1 = בתהליך הנוכחי)
+        force: קליטה גם של קבצים שלא השתנו
+        prune: מחיקת דרישות של קבצים שנעלמו מהתיקייה
+
+    Returns:
+        מילון קובץ -> תוצאת הקליטה ('skipped' לקובץ שלא השתנה)
+    """
+    directory = Path(directory)
+    manifest = dict(SourceDocument.objects.values_list('path', 'content_hash'))
+    files = {source_name(path, directory): path for path in discover(directory)}
+
+    results = {}
+    changed = []
+    for name, path in files.items():
+        if not force and manifest.get(name) == file_hash(path):
+            results[name] = 'skipped'
+        else:
+            changed.append(name)
+
+    jurisdictions = dict(Jurisdiction.objects.values_list('code', 'pk'))
+
+    def store(name, loaded):
+        content_hash, rows, summary = loaded
+        results[name] = upsert_source(name, content_hash, rows, source_jurisdiction(name, jurisdictions))
+        results[name]['compaction_ratio'] = summary['compaction_ratio']
+        logger.info("Ingested %s: %s", name, results[name])
+
+    if workers == 1 or len(changed) <= 1:
+        for name in changed:
+            store(name, load_source(files[name]))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(load_source, str(files[name])): name for name in changed}
+            for future in as_completed(futures):
+                store(futures[future], future.result())
+
+    if prune:
+        for name in set(manifest) - set(files):
+            results[name] = {'deleted': remove_source(name), 'removed': True}
+    return results
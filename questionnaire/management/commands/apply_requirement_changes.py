@@ -0,0 +1,26 @@
+"""
+החלת שינויים ממתינים במאגר הדרישות על ההערכות המושפעות בלבד
+"""
+from django.core.management.base import BaseCommand
+
+from questionnaire import corpus
+from questionnaire.models import AssessmentReport
+
+
+class Command(BaseCommand):
+    help = 'Re-match only the assessments affected by pending requirement changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=corpus.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--limit', type=int, help='Apply at most this many changes')
+
+    def handle(self, *args, **options):
+        result = corpus.apply_pending_changes(
+            batch_size=options['batch_size'], limit=options['limit']
+        )
+        pending = AssessmentReport.objects.filter(needs_regeneration=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {result['changes']} changes (corpus version {corpus.current_version()}): "
+            f"{result['checked']} assessments re-matched, {result['flagged']} reports newly flagged, "
+            f"{pending} reports awaiting regeneration"
+        ))
@@ -0,0 +1,55 @@
+"""
+העברת הערכות ודוחות ישנים ממסד הנתונים הראשי למסד הארכיון
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from questionnaire import archive
+from questionnaire.models import BusinessAssessment
+
+
+class Command(BaseCommand):
+    help = 'Move assessments (with their reports and versions) older than the retention window to the archive database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'ARCHIVE_RETENTION_DAYS', 365),
+            help='Archive assessments created more than this many days ago',
+        )
+        parser.add_argument('--batch-size', type=int, default=None, help='Assessments per batch')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many assessments')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the assessments that would be archived',
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='VACUUM the main database afterwards to reclaim the freed space',
+        )
+
+    def handle(self, *args, **options):
+        if not archive.archive_configured():
+            raise CommandError("No 'archive' database is configured in DATABASES")
+        if not archive.archive_ready():
+            raise CommandError("The archive database has no tables - run 'migrate --database archive' first")
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative')
+
+        before = archive.cutoff(options['days'])
+        if options['dry_run']:
+            count = BusinessAssessment.objects.filter(created_at__lt=before).count()
+            self.stdout.write(f"{count} assessments created before {before:%Y-%m-%d} would be archived")
+            return
+
+        result = archive.archive_older_than(before, batch_size=options['batch_size'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result['assessments']} assessments and {result['reports']} reports "
+            f"in {result['batches']} batches"
+        ))
+        if options['vacuum'] and result['assessments']:
+            if archive.vacuum():
+                self.stdout.write("Main database vacuumed")
@@ -0,0 +1,44 @@
+"""
+בניית אינדקס האחזור (BM25) מפסקאות מאגר הדרישות - אינדקס לכל רשות ואינדקס ארצי
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from questionnaire.corpus import jurisdiction_version
+from services import retrieval
+
+
+class Command(BaseCommand):
+    help = 'Build the per-jurisdiction BM25 retrieval indexes over the requirements corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', help='Run a sample query against the new indexes')
+        parser.add_argument(
+            '--stale', action='store_true',
+            help='Rebuild only the partitions whose requirements changed since they were built',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        jurisdiction_ids = retrieval.stale_partitions() if options['stale'] else None
+        if jurisdiction_ids == []:
+            self.stdout.write(self.style.SUCCESS("All retrieval indexes are up to date"))
+        else:
+            summary = retrieval.build_index(
+                retrieval.corpus_paragraphs(jurisdiction_ids),
+                corpus_version=jurisdiction_version,
+                jurisdiction_ids=jurisdiction_ids,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Indexed {summary['paragraphs']} paragraphs in {summary['partitions']} partitions, "
+                f"{summary['terms']} terms ({summary['nnz']} postings) in {time.monotonic() - started:.2f}s "
+                f"into {retrieval.index_dir()}"
+            ))
+
+        if options['query']:
+            started = time.monotonic()
+            hits = retrieval.search(options['query'], k=5)
+            self.stdout.write(f"Query took {(time.monotonic() - started) * 1000:.1f}ms")
+            for hit in hits:
+                self.stdout.write(f"  [{hit['score']:.2f}] #{hit['requirement_id']} {hit['text'][:100]}")
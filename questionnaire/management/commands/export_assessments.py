@@ -0,0 +1,55 @@
+"""
+ייצוא חודשי של הערכות עסקים והדרישות שהותאמו להן
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from services import bulk_export
+
+
+class Command(BaseCommand):
+    help = 'Stream all assessments with their matched requirements to CSV or XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--output', '-o', help='Output file (CSV defaults to stdout)')
+        parser.add_argument('--from', dest='date_from', help='First creation date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last creation date (YYYY-MM-DD)')
+        parser.add_argument(
+            '--business-type', dest='business_types', type=int, action='append', default=[],
+            help='Business type id to include (repeatable)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=bulk_export.DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            '--no-archive', action='store_true',
+            help='Skip assessments that were moved to the archive database',
+        )
+
+    def handle(self, *args, **options):
+        dates = {}
+        for key in ('date_from', 'date_to'):
+            value = options[key]
+            dates[key] = parse_date(value) if value else None
+            if value and dates[key] is None:
+                raise CommandError(f'Invalid date: {value}')
+
+        querysets = bulk_export.export_querysets(
+            dates['date_from'], dates['date_to'], options['business_types'],
+            include_archive=not options['no_archive'],
+        )
+        rows = bulk_export.iter_rows(querysets, chunk_size=options['chunk_size'])
+
+        if options['format'] == 'xlsx':
+            if not options['output']:
+                raise CommandError('--output is required for XLSX')
+            bulk_export.write_xlsx(rows, options['output'])
+        elif options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                bulk_export.write_csv(rows, f)
+        else:
+            bulk_export.write_csv(rows, sys.stdout)
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"Export written to {options['output']}"))
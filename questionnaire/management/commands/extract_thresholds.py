@@ -0,0 +1,38 @@
+"""
+חילוץ ספי שטח ותפוסה מתיאור הדרישות הקיימות שאין להן ספים
+"""
+from django.core.management.base import BaseCommand
+
+from data_processing.thresholds import extract_thresholds
+from questionnaire.models import LicensingRequirement
+
+SIZE_FIELDS = ['min_area', 'max_area', 'min_capacity', 'max_capacity']
+
+
+class Command(BaseCommand):
+    help = 'Fill empty area/capacity thresholds from requirement text (dry run unless --apply)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true', help='Save the extracted thresholds')
+
+    def handle(self, *args, **options):
+        candidates = LicensingRequirement.objects.filter(
+            min_area__isnull=True, max_area__isnull=True, min_capacity__isnull=True, max_capacity__isnull=True,
+        )
+        found = 0
+        for requirement in candidates.iterator():
+            thresholds, provenance = extract_thresholds(requirement.description)
+            if not thresholds:
+                continue
+            found += 1
+            spans = '; '.join(f"{span['field']}={span['value']} ('{span['text']}')" for span in provenance)
+            self.stdout.write(f"  #{requirement.pk} {requirement.title[:60]}: {spans}")
+            if options['apply']:
+                for field, value in thresholds.items():
+                    setattr(requirement, field, value)
+                requirement.size_provenance = provenance
+                # save רגיל - ה-signals רושמים את השינוי ביומן המאגר
+                requirement.save(update_fields=SIZE_FIELDS + ['size_provenance'])
+
+        verb = 'Updated' if options['apply'] else 'Would update'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {found} requirements"))
@@ -0,0 +1,41 @@
+"""
+קליטת תיקיית מסמכי מקור (DOCX/XLSX/CSV) למאגר הדרישות
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from questionnaire import ingest
+
+
+class Command(BaseCommand):
+    help = 'Ingest a directory of DOCX/XLSX/CSV requirement sources, skipping unchanged files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--workers', type=int, help='Parser processes (default: CPU count, 1 = inline)')
+        parser.add_argument('--force', action='store_true', help='Re-ingest files even if unchanged')
+        parser.add_argument('--prune', action='store_true', help='Delete requirements of files no longer present')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not ingest.discover(directory) and not options['prune']:
+            raise CommandError(f"No DOCX/XLSX/CSV files found in {directory}")
+
+        started = time.monotonic()
+        results = ingest.ingest_directory(
+            directory, workers=options['workers'], force=options['force'], prune=options['prune']
+        )
+        for name, result in sorted(results.items()):
+            self.stdout.write(f"  {name}: {result}")
+
+        processed = [result for result in results.values() if result != 'skipped']
+        totals = {
+            key: sum(result.get(key, 0) for result in processed)
+            for key in ('created', 'updated', 'unchanged', 'deleted')
+        }
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(processed)} files processed, {len(results) - len(processed)} unchanged skipped "
+            f"in {time.monotonic() - started:.2f}s: "
+            + ', '.join(f"{count} {key}" for key, count in totals.items())
+        ))
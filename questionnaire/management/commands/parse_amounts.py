@@ -0,0 +1,40 @@
+"""
+פענוח מחדש של העלות וזמן הטיפול של הדרישות הקיימות
+
+השדות המפוענחים נשמרים בכל שמירה של דרישה; אחרי שינוי במפענח (או אחרי
+הוספת השדות) יש להריץ את הפקודה כדי לעדכן את הדרישות שכבר במאגר.
+"""
+from django.core.management.base import BaseCommand
+
+from data_processing.amounts import parse_cost, parse_duration
+from questionnaire.models import LicensingRequirement
+
+AMOUNT_FIELDS = ['cost_min', 'cost_max', 'days_min', 'days_max']
+
+
+class Command(BaseCommand):
+    help = 'Re-parse estimated cost and processing time of existing requirements (dry run unless --apply)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true', help='Save the re-parsed values')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        changed = []
+        for requirement in LicensingRequirement.objects.only(
+            'pk', 'title', 'estimated_cost', 'processing_time', *AMOUNT_FIELDS
+        ).iterator():
+            old = tuple(getattr(requirement, field) for field in AMOUNT_FIELDS)
+            new = parse_cost(requirement.estimated_cost) + parse_duration(requirement.processing_time)
+            if new == old:
+                continue
+            self.stdout.write(f"  #{requirement.pk} {requirement.title[:60]}: {old} -> {new}")
+            for field, value in zip(AMOUNT_FIELDS, new):
+                setattr(requirement, field, value)
+            changed.append(requirement)
+
+        if options['apply']:
+            # שדות נגזרים בלבד - אינם חלק מתמונת המצב של יומן המאגר
+            LicensingRequirement.objects.bulk_update(changed, AMOUNT_FIELDS, batch_size=options['batch_size'])
+        verb = 'Updated' if options['apply'] else 'Would update'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(changed)} requirements"))
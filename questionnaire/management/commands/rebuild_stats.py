@@ -0,0 +1,35 @@
+"""
+בנייה מחדש של טבלת המונים הסטטיסטיים והשוואה למצב הקיים
+"""
+from django.core.management.base import BaseCommand
+
+from questionnaire import stats
+from services import admission
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the incremental statistics tables from scratch and report any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report differences, do not rewrite the counters',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            differences = stats.diff_counters(stats.compute_from_scratch(), stats.current_counters())
+        else:
+            differences = stats.rebuild()
+            stale = admission.reset_live_counters()
+            if stale:
+                self.stdout.write(f"Removed {stale} stored admission gauges (now derived from lock files)")
+
+        for (scope, key), expected, actual in differences:
+            self.stdout.write(f"{scope}:{key} expected={expected} stored={actual}")
+
+        if differences:
+            self.stdout.write(self.style.WARNING(f"{len(differences)} counters differed"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Counters are consistent"))
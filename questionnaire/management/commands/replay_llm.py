@@ -0,0 +1,55 @@
+"""
+הרצת החלפות LLM מוקלטות דרך הנתב, ללא רשת - למדידת תפוקה והשהיה
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.llm_backends import HedgedRouter, ReplayBackend
+
+
+class Command(BaseCommand):
+    help = 'Replay recorded LLM exchanges offline and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL file written via LLM_RECORD_PATH')
+        parser.add_argument('--latency', choices=['recorded', 'sampled'],
+                            help='Reproduce recorded latencies (default: answer immediately)')
+        parser.add_argument('--speed', type=float, default=1.0, help='Latency speed-up factor')
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--repeat', type=int, default=1, help='Passes over the recording')
+
+    def handle(self, *args, **options):
+        try:
+            backend = ReplayBackend(options['path'], latency=options['latency'], speed=options['speed'])
+        except OSError as e:
+            raise CommandError(str(e))
+        if not backend.exchanges:
+            raise CommandError(f"No recordings in {options['path']}")
+        router = HedgedRouter([backend], max_attempts=1)
+
+        def replay(exchange):
+            started = time.monotonic()
+            content = router.complete(exchange['messages'])
+            return time.monotonic() - started, content == exchange['response']
+
+        exchanges = backend.exchanges * options['repeat']
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(replay, exchanges))
+        elapsed = time.monotonic() - started
+
+        latencies = sorted(latency for latency, _ in results)
+        mismatched = sum(1 for _, matched in results if not matched)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(round(p / 100.0 * (len(latencies) - 1))))] * 1000
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {len(results)} exchanges in {elapsed:.2f}s "
+            f"({len(results) / elapsed if elapsed else float('inf'):.1f}/s)"
+        ))
+        self.stdout.write(f"  p50 {percentile(50):.1f}ms, p95 {percentile(95):.1f}ms, max {latencies[-1] * 1000:.1f}ms")
+        if mismatched:
+            self.stdout.write(self.style.WARNING(f"  {mismatched} responses differ from the recording"))
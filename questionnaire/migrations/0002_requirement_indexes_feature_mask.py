@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:14
+
+from django.db import migrations, models
+
+
+# העתק של FEATURE_FLAGS מהמודל, כדי שהמיגרציה לא תשתנה אם המודל ישתנה
+FEATURE_BITS = [
+    ('requires_gas', 1 << 0),
+    ('meat_related', 1 << 1),
+    ('delivery_related', 1 << 2),
+    ('outdoor_related', 1 << 3),
+    ('alcohol_related', 1 << 4),
+]
+
+
+def populate_feature_mask(apps, schema_editor):
+    """מילוי מסכת המאפיינים עבור דרישות קיימות"""
+    LicensingRequirement = apps.get_model('questionnaire', 'LicensingRequirement')
+    LicensingRequirement.objects.update(feature_mask=0)
+    for field, bit in FEATURE_BITS:
+        LicensingRequirement.objects.filter(**{field: True}).update(
+            feature_mask=models.F('feature_mask') + bit
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='licensingrequirement',
+            name='feature_mask',
+            field=models.IntegerField(default=0, editable=False, help_text='נגזר מהמאפיינים המיוחדים ומתעדכן בשמירה', verbose_name='מסכת מאפיינים'),
+        ),
+        migrations.RunPython(populate_feature_mask, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='assessmentreport',
+            index=models.Index(fields=['-created_at'], name='report_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='businessassessment',
+            index=models.Index(fields=['-created_at'], name='assessment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='licensingrequirement',
+            index=models.Index(fields=['category', 'min_area', 'max_area'], name='req_category_area_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='licensingrequirement',
+            index=models.Index(fields=['min_capacity', 'max_capacity', 'feature_mask'], name='req_capacity_mask_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='licensingrequirement',
+            index=models.Index(fields=['priority', 'category'], name='req_priority_category_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0002_requirement_indexes_feature_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50, verbose_name='מימד')),
+                ('key', models.CharField(blank=True, max_length=200, verbose_name='ערך')),
+                ('value', models.BigIntegerField(default=0, verbose_name='מונה')),
+            ],
+            options={
+                'verbose_name': 'מונה סטטיסטי',
+                'verbose_name_plural': 'מונים סטטיסטיים',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='statcounter',
+            constraint=models.UniqueConstraint(fields=('scope', 'key'), name='unique_stat_scope_key'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:19
+
+from django.db import migrations, models
+import questionnaire.rules
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0003_stat_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='licensingrequirement',
+            name='applicability_rule',
+            field=models.CharField(blank=True, help_text='ביטוי כמו: gas AND area > 200  או  alcohol OR (outdoor AND capacity > 50)', max_length=500, validators=[questionnaire.rules.validate_rule], verbose_name='כלל תחולה'),
+        ),
+    ]
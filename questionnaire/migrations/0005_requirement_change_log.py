@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0004_applicability_rule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequirementChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requirement_id', models.BigIntegerField(db_index=True, verbose_name='מזהה דרישה')),
+                ('action', models.CharField(choices=[('created', 'נוצרה'), ('updated', 'עודכנה'), ('deleted', 'נמחקה')], max_length=10, verbose_name='פעולה')),
+                ('before', models.JSONField(blank=True, null=True, verbose_name='לפני')),
+                ('after', models.JSONField(blank=True, null=True, verbose_name='אחרי')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='נוצר בתאריך')),
+                ('applied_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='הוחל בתאריך')),
+            ],
+            options={
+                'verbose_name': 'שינוי בדרישה',
+                'verbose_name_plural': 'שינויים בדרישות',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='assessmentreport',
+            name='corpus_version',
+            field=models.BigIntegerField(default=0, help_text='השינוי האחרון במאגר שההתאמה של הדוח נבדקה מולו', verbose_name='גרסת מאגר הדרישות'),
+        ),
+        migrations.AddField(
+            model_name='assessmentreport',
+            name='needs_regeneration',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='דורש יצירה מחדש'),
+        ),
+    ]
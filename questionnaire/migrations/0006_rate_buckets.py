@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0005_requirement_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200, unique=True, verbose_name='מפתח')),
+                ('tokens', models.FloatField(verbose_name='אסימונים')),
+                ('updated_at', models.FloatField(verbose_name='עודכן (epoch)')),
+            ],
+            options={
+                'verbose_name': 'דלי הגבלת קצב',
+                'verbose_name_plural': 'דליי הגבלת קצב',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0006_rate_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='נתיב')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='גיבוב תוכן')),
+                ('row_count', models.IntegerField(default=0, verbose_name='מספר דרישות')),
+                ('ingested_at', models.DateTimeField(auto_now=True, verbose_name='נקלט בתאריך')),
+            ],
+            options={
+                'verbose_name': 'מסמך מקור',
+                'verbose_name_plural': 'מסמכי מקור',
+                'ordering': ['path'],
+            },
+        ),
+        migrations.AddField(
+            model_name='licensingrequirement',
+            name='source_file',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, verbose_name='קובץ מקור'),
+        ),
+        migrations.AddField(
+            model_name='licensingrequirement',
+            name='source_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, verbose_name='מפתח במקור'),
+        ),
+        migrations.AddConstraint(
+            model_name='licensingrequirement',
+            constraint=models.UniqueConstraint(fields=('source_file', 'source_key'), name='unique_requirement_source'),
+        ),
+    ]
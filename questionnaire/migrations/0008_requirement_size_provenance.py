@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0007_requirement_sources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='licensingrequirement',
+            name='size_provenance',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='הקטעים בטקסט שמהם חולצו ערכי השטח והתפוסה', verbose_name='מקור ספי הגודל'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0008_requirement_size_provenance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='מספר גרסה')),
+                ('content', models.TextField(blank=True, verbose_name='תוכן')),
+                ('requirement_ids', models.JSONField(default=list, verbose_name='דרישות')),
+                ('assessment_snapshot', models.JSONField(default=dict, verbose_name='פרטי העסק')),
+                ('corpus_version', models.BigIntegerField(default=0, verbose_name='גרסת מאגר הדרישות')),
+                ('regenerated_sections', models.JSONField(default=list, help_text="כותרות הסעיפים שנשלחו למודל; '*' = הדוח כולו", verbose_name='סעיפים שנוצרו מחדש')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='נוצר בתאריך')),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='questionnaire.assessmentreport', verbose_name='דוח')),
+            ],
+            options={
+                'verbose_name': 'גרסת דוח',
+                'verbose_name_plural': 'גרסאות דוח',
+                'ordering': ['report', '-number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportversion',
+            constraint=models.UniqueConstraint(fields=('report', 'number'), name='unique_report_version'),
+        ),
+    ]
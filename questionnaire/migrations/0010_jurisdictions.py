@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0009_report_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Jurisdiction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='שם הרשות')),
+                ('code', models.SlugField(unique=True, verbose_name='קוד')),
+            ],
+            options={
+                'verbose_name': 'רשות מקומית',
+                'verbose_name_plural': 'רשויות מקומיות',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='requirementchange',
+            name='jurisdiction_id',
+            field=models.BigIntegerField(blank=True, help_text='הרשות שהשינוי נוגע לה; ריק - שינוי ארצי שמשפיע על כל הרשויות', null=True, verbose_name='רשות מקומית'),
+        ),
+        migrations.AddField(
+            model_name='businessassessment',
+            name='jurisdiction',
+            field=models.ForeignKey(blank=True, help_text='ריק - רק דרישות ארציות', null=True, on_delete=django.db.models.deletion.PROTECT, to='questionnaire.jurisdiction', verbose_name='רשות מקומית'),
+        ),
+        migrations.AddField(
+            model_name='licensingrequirement',
+            name='jurisdiction',
+            field=models.ForeignKey(blank=True, help_text='ריק - דרישה ארצית שחלה בכל הרשויות', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='requirements', to='questionnaire.jurisdiction', verbose_name='רשות מקומית'),
+        ),
+        migrations.AddIndex(
+            model_name='licensingrequirement',
+            index=models.Index(fields=['jurisdiction', 'category'], name='req_jurisdiction_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requirementchange',
+            index=models.Index(fields=['jurisdiction_id', 'id'], name='change_jurisdiction_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:43
+
+from django.db import migrations
+import questionnaire.fields
+
+BATCH_SIZE = 200
+
+COMPRESSED_FIELDS = [
+    ('AssessmentReport', 'ai_generated_content'),
+    ('ReportVersion', 'content'),
+]
+
+
+def _batches(manager, field):
+    last = 0
+    while True:
+        rows = list(manager.filter(pk__gt=last).order_by('pk').values_list('pk', field)[:BATCH_SIZE])
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def compress_existing(apps, schema_editor):
+    """דחיסת השורות הקיימות (טקסט לא דחוס שהועתק כפי שהוא) במנות"""
+    alias = schema_editor.connection.alias
+    for model_name, field in COMPRESSED_FIELDS:
+        model = apps.get_model('questionnaire', model_name)
+        manager = model.objects.using(alias)
+        for rows in _batches(manager, field):
+            manager.bulk_update([model(pk=pk, **{field: text or ''}) for pk, text in rows], [field])
+
+
+def decompress_existing(apps, schema_editor):
+    """החזרת הטקסט לעמודה כטקסט רגיל לפני ההמרה חזרה ל-TextField"""
+    connection = schema_editor.connection
+    for model_name, field in COMPRESSED_FIELDS:
+        model = apps.get_model('questionnaire', model_name)
+        table = connection.ops.quote_name(model._meta.db_table)
+        column = connection.ops.quote_name(model._meta.get_field(field).column)
+        pk_column = connection.ops.quote_name(model._meta.pk.column)
+        for rows in _batches(model.objects.using(connection.alias), field):
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"UPDATE {table} SET {column} = %s WHERE {pk_column} = %s",
+                    [(text or '', pk) for pk, text in rows],
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0010_jurisdictions'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='assessmentreport',
+            options={'base_manager_name': 'objects', 'ordering': ['-created_at'], 'verbose_name': 'דוח הערכה', 'verbose_name_plural': 'דוחות הערכה'},
+        ),
+        migrations.AlterField(
+            model_name='assessmentreport',
+            name='ai_generated_content',
+            field=questionnaire.fields.CompressedTextField(blank=True, verbose_name='תוכן שנוצר על ידי AI'),
+        ),
+        migrations.AlterField(
+            model_name='reportversion',
+            name='content',
+            field=questionnaire.fields.CompressedTextField(blank=True, verbose_name='תוכן'),
+        ),
+        migrations.RunPython(compress_existing, decompress_existing),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from questionnaire.normalization import normalize_name
+
+ASSESSMENT_BY_TYPE = 'assessment_by_type'
+
+# כינויים מוכרים בזמן המיגרציה (עותק קפוא של BUILTIN_ALIASES)
+BUILTIN_ALIASES = {
+    'מסעדה': ['restaurant', 'מסעדות'],
+    'בר': ['bar', 'pub', 'פאב', 'בר/פאב', 'ברים'],
+    'בית קפה': ['cafe', 'coffee shop', 'קפה', 'בתי קפה'],
+    'מזון מהיר': ['fast food', 'fast_food'],
+}
+
+
+def merge_duplicate_types(apps, schema_editor):
+    """
+    איחוד סוגי עסקים שהם וריאציות של אותו שם (כולל כינויים מוכרים באנגלית):
+    ההערכות, הדרישות והמונים עוברים לסוג שנשאר, ושמות הכפולים נשמרים ככינויים
+    """
+    alias = schema_editor.connection.alias
+    BusinessType = apps.get_model('questionnaire', 'BusinessType')
+    BusinessTypeAlias = apps.get_model('questionnaire', 'BusinessTypeAlias')
+    BusinessAssessment = apps.get_model('questionnaire', 'BusinessAssessment')
+    Through = apps.get_model('questionnaire', 'LicensingRequirement').business_types.through
+    StatCounter = apps.get_model('questionnaire', 'StatCounter')
+
+    alias_keys = {
+        normalize_name(name): normalize_name(canonical)
+        for canonical, names in BUILTIN_ALIASES.items()
+        for name in names
+    }
+    groups = {}
+    for business_type in BusinessType.objects.using(alias).order_by('pk'):
+        key = normalize_name(business_type.name)
+        groups.setdefault(alias_keys.get(key, key), []).append(business_type)
+
+    for key, types in groups.items():
+        # נשאר הסוג שהשם שלו הוא השם הקנוני, ואם אין כזה - הוותיק
+        keeper = next((t for t in types if normalize_name(t.name) == key), types[0])
+        for duplicate in types:
+            if duplicate is keeper:
+                continue
+            BusinessAssessment.objects.using(alias).filter(business_type=duplicate).update(business_type=keeper)
+            linked = set(Through.objects.using(alias).filter(businesstype=keeper).values_list('licensingrequirement_id', flat=True))
+            Through.objects.using(alias).bulk_create([
+                Through(businesstype_id=keeper.pk, licensingrequirement_id=requirement_id)
+                for requirement_id in Through.objects.using(alias).filter(businesstype=duplicate)
+                .values_list('licensingrequirement_id', flat=True)
+                if requirement_id not in linked
+            ])
+            counter = StatCounter.objects.using(alias).filter(scope=ASSESSMENT_BY_TYPE, key=str(duplicate.pk)).first()
+            if counter is not None:
+                target, _ = StatCounter.objects.using(alias).get_or_create(
+                    scope=ASSESSMENT_BY_TYPE, key=str(keeper.pk), defaults={'value': 0}
+                )
+                target.value += counter.value
+                target.save(update_fields=['value'])
+                counter.delete()
+            BusinessTypeAlias.objects.using(alias).get_or_create(
+                key=normalize_name(duplicate.name),
+                defaults={'business_type': keeper, 'name': duplicate.name},
+            )
+            duplicate.delete()
+        keeper.key = key
+        keeper.save(update_fields=['key'])
+
+    for canonical, names in BUILTIN_ALIASES.items():
+        keeper = BusinessType.objects.using(alias).filter(key=normalize_name(canonical)).first()
+        if keeper is None:
+            continue
+        for name in names:
+            BusinessTypeAlias.objects.using(alias).get_or_create(
+                key=normalize_name(name), defaults={'business_type': keeper, 'name': name}
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0011_compress_report_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businesstype',
+            name='key',
+            field=models.CharField(editable=False, max_length=100, null=True, verbose_name='מפתח מנורמל'),
+        ),
+        migrations.CreateModel(
+            name='BusinessTypeAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='כינוי')),
+                ('key', models.CharField(editable=False, max_length=100, unique=True, verbose_name='מפתח מנורמל')),
+                ('business_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='questionnaire.businesstype', verbose_name='סוג העסק')),
+            ],
+            options={
+                'verbose_name': 'כינוי לסוג עסק',
+                'verbose_name_plural': 'כינויים לסוגי עסקים',
+            },
+        ),
+        migrations.RunPython(merge_duplicate_types, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='businesstype',
+            name='key',
+            field=models.CharField(editable=False, max_length=100, unique=True, verbose_name='מפתח מנורמל'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0012_business_type_aliases'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('request_id', models.CharField(db_index=True, max_length=64, verbose_name='מזהה בקשה')),
+                ('method', models.CharField(max_length=10, verbose_name='שיטה')),
+                ('path', models.CharField(max_length=500, verbose_name='נתיב')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='קוד תגובה')),
+                ('trigger', models.CharField(choices=[('header', 'כותרת X-Profile'), ('query', 'פרמטר _profile'), ('sample', 'דגימה')], max_length=10, verbose_name='הופעל על ידי')),
+                ('duration_ms', models.FloatField(verbose_name='משך (ms)')),
+                ('sql_count', models.PositiveIntegerField(default=0, verbose_name='שאילתות SQL')),
+                ('sql_ms', models.FloatField(default=0, verbose_name='זמן SQL (ms)')),
+                ('profile', models.JSONField(default=dict, verbose_name='פרופיל')),
+                ('queries', models.JSONField(default=list, verbose_name='שאילתות')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='נוצר בתאריך')),
+            ],
+            options={
+                'verbose_name': 'פרופיל בקשה',
+                'verbose_name_plural': 'פרופילי בקשות',
+                'ordering': ['-duration_ms'],
+                'indexes': [models.Index(fields=['-duration_ms'], name='profile_duration_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:54
+
+from django.db import migrations, models
+import questionnaire.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0013_request_profiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InFlightCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='מפתח')),
+                ('status', models.CharField(choices=[('running', 'בביצוע'), ('done', 'הסתיים')], max_length=10, verbose_name='מצב')),
+                ('owner', models.CharField(max_length=32, verbose_name='מבצע')),
+                ('result', questionnaire.fields.CompressedTextField(blank=True, verbose_name='תוצאה')),
+                ('expires_at', models.FloatField(db_index=True, verbose_name='פג תוקף (epoch)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='נוצר בתאריך')),
+            ],
+            options={
+                'verbose_name': 'קריאה משותפת בביצוע',
+                'verbose_name_plural': 'קריאות משותפות בביצוע',
+            },
+        ),
+        migrations.AddField(
+            model_name='businessassessment',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, help_text='נוצר עם טופס השאלון; שליחה חוזרת של אותו טופס מחזירה את אותו דוח', max_length=64, null=True, unique=True, verbose_name='מפתח שליחה'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0014_submission_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='licensingrequirement',
+            name='cost_max',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='עלות מקסימלית (ש"ח)'),
+        ),
+        migrations.AddField(
+            model_name='licensingrequirement',
+            name='cost_min',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='עלות מינימלית (ש"ח)'),
+        ),
+        migrations.AddField(
+            model_name='licensingrequirement',
+            name='days_max',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='זמן טיפול מקסימלי (ימים)'),
+        ),
+        migrations.AddField(
+            model_name='licensingrequirement',
+            name='days_min',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='זמן טיפול מינימלי (ימים)'),
+        ),
+    ]
@@ -1,10 +1,33 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from data_processing.amounts import parse_cost, parse_duration
+
+from .fields import CompressedTextField
+from .normalization import normalize_name
+from .rules import validate_rule
+
+
+# ביטים של מאפיינים מיוחדים - משותפים לדרישות ולהערכות עסק
+# (שדה בדרישה, שדה בהערכה, ביט)
+FEATURE_FLAGS = [
+    ('requires_gas', 'uses_gas', 1 << 0),
+    ('meat_related', 'serves_meat', 1 << 1),
+    ('delivery_related', 'offers_delivery', 1 << 2),
+    ('outdoor_related', 'has_outdoor_seating', 1 << 3),
+    ('alcohol_related', 'serves_alcohol', 1 << 4),
+]
+ALL_FEATURES_MASK = sum(bit for _, _, bit in FEATURE_FLAGS)
+
+# שדות מספריים שנגזרים מ-estimated_cost ו-processing_time
+AMOUNT_FIELDS = ['cost_min', 'cost_max', 'days_min', 'days_max']
+
 
 class BusinessType(models.Model):
     """סוגי עסקים"""
     name = models.CharField(max_length=100, verbose_name="שם סוג העסק")
+    key = models.CharField(max_length=100, unique=True, editable=False, verbose_name="מפתח מנורמל")
     description = models.TextField(blank=True, verbose_name="תיאור")
     
     class Meta:
@@ -13,6 +36,52 @@ class BusinessType(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        self.key = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'key' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['key']
+        super().save(*args, **kwargs)
+
+
+class BusinessTypeAlias(models.Model):
+    """שם חלופי לסוג עסק (כתיב אחר, אנגלית, רבים)"""
+    business_type = models.ForeignKey(
+        BusinessType, on_delete=models.CASCADE, related_name='aliases', verbose_name="סוג העסק"
+    )
+    name = models.CharField(max_length=100, verbose_name="כינוי")
+    key = models.CharField(max_length=100, unique=True, editable=False, verbose_name="מפתח מנורמל")
+    
+    class Meta:
+        verbose_name = "כינוי לסוג עסק"
+        verbose_name_plural = "כינויים לסוגי עסקים"
+    
+    def __str__(self):
+        return f"{self.name} → {self.business_type}"
+    
+    def clean(self):
+        taken = BusinessType.objects.filter(key=normalize_name(self.name)).exclude(pk=self.business_type_id)
+        if taken.exists():
+            raise ValidationError({'name': "קיים סוג עסק בשם זה"})
+    
+    def save(self, *args, **kwargs):
+        self.key = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
+
+class Jurisdiction(models.Model):
+    """רשות רישוי מקומית (עירייה / מועצה); דרישה ללא רשות היא ארצית"""
+    name = models.CharField(max_length=100, unique=True, verbose_name="שם הרשות")
+    code = models.SlugField(max_length=50, unique=True, verbose_name="קוד")
+    
+    class Meta:
+        verbose_name = "רשות מקומית"
+        verbose_name_plural = "רשויות מקומיות"
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
 
 
 class BusinessAssessment(models.Model):
@@ -25,6 +94,14 @@ class BusinessAssessment(models.Model):
         on_delete=models.CASCADE, 
         verbose_name="סוג העסק"
     )
+    jurisdiction = models.ForeignKey(
+        Jurisdiction,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        verbose_name="רשות מקומית",
+        help_text="ריק - רק דרישות ארציות",
+    )
     
     # נתוני שטח ותפוסה
     area_sqm = models.IntegerField(
@@ -46,14 +123,31 @@ class BusinessAssessment(models.Model):
     # פרטי יצירה
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="נוצר בתאריך")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="עודכן בתאריך")
+    idempotency_key = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="מפתח שליחה",
+        help_text="נוצר עם טופס השאלון; שליחה חוזרת של אותו טופס מחזירה את אותו דוח",
+    )
     
     class Meta:
         verbose_name = "הערכת עסק"
         verbose_name_plural = "הערכות עסקים"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='assessment_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.business_name} - {self.business_type}"
+    
+    @property
+    def feature_mask(self):
+        """מסכת הביטים של המאפיינים שהעסק מקיים"""
+        return sum(bit for _, field, bit in FEATURE_FLAGS if getattr(self, field))
 
 
 class LicensingRequirement(models.Model):
@@ -95,6 +189,13 @@ class LicensingRequirement(models.Model):
     max_area = models.IntegerField(null=True, blank=True, verbose_name="שטח מקסימלי")
     min_capacity = models.IntegerField(null=True, blank=True, verbose_name="תפוסה מינימלית")
     max_capacity = models.IntegerField(null=True, blank=True, verbose_name="תפוסה מקסימלית")
+    size_provenance = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False,
+        verbose_name="מקור ספי הגודל",
+        help_text="הקטעים בטקסט שמהם חולצו ערכי השטח והתפוסה",
+    )
     
     # מאפיינים מיוחדים
     requires_gas = models.BooleanField(default=False, verbose_name="דורש גז")
@@ -102,20 +203,96 @@ class LicensingRequirement(models.Model):
     delivery_related = models.BooleanField(default=False, verbose_name="קשור למשלוחים")
     outdoor_related = models.BooleanField(default=False, verbose_name="קשור לישיבה בחוץ")
     alcohol_related = models.BooleanField(default=False, verbose_name="קשור לאלכוהול")
+    applicability_rule = models.CharField(
+        max_length=500,
+        blank=True,
+        validators=[validate_rule],
+        verbose_name="כלל תחולה",
+        help_text="ביטוי כמו: gas AND area > 200  או  alcohol OR (outdoor AND capacity > 50)",
+    )
+    feature_mask = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name="מסכת מאפיינים",
+        help_text="נגזר מהמאפיינים המיוחדים ומתעדכן בשמירה",
+    )
     
     # נתוני עלות וזמן
     estimated_cost = models.CharField(max_length=100, blank=True, verbose_name="עלות משוערת")
     processing_time = models.CharField(max_length=100, blank=True, verbose_name="זמן טיפול")
+    # טווחים מספריים שנגזרים מהטקסט בשמירה ובקליטה (None - לא צוין / לא פוענח)
+    cost_min = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="עלות מינימלית (ש\"ח)")
+    cost_max = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="עלות מקסימלית (ש\"ח)")
+    days_min = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="זמן טיפול מינימלי (ימים)")
+    days_max = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="זמן טיפול מקסימלי (ימים)")
     
     business_types = models.ManyToManyField(BusinessType, verbose_name="סוגי עסקים")
+    jurisdiction = models.ForeignKey(
+        Jurisdiction,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='requirements',
+        verbose_name="רשות מקומית",
+        help_text="ריק - דרישה ארצית שחלה בכל הרשויות",
+    )
+    
+    # מקור הדרישה בקליטה אוטומטית (ריק לדרישות שהוזנו ידנית)
+    source_file = models.CharField(max_length=255, null=True, blank=True, editable=False, verbose_name="קובץ מקור")
+    source_key = models.CharField(max_length=64, null=True, blank=True, editable=False, verbose_name="מפתח במקור")
     
     class Meta:
         verbose_name = "דרישת רישוי"
         verbose_name_plural = "דרישות רישוי"
         ordering = ['priority', 'category']
+        constraints = [
+            # מפתח ה-upsert של הקליטה; NULL אינו מתנגש, כך שדרישות ידניות אינן מושפעות
+            models.UniqueConstraint(fields=['source_file', 'source_key'], name='unique_requirement_source'),
+        ]
+        indexes = [
+            # סינון לפי קטגוריה ושטח (find_relevant_requirements, api_get_requirements)
+            models.Index(fields=['category', 'min_area', 'max_area'], name='req_category_area_idx'),
+            # סינון לפי תפוסה ומאפיינים
+            models.Index(fields=['min_capacity', 'max_capacity', 'feature_mask'], name='req_capacity_mask_idx'),
+            # סדר ברירת המחדל
+            models.Index(fields=['priority', 'category'], name='req_priority_category_idx'),
+            # מחיצה לפי רשות: דרישות הרשות + הארציות (jurisdiction IS NULL)
+            models.Index(fields=['jurisdiction', 'category'], name='req_jurisdiction_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_category_display()} - {self.title[:50]}..."
+    
+    def compute_feature_mask(self):
+        """חישוב מסכת הביטים מהשדות הבוליאניים"""
+        return sum(bit for field, _, bit in FEATURE_FLAGS if getattr(self, field))
+    
+    def parse_amounts(self):
+        """פענוח העלות וזמן הטיפול לטווחים מספריים"""
+        self.cost_min, self.cost_max = parse_cost(self.estimated_cost)
+        self.days_min, self.days_max = parse_duration(self.processing_time)
+    
+    def save(self, *args, **kwargs):
+        self.feature_mask = self.compute_feature_mask()
+        self.parse_amounts()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = list(set(update_fields) | {'feature_mask'} | set(AMOUNT_FIELDS))
+        super().save(*args, **kwargs)
+
+
+class AssessmentReportQuerySet(models.QuerySet):
+    
+    def with_content(self):
+        """טעינת גוף הדוח - רק בתצוגת הדוח ובייצוא"""
+        return self.defer(None)
+
+
+class AssessmentReportManager(models.Manager.from_queryset(AssessmentReportQuerySet)):
+    """גוף הדוח (טקסט ארוך ודחוס) נדחה כברירת מחדל בכל שאילתה"""
+    
+    def get_queryset(self):
+        return super().get_queryset().defer('ai_generated_content')
 
 
 class AssessmentReport(models.Model):
@@ -130,16 +307,228 @@ class AssessmentReport(models.Model):
         LicensingRequirement,
         verbose_name="דרישות רלוונטיות"
     )
-    ai_generated_content = models.TextField(
+    ai_generated_content = CompressedTextField(
         blank=True,
         verbose_name="תוכן שנוצר על ידי AI"
     )
+    corpus_version = models.BigIntegerField(
+        default=0,
+        verbose_name="גרסת מאגר הדרישות",
+        help_text="השינוי האחרון במאגר שההתאמה של הדוח נבדקה מולו",
+    )
+    needs_regeneration = models.BooleanField(
+        default=False,
+        db_index=True,
+        verbose_name="דורש יצירה מחדש",
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="נוצר בתאריך")
     
+    # גם גישה דרך קשרים (assessment.assessmentreport) עוברת דרך המנהל הדוחה
+    objects = AssessmentReportManager()
+    
     class Meta:
         verbose_name = "דוח הערכה"
         verbose_name_plural = "דוחות הערכה"
         ordering = ['-created_at']
+        base_manager_name = 'objects'
+        indexes = [
+            models.Index(fields=['-created_at'], name='report_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"דוח עבור {self.assessment.business_name}"
+    
+    def refresh_from_db(self, using=None, fields=None):
+        # המנהל הבסיסי דוחה את גוף הדוח, ולכן הוא נטען כאן במפורש - גם
+        # בגישה לשדה שנדחה וגם ברענון של מופע שהגוף שלו כבר נטען
+        if fields is None:
+            deferred = self.get_deferred_fields()
+            fields = [field.attname for field in self._meta.concrete_fields if field.attname not in deferred]
+        fields = list(fields)
+        if 'ai_generated_content' in fields:
+            fields.remove('ai_generated_content')
+            self.ai_generated_content = (
+                AssessmentReport.objects.with_content().using(using or self._state.db)
+                .values_list('ai_generated_content', flat=True).get(pk=self.pk)
+            )
+        if fields:
+            super().refresh_from_db(using=using, fields=fields)
+
+
+class ReportVersion(models.Model):
+    """גרסה שמורה של דוח: התוכן, הדרישות ופרטי העסק בזמן יצירתה"""
+    
+    report = models.ForeignKey(
+        AssessmentReport,
+        on_delete=models.CASCADE,
+        related_name='versions',
+        verbose_name="דוח",
+    )
+    number = models.PositiveIntegerField(verbose_name="מספר גרסה")
+    content = CompressedTextField(blank=True, verbose_name="תוכן")
+    requirement_ids = models.JSONField(default=list, verbose_name="דרישות")
+    assessment_snapshot = models.JSONField(default=dict, verbose_name="פרטי העסק")
+    corpus_version = models.BigIntegerField(default=0, verbose_name="גרסת מאגר הדרישות")
+    regenerated_sections = models.JSONField(
+        default=list,
+        verbose_name="סעיפים שנוצרו מחדש",
+        help_text="כותרות הסעיפים שנשלחו למודל; '*' = הדוח כולו",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="נוצר בתאריך")
+    
+    class Meta:
+        verbose_name = "גרסת דוח"
+        verbose_name_plural = "גרסאות דוח"
+        ordering = ['report', '-number']
+        constraints = [
+            models.UniqueConstraint(fields=['report', 'number'], name='unique_report_version'),
+        ]
+    
+    def __str__(self):
+        return f"דוח {self.report_id} - גרסה {self.number}"
+
+
+class StatCounter(models.Model):
+    """מונה סטטיסטי מצטבר - מתעדכן בהדרגה על ידי signals"""
+    
+    scope = models.CharField(max_length=50, verbose_name="מימד")
+    key = models.CharField(max_length=200, blank=True, verbose_name="ערך")
+    value = models.BigIntegerField(default=0, verbose_name="מונה")
+    
+    class Meta:
+        verbose_name = "מונה סטטיסטי"
+        verbose_name_plural = "מונים סטטיסטיים"
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_stat_scope_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope}:{self.key} = {self.value}"
+
+
+class RequirementChange(models.Model):
+    """
+    יומן שינויים במאגר הדרישות; המזהה של כל רשומה הוא גם מספר גרסת המאגר
+    """
+    
+    ACTION_CHOICES = [
+        ('created', 'נוצרה'),
+        ('updated', 'עודכנה'),
+        ('deleted', 'נמחקה'),
+    ]
+    
+    requirement_id = models.BigIntegerField(db_index=True, verbose_name="מזהה דרישה")
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name="פעולה")
+    before = models.JSONField(null=True, blank=True, verbose_name="לפני")
+    after = models.JSONField(null=True, blank=True, verbose_name="אחרי")
+    jurisdiction_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="רשות מקומית",
+        help_text="הרשות שהשינוי נוגע לה; ריק - שינוי ארצי שמשפיע על כל הרשויות",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="נוצר בתאריך")
+    applied_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name="הוחל בתאריך")
+    
+    class Meta:
+        verbose_name = "שינוי בדרישה"
+        verbose_name_plural = "שינויים בדרישות"
+        ordering = ['id']
+        indexes = [
+            # גרסת המאגר לרשות: MAX(id) בין השינויים שלה ושל הארציים
+            models.Index(fields=['jurisdiction_id', 'id'], name='change_jurisdiction_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.pk} {self.get_action_display()} - דרישה {self.requirement_id}"
+
+
+class RateBucket(models.Model):
+    """דלי אסימונים (token bucket) משותף לכל התהליכים להגבלת קצב"""
+    
+    key = models.CharField(max_length=200, unique=True, verbose_name="מפתח")
+    tokens = models.FloatField(verbose_name="אסימונים")
+    updated_at = models.FloatField(verbose_name="עודכן (epoch)")
+    
+    class Meta:
+        verbose_name = "דלי הגבלת קצב"
+        verbose_name_plural = "דליי הגבלת קצב"
+    
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.1f}"
+
+
+class SourceDocument(models.Model):
+    """מניפסט הקליטה: גיבוב התוכן של כל קובץ מקור שנקלט"""
+    
+    path = models.CharField(max_length=255, unique=True, verbose_name="נתיב")
+    content_hash = models.CharField(max_length=64, verbose_name="גיבוב תוכן")
+    row_count = models.IntegerField(default=0, verbose_name="מספר דרישות")
+    ingested_at = models.DateTimeField(auto_now=True, verbose_name="נקלט בתאריך")
+    
+    class Meta:
+        verbose_name = "מסמך מקור"
+        verbose_name_plural = "מסמכי מקור"
+        ordering = ['path']
+    
+    def __str__(self):
+        return f"{self.path} ({self.row_count})"
+
+
+class RequestProfile(models.Model):
+    """פרופיל של בקשה בודדת (cProfile + SQL) שנאסף לפי דרישה או בדגימה"""
+    
+    TRIGGER_CHOICES = [
+        ('header', 'כותרת X-Profile'),
+        ('query', 'פרמטר _profile'),
+        ('sample', 'דגימה'),
+    ]
+    
+    request_id = models.CharField(max_length=64, db_index=True, verbose_name="מזהה בקשה")
+    method = models.CharField(max_length=10, verbose_name="שיטה")
+    path = models.CharField(max_length=500, verbose_name="נתיב")
+    status_code = models.PositiveSmallIntegerField(verbose_name="קוד תגובה")
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES, verbose_name="הופעל על ידי")
+    duration_ms = models.FloatField(verbose_name="משך (ms)")
+    sql_count = models.PositiveIntegerField(default=0, verbose_name="שאילתות SQL")
+    sql_ms = models.FloatField(default=0, verbose_name="זמן SQL (ms)")
+    profile = models.JSONField(default=dict, verbose_name="פרופיל")
+    queries = models.JSONField(default=list, verbose_name="שאילתות")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="נוצר בתאריך")
+    
+    class Meta:
+        verbose_name = "פרופיל בקשה"
+        verbose_name_plural = "פרופילי בקשות"
+        ordering = ['-duration_ms']
+        indexes = [
+            models.Index(fields=['-duration_ms'], name='profile_duration_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class InFlightCall(models.Model):
+    """
+    lease של קריאה יוצאת משותפת (single-flight): בקשות זהות ממתינות לשורה
+    במקום לשלוח קריאה משלהן, וקוראות ממנה את התוצאה
+    """
+    
+    STATUS_CHOICES = [
+        ('running', 'בביצוע'),
+        ('done', 'הסתיים'),
+    ]
+    
+    key = models.CharField(max_length=64, unique=True, verbose_name="מפתח")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name="מצב")
+    owner = models.CharField(max_length=32, verbose_name="מבצע")
+    result = CompressedTextField(blank=True, verbose_name="תוצאה")
+    expires_at = models.FloatField(db_index=True, verbose_name="פג תוקף (epoch)")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="נוצר בתאריך")
+    
+    class Meta:
+        verbose_name = "קריאה משותפת בביצוע"
+        verbose_name_plural = "קריאות משותפות בביצוע"
     
     def __str__(self):
-        return f"דוח עבור {self.assessment.business_name}"
\ No newline at end of file
+        return f"{self.key[:12]} ({self.get_status_display()})"
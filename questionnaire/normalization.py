@@ -0,0 +1,52 @@
+"""
+נרמול שמות סוגי עסקים לצורך השוואה
+
+"בית-קפה", "בית קפה", "Café" ו-"cafe " הם אותו סוג. המפתח המנורמל נשמר
+בטבלה עם אילוץ ייחודיות, כך שווריאציות כתיב לא יוצרות סוגים כפולים.
+המודול אינו תלוי במודלים, כדי שאפשר יהיה להשתמש בו גם במיגרציות.
+"""
+import re
+import unicodedata
+
+_SEPARATORS_RE = re.compile(r'[\s_\-/\\.,;:()\[\]]+')
+_QUOTES_RE = re.compile(r'["\'`״׳]')
+
+# שם קנוני -> כינויים מוכרים (עברית ואנגלית)
+BUILTIN_ALIASES = {
+    'מסעדה': ['restaurant', 'מסעדות'],
+    'בר': ['bar', 'pub', 'פאב', 'בר/פאב', 'ברים'],
+    'בית קפה': ['cafe', 'coffee shop', 'קפה', 'בתי קפה'],
+    'מזון מהיר': ['fast food', 'fast_food'],
+}
+
+# קטגוריות לשימוש כשאין לסוג העסק דרישות משלו (לפי מפתח מנורמל)
+FALLBACK_CATEGORIES = {
+    'מסעדה': ['restaurant', 'health', 'safety'],
+    'בר': ['bar', 'safety'],
+    'בית קפה': ['restaurant', 'health'],
+}
+DEFAULT_FALLBACK_CATEGORIES = ['general', 'safety']
+
+
+def normalize_name(text):
+    """
+    מפתח השוואה: ללא ניקוד וסימנים מצורפים, אותיות קטנות, ללא גרשיים,
+    ומפרידים (רווח, מקף, קו תחתון, לוכסן) מאוחדים לרווח בודד
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = _QUOTES_RE.sub('', text.casefold())
+    return _SEPARATORS_RE.sub(' ', text).strip()
+
+
+def builtin_alias_keys():
+    """מפתח כינוי מנורמל -> מפתח השם הקנוני"""
+    return {
+        normalize_name(alias): normalize_name(name)
+        for name, aliases in BUILTIN_ALIASES.items()
+        for alias in aliases
+    }
+
+
+def fallback_categories(key):
+    return FALLBACK_CATEGORIES.get(key, DEFAULT_FALLBACK_CATEGORIES)
@@ -0,0 +1,110 @@
+"""
+תצוגה מקדימה של מספר הדרישות בזמן מילוי השאלון
+
+השטח ומספר המקומות מכומתים לטווחים שבין ערכי הסף של הדרישות: בתוך טווח
+כזה תוצאת ההתאמה זהה, ולכן אפשר לשמור את התשובה במטמון לפי מספר הטווח.
+מפתחות המטמון כוללים את הרשות ואת גרסת המחיצה שלה, כך ששינוי בדרישות של
+עיר אחת אינו מבטל את המטמון של ערים אחרות.
+"""
+import hashlib
+from bisect import bisect_right
+from collections import Counter
+
+from django.core.cache import cache
+
+from . import business_types
+from .corpus import jurisdiction_version, partition
+from .models import FEATURE_FLAGS, BusinessAssessment, LicensingRequirement
+from .rules import breakpoints as rule_breakpoints
+
+CACHE_TIMEOUT = 60 * 10
+MIN_VALUE = 1
+
+
+def requirement_breakpoints(version, jurisdiction_id=None):
+    """ערכי הסף של שטח ותפוסה במחיצת הרשות (נשמר במטמון לפי גרסת המחיצה)"""
+    key = f'preview:breakpoints:{jurisdiction_id or 0}:{version}'
+    points = cache.get(key)
+    if points is not None:
+        return points
+
+    area, capacity = set(), set()
+    rows = LicensingRequirement.objects.filter(partition(jurisdiction_id)).values_list(
+        'min_area', 'max_area', 'min_capacity', 'max_capacity', 'applicability_rule'
+    )
+    for min_area, max_area, min_capacity, max_capacity, rule in rows:
+        # min מתחיל טווח חדש בערך עצמו, max מסיים טווח אחרי הערך
+        if min_area is not None:
+            area.add(min_area)
+        if max_area is not None:
+            area.add(max_area + 1)
+        if min_capacity is not None:
+            capacity.add(min_capacity)
+        if max_capacity is not None:
+            capacity.add(max_capacity + 1)
+        if rule:
+            from_rule = rule_breakpoints(rule)
+            area |= from_rule['area']
+            capacity |= from_rule['capacity']
+
+    points = {'area': sorted(area), 'capacity': sorted(capacity)}
+    cache.set(key, points, CACHE_TIMEOUT)
+    return points
+
+
+def quantize(value, points):
+    """מיפוי ערך לטווח: (מספר הטווח, ערך מייצג מתוך הטווח)"""
+    if value is None:
+        # שדה שעוד לא מולא - ללא סינון לפי גודל
+        return 'any', None
+    bucket = bisect_right(points, value)
+    representative = points[bucket - 1] if bucket else MIN_VALUE
+    return bucket, representative
+
+
+def preview_counts(business_type_value, area, capacity, features, jurisdiction_value=''):
+    """
+    ספירת הדרישות שיתאימו לתשובות החלקיות, לפי עדיפות וקטגוריה
+
+    Args:
+        business_type_value: מזהה או שם סוג העסק
+        area, capacity: מספרים שלמים או None אם עוד לא מולאו
+        features: מילון שדה מאפיין -> bool
+        jurisdiction_value: מזהה, קוד או שם הרשות (ריק - ארצי בלבד)
+    """
+    from .views import find_relevant_requirements, resolve_jurisdiction
+
+    if not business_type_value:
+        return None
+    jurisdiction = resolve_jurisdiction(jurisdiction_value)
+    jurisdiction_id = jurisdiction.pk if jurisdiction else None
+    version = jurisdiction_version(jurisdiction_id)
+    points = requirement_breakpoints(version, jurisdiction_id)
+    area_bucket, area_value = quantize(area, points['area'])
+    capacity_bucket, capacity_value = quantize(capacity, points['capacity'])
+    mask = sum(bit for _, field, bit in FEATURE_FLAGS if features.get(field))
+
+    # כינויים ווריאציות כתיב של אותו סוג חולקים רשומת מטמון אחת; סוג שעדיין
+    # לא קיים הוא מופע לא שמור, וההתאמה עוברת לקטגוריות ברירת המחדל
+    business_type = business_types.resolve(business_type_value) or business_types.unsaved_type(business_type_value)
+    type_key = business_type.pk or hashlib.md5(business_type.key.encode('utf-8')).hexdigest()
+    key = f'preview:{jurisdiction_id or 0}:{version}:{type_key}:{area_bucket}:{capacity_bucket}:{mask}'
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    assessment = BusinessAssessment(
+        business_type=business_type,
+        jurisdiction=jurisdiction,
+        area_sqm=area_value,
+        seating_capacity=capacity_value,
+        **{field: bool(features.get(field)) for _, field, _ in FEATURE_FLAGS},
+    )
+    requirements = find_relevant_requirements(assessment)
+    result = {
+        'total': len(requirements),
+        'by_priority': dict(Counter(req.priority for req in requirements)),
+        'by_category': dict(Counter(req.category for req in requirements)),
+    }
+    cache.set(key, result, CACHE_TIMEOUT)
+    return result
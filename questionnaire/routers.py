@@ -0,0 +1,27 @@
+"""
+ניתוב מסדי נתונים: מסד הארכיון מכיל רק את טבלאות השאלון
+
+קריאה וכתיבה לארכיון נעשות רק במפורש (using('archive')); אובייקט שנטען
+מהארכיון ממשיך לקרוא את הקשרים שלו מאותו מסד.
+"""
+
+ARCHIVE_DB = 'archive'
+
+
+class ArchiveRouter:
+
+    def db_for_read(self, model, **hints):
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if ARCHIVE_DB in (obj1._state.db, obj2._state.db):
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == ARCHIVE_DB:
+            return app_label == 'questionnaire'
+        return None
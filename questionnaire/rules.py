@@ -0,0 +1,268 @@
+"""
+שפת כללי תחולה לדרישות רישוי
+
+כלל הוא ביטוי בוליאני קצר על מאפייני העסק, למשל:
+
+    gas AND area > 200
+    alcohol OR (outdoor AND capacity > 50)
+    NOT delivery AND שטח <= 100
+
+משתנים בוליאניים: gas, meat, delivery, outdoor, alcohol
+משתנים מספריים: area (שטח במ"ר), capacity (מקומות ישיבה)
+אופרטורים: AND, OR, NOT, סוגריים, והשוואות > >= < <= = !=
+
+כל כלל מנותח ומהודר פעם אחת לפונקציה (predicate) שנשמרת במטמון, וניתן
+להדר אותו גם לביטוי polars לצורך הערכה על טבלה שלמה.
+"""
+import operator
+import re
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError
+
+# שם משתנה בכלל -> (שדה בהערכת העסק, סוג)
+VARIABLES = {
+    'gas': ('uses_gas', bool),
+    'meat': ('serves_meat', bool),
+    'delivery': ('offers_delivery', bool),
+    'outdoor': ('has_outdoor_seating', bool),
+    'alcohol': ('serves_alcohol', bool),
+    'area': ('area_sqm', int),
+    'capacity': ('seating_capacity', int),
+}
+
+# כינויים נוספים (כולל עברית)
+ALIASES = {
+    'seats': 'capacity',
+    'גז': 'gas',
+    'בשר': 'meat',
+    'משלוחים': 'delivery',
+    'חוץ': 'outdoor',
+    'אלכוהול': 'alcohol',
+    'שטח': 'area',
+    'תפוסה': 'capacity',
+}
+
+KEYWORDS = {
+    'and': 'AND', 'וגם': 'AND', '&&': 'AND',
+    'or': 'OR', 'או': 'OR', '||': 'OR',
+    'not': 'NOT', 'לא': 'NOT', '!': 'NOT',
+}
+
+COMPARISONS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+_TOKEN_RE = re.compile(r'\s*(?:(\d+)|(>=|<=|==|!=|&&|\|\||[><=!()])|([^\W\d]\w*))', re.UNICODE)
+
+
+class RuleSyntaxError(ValueError):
+    """שגיאה בניתוח כלל תחולה"""
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match or match.end() == position:
+            raise RuleSyntaxError(f"תו לא צפוי במיקום {position}: '{text[position]}'")
+        number, symbol, word = match.groups()
+        if number is not None:
+            tokens.append(('NUM', int(number)))
+        elif symbol in KEYWORDS:
+            tokens.append((KEYWORDS[symbol], symbol))
+        elif symbol is not None:
+            tokens.append(('OP' if symbol not in '()' else symbol, symbol))
+        else:
+            lowered = word.lower()
+            if lowered in KEYWORDS:
+                tokens.append((KEYWORDS[lowered], word))
+            else:
+                name = ALIASES.get(lowered, lowered)
+                if name not in VARIABLES:
+                    raise RuleSyntaxError(f"משתנה לא מוכר: '{word}'")
+                tokens.append(('VAR', name))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """מנתח recursive-descent שמחזיר עץ ביטוי מ-tuples"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self, kind=None):
+        if self.position >= len(self.tokens):
+            raise RuleSyntaxError("הכלל הסתיים באמצע ביטוי")
+        token = self.tokens[self.position]
+        if kind and token[0] != kind:
+            raise RuleSyntaxError(f"צפוי {kind} אך נמצא '{token[1]}'")
+        self.position += 1
+        return token
+
+    def parse(self):
+        tree = self.parse_or()
+        if self.position != len(self.tokens):
+            raise RuleSyntaxError(f"טקסט מיותר בסוף הכלל: '{self.tokens[self.position][1]}'")
+        return tree
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == 'OR':
+            self.take()
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == 'AND':
+            self.take()
+            node = ('and', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() == 'NOT':
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        if self.peek() == '(':
+            self.take('(')
+            node = self.parse_or()
+            self.take(')')
+            return node
+        _, name = self.take('VAR')
+        _, kind = VARIABLES[name]
+        if self.peek() == 'OP':
+            _, symbol = self.take('OP')
+            if symbol not in COMPARISONS:
+                raise RuleSyntaxError(f"אופרטור לא חוקי: '{symbol}'")
+            _, value = self.take('NUM')
+            if kind is not int:
+                raise RuleSyntaxError(f"לא ניתן להשוות את המשתנה הבוליאני '{name}'")
+            return ('cmp', name, symbol, value)
+        if kind is not bool:
+            raise RuleSyntaxError(f"המשתנה המספרי '{name}' דורש השוואה (למשל {name} > 100)")
+        return ('var', name)
+
+
+def parse(text):
+    """ניתוח כלל לעץ ביטוי"""
+    tokens = tokenize(text)
+    if not tokens:
+        raise RuleSyntaxError("כלל ריק")
+    return _Parser(tokens).parse()
+
+
+def _build(node):
+    kind = node[0]
+    if kind == 'var':
+        name = node[1]
+        return lambda profile: bool(profile[name])
+    if kind == 'cmp':
+        _, name, symbol, value = node
+        compare = COMPARISONS[symbol]
+        # ערך חסר (למשל בתצוגה מקדימה חלקית) אינו מקיים אף השוואה
+        return lambda profile: profile[name] is not None and compare(profile[name], value)
+    if kind == 'not':
+        inner = _build(node[1])
+        return lambda profile: not inner(profile)
+    left, right = _build(node[1]), _build(node[2])
+    if kind == 'and':
+        return lambda profile: left(profile) and right(profile)
+    return lambda profile: left(profile) or right(profile)
+
+
+@lru_cache(maxsize=1024)
+def compile_rule(text):
+    """הידור כלל לפונקציה profile -> bool (נשמר במטמון לפי טקסט הכלל)"""
+    return _build(parse(text))
+
+
+def compile_polars(text):
+    """
+    הידור כלל לביטוי polars על עמודות הערכת העסק
+
+    ערכים חסרים מתנהגים כמו ב-compile_rule: משתנה חסר הוא False ואינו
+    מקיים אף השוואה, כך שגם NOT עליו מחזיר True.
+    """
+    import polars as pl
+
+    def build(node):
+        kind = node[0]
+        if kind == 'var':
+            return pl.col(VARIABLES[node[1]][0]).fill_null(False).cast(pl.Boolean)
+        if kind == 'cmp':
+            _, name, symbol, value = node
+            return COMPARISONS[symbol](pl.col(VARIABLES[name][0]), value).fill_null(False)
+        if kind == 'not':
+            return ~build(node[1])
+        if kind == 'and':
+            return build(node[1]) & build(node[2])
+        return build(node[1]) | build(node[2])
+
+    return build(parse(text))
+
+
+def breakpoints(text):
+    """
+    ערכי הסף המספריים שבכלל: לכל משתנה מספרי, הערכים שבהם תוצאת
+    ההשוואה עשויה להשתנות (הערך הקטן ביותר בכל טווח חדש)
+    """
+    points = {name: set() for name, (_, kind) in VARIABLES.items() if kind is int}
+
+    def walk(node):
+        kind = node[0]
+        if kind == 'cmp':
+            _, name, symbol, value = node
+            if symbol in ('>', '<='):
+                points[name].add(value + 1)
+            elif symbol in ('>=', '<'):
+                points[name].add(value)
+            else:
+                points[name].update((value, value + 1))
+        elif kind in ('and', 'or'):
+            walk(node[1])
+            walk(node[2])
+        elif kind == 'not':
+            walk(node[1])
+
+    if text:
+        walk(parse(text))
+    return points
+
+
+def profile_from_assessment(assessment):
+    """בניית פרופיל להערכת כללים מהערכת עסק (או כל אובייקט עם אותם שדות)"""
+    return {name: getattr(assessment, field) for name, (field, _) in VARIABLES.items()}
+
+
+def rule_matches(text, profile):
+    """האם כלל חל על הפרופיל; כלל ריק חל תמיד"""
+    if not text:
+        return True
+    return compile_rule(text)(profile)
+
+
+def validate_rule(value):
+    """Validator לשדה כלל תחולה"""
+    if not value:
+        return
+    try:
+        parse(value)
+    except RuleSyntaxError as e:
+        raise ValidationError(f"כלל תחולה לא תקין: {e}")
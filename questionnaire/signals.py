@@ -0,0 +1,136 @@
+"""
+Signals לעדכון הדרגתי של המונים הסטטיסטיים
+"""
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import business_types, corpus, stats
+from .models import AssessmentReport, BusinessType, BusinessTypeAlias, LicensingRequirement
+
+
+def _tracked(sender, using):
+    return sender in stats.CONTRIBUTORS and using == DEFAULT_DB_ALIAS and not stats.is_suspended()
+
+
+@receiver(pre_save)
+def remember_stat_contributions(sender, instance, raw, using, **kwargs):
+    """שמירת התרומה הקודמת של הרשומה לפני עדכון"""
+    if raw or not _tracked(sender, using):
+        return
+    instance._stats_old_keys = []
+    if instance.pk is None:
+        return
+    previous = sender._base_manager.using(using).filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._stats_old_keys = stats.CONTRIBUTORS[sender](previous)
+
+
+@receiver(post_save)
+def update_stats_on_save(sender, instance, raw, using, **kwargs):
+    if raw or not _tracked(sender, using):
+        return
+    old_keys = getattr(instance, '_stats_old_keys', [])
+    stats.apply_diff(old_keys, stats.CONTRIBUTORS[sender](instance))
+    instance._stats_old_keys = []
+
+
+@receiver(post_delete)
+def update_stats_on_delete(sender, instance, using, **kwargs):
+    if not _tracked(sender, using):
+        return
+    stats.apply_diff(stats.CONTRIBUTORS[sender](instance), [])
+
+
+def _links_enabled(using):
+    return using == DEFAULT_DB_ALIAS and not stats.is_suspended()
+
+
+@receiver(m2m_changed, sender=AssessmentReport.relevant_requirements.through)
+def update_requirement_links(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """מעקב אחר מספר הקישורים בין דוחות לדרישות"""
+    if not _links_enabled(using):
+        return
+    own_field, other_field = (
+        ('licensingrequirement', 'assessmentreport') if reverse
+        else ('assessmentreport', 'licensingrequirement')
+    )
+    links = sender.objects.using(using).filter(**{own_field: instance.pk})
+    if action == 'post_add':
+        # ב-post_add מועברים רק המזהים שנוספו בפועל
+        stats.bump(stats.REPORT_REQUIREMENT_LINKS, '', len(pk_set or ()))
+    elif action == 'pre_remove':
+        removed = links.filter(**{f'{other_field}__in': pk_set or ()}).count()
+        stats.bump(stats.REPORT_REQUIREMENT_LINKS, '', -removed)
+    elif action == 'pre_clear':
+        stats.bump(stats.REPORT_REQUIREMENT_LINKS, '', -links.count())
+
+
+@receiver(pre_delete, sender=AssessmentReport)
+@receiver(pre_delete, sender=LicensingRequirement)
+def forget_report_links(sender, instance, using, **kwargs):
+    """מחיקת דוח או דרישה מוחקת את הקישורים ביניהם ללא m2m_changed"""
+    if not _links_enabled(using):
+        return
+    through = AssessmentReport.relevant_requirements.through
+    own_field = 'assessmentreport' if sender is AssessmentReport else 'licensingrequirement'
+    removed = through.objects.using(using).filter(**{own_field: instance.pk}).count()
+    stats.bump(stats.REPORT_REQUIREMENT_LINKS, '', -removed)
+
+
+def _corpus_tracked(using, raw=False):
+    return using == DEFAULT_DB_ALIAS and not raw
+
+
+@receiver(pre_save, sender=LicensingRequirement)
+def remember_requirement_snapshot(sender, instance, raw, using, **kwargs):
+    """תמונת מצב של הדרישה לפני עדכון, ליומן השינויים"""
+    if not _corpus_tracked(using, raw):
+        return
+    previous = sender._base_manager.using(using).filter(pk=instance.pk).first() if instance.pk else None
+    instance._corpus_before = corpus.snapshot(previous) if previous is not None else None
+
+
+@receiver(post_save, sender=LicensingRequirement)
+def log_requirement_save(sender, instance, created, raw, using, **kwargs):
+    if not _corpus_tracked(using, raw):
+        return
+    before = getattr(instance, '_corpus_before', None)
+    action = 'updated' if before is not None else 'created'
+    corpus.record_change(instance.pk, action, before, corpus.snapshot(instance))
+
+
+@receiver(pre_delete, sender=LicensingRequirement)
+def log_requirement_delete(sender, instance, using, **kwargs):
+    if not _corpus_tracked(using):
+        return
+    before = corpus.snapshot(instance)
+    # הקישורים לדוחות נמחקים יחד עם הדרישה - הדוחות שציטטו אותה נשמרים כאן
+    before['reports'] = sorted(
+        AssessmentReport.relevant_requirements.through.objects.using(using)
+        .filter(licensingrequirement=instance.pk).values_list('assessmentreport_id', flat=True)
+    )
+    corpus.record_change(instance.pk, 'deleted', before, None)
+
+
+@receiver(m2m_changed, sender=LicensingRequirement.business_types.through)
+def log_requirement_business_types(sender, instance, action, reverse, using, **kwargs):
+    """שינוי בסוגי העסקים של דרישה משנה את אוכלוסיית ההתאמה שלה"""
+    # עדכון מצד סוג העסק (reverse) אינו נעשה בממשקי המערכת
+    if reverse or not _corpus_tracked(using):
+        return
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        instance._corpus_before = corpus.snapshot(instance)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        corpus.record_change(
+            instance.pk, 'updated', getattr(instance, '_corpus_before', None), corpus.snapshot(instance)
+        )
+
+
+@receiver(post_save, sender=BusinessType)
+@receiver(post_delete, sender=BusinessType)
+@receiver(post_save, sender=BusinessTypeAlias)
+@receiver(post_delete, sender=BusinessTypeAlias)
+def invalidate_business_types(sender, using, **kwargs):
+    """מילון סוגי העסקים בזיכרון נבנה מחדש בשימוש הבא"""
+    business_types.invalidate(using=using)
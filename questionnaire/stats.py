@@ -0,0 +1,230 @@
+"""
+סטטיסטיקות מצטברות עבור לוח הבקרה התפעולי
+
+כל רשומה תורמת +1 לקבוצה קטנה של מונים (scope, key). ה-signals מחשבים את
+התרומה לפני ואחרי השינוי ומעדכנים רק את ההפרש, כך שקריאת לוח הבקרה
+אינה תלויה בגודל הטבלאות.
+
+מוני ההערכות והדוחות הם סכומים לכל התקופה: ארכוב מעביר שורות לארכיון
+בלי להקטין אותם, והחישוב מחדש סופר גם את הארכיון.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, models, transaction
+
+from .models import (
+    FEATURE_FLAGS,
+    AssessmentReport,
+    BusinessAssessment,
+    LicensingRequirement,
+    StatCounter,
+)
+
+# מימדים
+ASSESSMENT_TOTAL = 'assessment_total'
+ASSESSMENT_BY_TYPE = 'assessment_by_type'
+ASSESSMENT_BY_FEATURE = 'assessment_by_feature'
+ASSESSMENT_BY_AREA_BAND = 'assessment_by_area_band'
+REPORT_TOTAL = 'report_total'
+REPORT_REQUIREMENT_LINKS = 'report_requirement_links'
+REQUIREMENT_TOTAL = 'requirement_total'
+REQUIREMENT_BY_AUTHORITY = 'requirement_by_authority'
+REQUIREMENT_BY_CATEGORY = 'requirement_by_category'
+REQUIREMENT_BY_PRIORITY = 'requirement_by_priority'
+
+# מימדים שנגזרים מהטבלאות וניתנים לבנייה מחדש; מונים אחרים (למשל בקרת
+# כניסה) הם מדדים תפעוליים ו-rebuild אינו נוגע בהם
+DERIVED_SCOPES = [
+    ASSESSMENT_TOTAL, ASSESSMENT_BY_TYPE, ASSESSMENT_BY_FEATURE, ASSESSMENT_BY_AREA_BAND,
+    REPORT_TOTAL, REPORT_REQUIREMENT_LINKS,
+    REQUIREMENT_TOTAL, REQUIREMENT_BY_AUTHORITY, REQUIREMENT_BY_CATEGORY, REQUIREMENT_BY_PRIORITY,
+]
+
+# טווחי שטח (במ"ר) - גבול עליון כולל, None = ללא גבול
+AREA_BANDS = [
+    (50, 'עד 50'),
+    (100, '51-100'),
+    (200, '101-200'),
+    (500, '201-500'),
+    (None, 'מעל 500'),
+]
+
+_suspended = ContextVar('stats_suspended', default=False)
+
+
+@contextmanager
+def suspended():
+    """השבתה זמנית של עדכון המונים (למשל בזמן rebuild)"""
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def is_suspended():
+    return _suspended.get()
+
+
+def area_band(area_sqm):
+    """מיפוי שטח לטווח"""
+    for upper, label in AREA_BANDS:
+        if upper is None or area_sqm <= upper:
+            return label
+    return AREA_BANDS[-1][1]
+
+
+def assessment_contributions(assessment):
+    """המונים שהערכת עסק תורמת להם"""
+    keys = [
+        (ASSESSMENT_TOTAL, ''),
+        (ASSESSMENT_BY_TYPE, str(assessment.business_type_id)),
+        (ASSESSMENT_BY_AREA_BAND, area_band(assessment.area_sqm)),
+    ]
+    for _, field, _ in FEATURE_FLAGS:
+        if getattr(assessment, field):
+            keys.append((ASSESSMENT_BY_FEATURE, field))
+    return keys
+
+
+def report_contributions(report):
+    """המונים שדוח תורם להם"""
+    return [(REPORT_TOTAL, '')]
+
+
+def requirement_contributions(requirement):
+    """המונים שדרישת רישוי תורמת להם"""
+    return [
+        (REQUIREMENT_TOTAL, ''),
+        (REQUIREMENT_BY_AUTHORITY, requirement.authority or ''),
+        (REQUIREMENT_BY_CATEGORY, requirement.category),
+        (REQUIREMENT_BY_PRIORITY, requirement.priority),
+    ]
+
+
+CONTRIBUTORS = {
+    BusinessAssessment: assessment_contributions,
+    AssessmentReport: report_contributions,
+    LicensingRequirement: requirement_contributions,
+}
+
+
+def bump(scope, key, delta):
+    """עדכון אטומי של מונה בודד"""
+    if not delta:
+        return
+    updated = StatCounter.objects.filter(scope=scope, key=key).update(
+        value=models.F('value') + delta
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            StatCounter.objects.create(scope=scope, key=key, value=delta)
+    except IntegrityError:
+        # נוצר במקביל על ידי בקשה אחרת
+        StatCounter.objects.filter(scope=scope, key=key).update(
+            value=models.F('value') + delta
+        )
+
+
+def apply_diff(old_keys, new_keys):
+    """עדכון המונים לפי ההפרש בין התרומה הישנה לחדשה"""
+    diff = Counter(new_keys)
+    diff.subtract(Counter(old_keys))
+    for (scope, key), delta in diff.items():
+        bump(scope, key, delta)
+
+
+def _count_assessments(using):
+    """המונים של ההערכות והדוחות במסד אחד"""
+    counts = Counter()
+
+    assessments = BusinessAssessment.objects.using(using)
+    counts[(ASSESSMENT_TOTAL, '')] = assessments.count()
+    for row in assessments.values('business_type_id').annotate(n=models.Count('id')):
+        counts[(ASSESSMENT_BY_TYPE, str(row['business_type_id']))] = row['n']
+    for _, field, _ in FEATURE_FLAGS:
+        counts[(ASSESSMENT_BY_FEATURE, field)] = assessments.filter(**{field: True}).count()
+
+    band_case = models.Case(
+        *[
+            models.When(area_sqm__lte=upper, then=models.Value(label))
+            for upper, label in AREA_BANDS if upper is not None
+        ],
+        default=models.Value(AREA_BANDS[-1][1]),
+        output_field=models.CharField(),
+    )
+    for row in assessments.annotate(band=band_case).values('band').annotate(n=models.Count('id')):
+        counts[(ASSESSMENT_BY_AREA_BAND, row['band'])] = row['n']
+
+    counts[(REPORT_TOTAL, '')] = AssessmentReport.objects.using(using).count()
+    counts[(REPORT_REQUIREMENT_LINKS, '')] = (
+        AssessmentReport.relevant_requirements.through.objects.using(using).count()
+    )
+    return counts
+
+
+def compute_from_scratch():
+    """חישוב כל המונים מחדש ישירות מהטבלאות (הערכות ודוחות - כולל הארכיון)"""
+    from .archive import archive_ready
+    from .routers import ARCHIVE_DB
+
+    counts = _count_assessments(DEFAULT_DB_ALIAS)
+    if archive_ready():
+        counts.update(_count_assessments(ARCHIVE_DB))
+
+    requirements = LicensingRequirement.objects.all()
+    counts[(REQUIREMENT_TOTAL, '')] = requirements.count()
+    for scope, field in [
+        (REQUIREMENT_BY_AUTHORITY, 'authority'),
+        (REQUIREMENT_BY_CATEGORY, 'category'),
+        (REQUIREMENT_BY_PRIORITY, 'priority'),
+    ]:
+        for row in requirements.order_by().values(field).annotate(n=models.Count('id')):
+            counts[(scope, row[field] or '')] = row['n']
+
+    return {key: value for key, value in counts.items() if value}
+
+
+def current_counters():
+    """המונים הנגזרים השמורים כרגע"""
+    return {
+        (scope, key): value
+        for scope, key, value in StatCounter.objects.filter(
+            scope__in=DERIVED_SCOPES
+        ).values_list('scope', 'key', 'value')
+        if value
+    }
+
+
+def diff_counters(expected, actual):
+    """השוואה בין מונים מחושבים לשמורים - מחזירה (מפתח, צפוי, בפועל)"""
+    return [
+        (key, expected.get(key, 0), actual.get(key, 0))
+        for key in sorted(set(expected) | set(actual))
+        if expected.get(key, 0) != actual.get(key, 0)
+    ]
+
+
+def rebuild():
+    """בנייה מחדש של טבלת המונים; מחזיר את ההפרשים שנמצאו"""
+    with transaction.atomic():
+        expected = compute_from_scratch()
+        differences = diff_counters(expected, current_counters())
+        StatCounter.objects.filter(scope__in=DERIVED_SCOPES).delete()
+        StatCounter.objects.bulk_create(
+            StatCounter(scope=scope, key=key, value=value)
+            for (scope, key), value in expected.items()
+        )
+    return differences
+
+
+def dashboard_data():
+    """נתוני לוח הבקרה - נקראים מטבלת המונים בלבד"""
+    data = {}
+    for scope, key, value in StatCounter.objects.values_list('scope', 'key', 'value'):
+        data.setdefault(scope, {})[key] = value
+    return data
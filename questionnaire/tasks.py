@@ -0,0 +1,56 @@
+"""
+משימות רקע - ביצוע עבודה ארוכה מחוץ ל-thread של הבקשה
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# מאגר threads משותף לתהליך; מוגבל כדי לא להציף את ה-API
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='report-worker')
+
+
+def run_in_background(func, *args, **kwargs):
+    """הרצת פונקציה ב-thread רקע עם ניהול חיבורי DB"""
+    def _job():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            logger.exception("Background task %s failed", getattr(func, '__name__', func))
+        finally:
+            close_old_connections()
+    return _executor.submit(_job)
+
+
+def regenerate_report(report_id):
+    """יצירה מחדש של דוח: התאמת דרישות מחדש וקריאה ל-AI"""
+    from services.ai_service import generate_ai_report
+    from services.report_sections import FULL_REGENERATION
+    from .corpus import current_version
+    from .editing import ensure_initial_version, record_version
+    from .models import AssessmentReport
+    from .views import find_relevant_requirements
+
+    report = AssessmentReport.objects.with_content().select_related(
+        'assessment', 'assessment__business_type'
+    ).get(pk=report_id)
+    corpus_version = current_version()
+    relevant_requirements = find_relevant_requirements(report.assessment)
+    content = generate_ai_report(report.assessment, relevant_requirements)
+    ensure_initial_version(report)
+    report.corpus_version = corpus_version
+    report.ai_generated_content = content
+    report.needs_regeneration = False
+    report.save(update_fields=['ai_generated_content', 'corpus_version', 'needs_regeneration'])
+    report.relevant_requirements.set(relevant_requirements)
+    record_version(report, [FULL_REGENERATION])
+    logger.info("Report %s regenerated with %d requirements", report_id, len(relevant_requirements))
+    return report
+
+
+def regenerate_reports_async(report_ids):
+    """תזמון יצירה מחדש של מספר דוחות ברקע"""
+    return [run_in_background(regenerate_report, report_id) for report_id in report_ids]
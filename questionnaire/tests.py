@@ -1,3 +1,1259 @@
-from django.test import TestCase
+import csv
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from business_licensing.logging_utils import RedactingFilter, RequestIdFilter, SamplingFilter
+from data_processing import amounts, dedup, thresholds
+from services import (
+    admission, ai_service, bulk_export, llm_backends, report_export, report_sections, retrieval, single_flight,
+)
+
+from . import archive, business_types, compliance, corpus, costs, editing, ingest, preview, rules, stats
+from .models import (
+    BusinessType, BusinessTypeAlias, BusinessAssessment, Jurisdiction, LicensingRequirement, AssessmentReport, ReportVersion,
+    InFlightCall, RequestProfile, RequirementChange, StatCounter,
+)
+from .views import OWNED_REPORTS_SESSION_KEY, find_relevant_requirements, sized_requirements
+
+
+def make_assessment(business_type, **kwargs):
+    """יצירת הערכת עסק לבדיקות"""
+    data = {
+        'business_name': 'מסעדת בדיקה',
+        'business_type': business_type,
+        'area_sqm': 120,
+        'seating_capacity': 40,
+    }
+    data.update(kwargs)
+    return BusinessAssessment.objects.create(**data)
+
+
+class FeatureMaskTests(TestCase):
+
+    def setUp(self):
+        self.restaurant = BusinessType.objects.create(name='מסעדה')
+
+    def test_mask_kept_in_sync_on_save(self):
+        req = LicensingRequirement.objects.create(
+            title='אישור גז', description='אישור גז', requires_gas=True, alcohol_related=True
+        )
+        self.assertEqual(req.feature_mask, 0b10001)
+
+        req.requires_gas = False
+        req.save(update_fields=['requires_gas'])
+        req.refresh_from_db()
+        self.assertEqual(req.feature_mask, 0b10000)
+
+    def test_flag_filtering_runs_in_sql(self):
+        gas = LicensingRequirement.objects.create(title='גז', description='גז', requires_gas=True)
+        plain = LicensingRequirement.objects.create(title='כללי', description='כללי')
+        for req in (gas, plain):
+            req.business_types.add(self.restaurant)
+
+        without_gas = make_assessment(self.restaurant)
+        with_gas = make_assessment(self.restaurant, uses_gas=True)
+
+        self.assertEqual(find_relevant_requirements(without_gas), [plain])
+        self.assertCountEqual(find_relevant_requirements(with_gas), [gas, plain])
+
+
+class QueryPlanTests(TestCase):
+    """בדיקת EXPLAIN QUERY PLAN עבור השאילתות החמות"""
+
+    def test_category_filter_uses_index(self):
+        plan = LicensingRequirement.objects.filter(
+            category='restaurant', min_area__lte=100
+        ).explain()
+        self.assertIn('req_category_area_idx', plan)
+
+    def test_assessment_ordering_uses_index(self):
+        plan = BusinessAssessment.objects.all()[:20].explain()
+        self.assertIn('assessment_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class IncrementalStatsTests(TestCase):
+    databases = {'default', 'archive'}
+
+    def test_counters_match_rebuild(self):
+        restaurant = BusinessType.objects.create(name='מסעדה')
+        req = LicensingRequirement.objects.create(
+            title='רישיון', description='רישיון', authority='משרד הבריאות', priority='high'
+        )
+        assessment = make_assessment(restaurant, uses_gas=True)
+        report = AssessmentReport.objects.create(assessment=assessment)
+        report.relevant_requirements.add(req)
+
+        assessment.area_sqm = 600
+        assessment.uses_gas = False
+        assessment.save()
+        req.priority = 'low'
+        req.save()
+        make_assessment(restaurant).delete()
+
+        counters = stats.current_counters()
+        self.assertEqual(counters[(stats.ASSESSMENT_BY_AREA_BAND, 'מעל 500')], 1)
+        self.assertNotIn((stats.ASSESSMENT_BY_FEATURE, 'uses_gas'), counters)
+        self.assertEqual(stats.diff_counters(stats.compute_from_scratch(), counters), [])
+
+        assessment.delete()
+        self.assertEqual(stats.diff_counters(stats.compute_from_scratch(), stats.current_counters()), [])
+
+
+class ApplicabilityRuleTests(TestCase):
+
+    def test_compiled_rule_evaluation(self):
+        profile = {'gas': True, 'meat': False, 'delivery': False, 'outdoor': True,
+                   'alcohol': False, 'area': 250, 'capacity': 60}
+        self.assertTrue(rules.rule_matches('gas AND area > 200', profile))
+        self.assertTrue(rules.rule_matches('alcohol OR (outdoor AND capacity > 50)', profile))
+        self.assertFalse(rules.rule_matches('NOT גז OR שטח <= 100', profile))
+        self.assertIs(rules.compile_rule('gas'), rules.compile_rule('gas'))
+
+    def test_invalid_rules_rejected(self):
+        for text in ['area', 'gas > 3', 'gas AND', '(gas', 'size > 1']:
+            with self.assertRaises(ValidationError, msg=text):
+                rules.validate_rule(text)
+
+    def test_polars_expression_matches_predicate(self):
+        import polars as pl
+
+        frame = pl.DataFrame({
+            'uses_gas': [True, False, True], 'serves_meat': [False] * 3,
+            'offers_delivery': [False] * 3, 'has_outdoor_seating': [False, True, True],
+            'serves_alcohol': [False] * 3, 'area_sqm': [300, 50, 100], 'seating_capacity': [10, 80, 20],
+        })
+        rule = 'gas AND area > 200 OR outdoor AND capacity > 50'
+        self.assertEqual(frame.select(rules.compile_polars(rule)).to_series().to_list(), [True, True, False])
+
+        # ערך חסר אינו מקיים השוואה, כמו ב-compile_rule
+        partial = pl.DataFrame({'area_sqm': [None, 300]}, schema={'area_sqm': pl.Int64})
+        for rule in ('area > 200', 'NOT area > 200'):
+            expected = [rules.rule_matches(rule, {'area': value}) for value in (None, 300)]
+            self.assertEqual(partial.select(rules.compile_polars(rule)).to_series().to_list(), expected)
+
+    def test_rules_applied_in_matching(self):
+        restaurant = BusinessType.objects.create(name='מסעדה')
+        large_gas = LicensingRequirement.objects.create(
+            title='גז בשטח גדול', description='גז', applicability_rule='gas AND area > 200'
+        )
+        large_gas.business_types.add(restaurant)
+
+        self.assertEqual(find_relevant_requirements(make_assessment(restaurant, uses_gas=True)), [])
+        self.assertEqual(
+            find_relevant_requirements(make_assessment(restaurant, uses_gas=True, area_sqm=300)),
+            [large_gas],
+        )
+
+
+class IncrementalRematchTests(TestCase):
+
+    def test_only_affected_reports_flagged(self):
+        restaurant = BusinessType.objects.create(name='מסעדה')
+        small = make_assessment(restaurant, area_sqm=40)
+        large = make_assessment(restaurant, area_sqm=400)
+        reports = {}
+        for assessment in (small, large):
+            reports[assessment.pk] = AssessmentReport.objects.create(
+                assessment=assessment, corpus_version=corpus.current_version()
+            )
+        corpus.apply_pending_changes()
+
+        req = LicensingRequirement.objects.create(title='שטח גדול', description='שטח גדול', min_area=200)
+        req.business_types.add(restaurant)
+        self.assertEqual(corpus.affected_assessment_ids(RequirementChange.objects.last()), {large.pk})
+
+        result = corpus.apply_pending_changes()
+        self.assertEqual(result['flagged'], 1)
+        large_report = AssessmentReport.objects.get(assessment=large)
+        self.assertTrue(large_report.needs_regeneration)
+        self.assertEqual(list(large_report.relevant_requirements.all()), [req])
+        self.assertFalse(AssessmentReport.objects.get(assessment=small).needs_regeneration)
+        self.assertFalse(RequirementChange.objects.filter(applied_at__isnull=True).exists())
+
+    def test_rule_evaluated_over_candidates_in_batches(self):
+        restaurant = BusinessType.objects.create(name='מסעדה')
+        gas_large = make_assessment(restaurant, area_sqm=300, uses_gas=True)
+        make_assessment(restaurant, area_sqm=300, uses_gas=False)
+        make_assessment(restaurant, area_sqm=50, uses_gas=True)
+        for assessment in BusinessAssessment.objects.all():
+            AssessmentReport.objects.create(assessment=assessment, corpus_version=corpus.current_version())
+
+        candidates = BusinessAssessment.objects.all()
+        self.assertEqual(list(corpus._rule_matching_ids(candidates, 'gas AND area > 200', batch_size=2)), [gas_large.pk])
+
+        req = LicensingRequirement.objects.create(
+            title='גז בשטח גדול', description='גז', applicability_rule='gas AND area > 200'
+        )
+        req.business_types.add(restaurant)
+        self.assertEqual(corpus.affected_assessment_ids(RequirementChange.objects.last()), {gas_large.pk})
+
+    def test_content_only_change_touches_citing_reports_only(self):
+        restaurant = BusinessType.objects.create(name='מסעדה')
+        req = LicensingRequirement.objects.create(title='רישיון עסק', description='רישיון עסק')
+        req.business_types.add(restaurant)
+        citing, other = make_assessment(restaurant), make_assessment(restaurant)
+        AssessmentReport.objects.create(assessment=citing).relevant_requirements.add(req)
+        AssessmentReport.objects.create(assessment=other)
+        corpus.apply_pending_changes()
+        # הדוח השני נוצר לפני הדרישה ועדיין אינו מצטט אותה
+        AssessmentReport.objects.get(assessment=other).relevant_requirements.clear()
+        AssessmentReport.objects.update(needs_regeneration=False)
+
+        req.description = 'רישיון עסק מתוקן'
+        req.save()
+        change = RequirementChange.objects.last()
+        self.assertEqual(corpus.affected_assessment_ids(change), {citing.pk})
+        self.assertEqual(corpus.apply_pending_changes()['checked'], 1)
+        self.assertTrue(AssessmentReport.objects.get(assessment=citing).needs_regeneration)
+        self.assertFalse(AssessmentReport.objects.get(assessment=other).needs_regeneration)
+
+    def test_deleted_requirement_flags_citing_reports(self):
+        restaurant = BusinessType.objects.create(name='מסעדה')
+        req = LicensingRequirement.objects.create(title='אישור משטרה', description='אישור משטרה')
+        req.business_types.add(restaurant)
+        report = AssessmentReport.objects.create(assessment=make_assessment(restaurant))
+        report.relevant_requirements.set([req])
+        corpus.apply_pending_changes()
+        AssessmentReport.objects.filter(pk=report.pk).update(needs_regeneration=False)
+
+        req.delete()
+        result = corpus.apply_pending_changes()
+        self.assertEqual(result['flagged'], 1)
+        self.assertTrue(AssessmentReport.objects.get(pk=report.pk).needs_regeneration)
+
+
+class AdmissionControlTests(TestCase):
+
+    def test_token_bucket_rejects_when_empty(self):
+        self.assertEqual(admission.take_token('test', 1.0, 2)[0], True)
+        self.assertEqual(admission.take_token('test', 1.0, 2)[0], True)
+        allowed, retry_after = admission.take_token('test', 1.0, 2)
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 0)
+
+    @override_settings(SUBMISSIONS_PER_CLIENT_PER_MINUTE=1)
+    def test_submission_over_client_rate_gets_429_before_writes(self):
+        admission.admit_submission('127.0.0.1')
+        response = self.client.post(reverse('questionnaire:submit_assessment'), {
+            'business_name': 'מסעדת בדיקה',
+            'business_type': 'מסעדה',
+            'area_sqm': '100',
+            'seating_capacity': '30',
+        })
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertFalse(BusinessType.objects.exists())
+        self.assertEqual(admission.admission_counters().get('rejected_client'), 1)
+
+    def test_queue_depth_survives_killed_workers(self):
+        lock_dir = tempfile.mkdtemp()
+        semaphore = admission.OutboundSemaphore(1, lock_dir)
+        # מונה ישן בטבלה וקובץ waiter של תהליך שנהרג (אף אחד לא מחזיק אותו)
+        StatCounter.objects.create(scope=admission.ADMISSION_SCOPE, key='waiting', value=8)
+        open(os.path.join(lock_dir, 'waiter-1-dead.lock'), 'w').close()
+        with mock.patch.object(admission, '_semaphore', semaphore):
+            self.assertEqual(admission.queue_depth(), 0)
+            admission.admit_submission('127.0.0.1')
+            self.assertFalse(os.path.exists(os.path.join(lock_dir, 'waiter-1-dead.lock')))
+
+            rejected = []
+
+            def waiting():
+                return semaphore.live_counts()['waiting']
+
+            def wait_for_slot():
+                try:
+                    with semaphore.acquire(timeout=0.5):
+                        pass
+                except admission.AdmissionRejected:
+                    rejected.append(True)
+
+            # מונה הדחיות נכתב מה-thread השני - לא בתוך טרנזקציית הבדיקה
+            with mock.patch.object(admission, 'record'), semaphore.acquire(timeout=1):
+                waiter = threading.Thread(target=wait_for_slot)
+                waiter.start()
+                counts = single_flight.wait_for(lambda: semaphore.live_counts() if waiting() else None, timeout=2)
+                self.assertEqual(counts, {'waiting': 1, 'in_flight': 1})
+                waiter.join()
+            self.assertEqual(rejected, [True])
+            self.assertEqual(semaphore.live_counts(), {'waiting': 0, 'in_flight': 0})
+        self.assertEqual(admission.reset_live_counters(), 1)
+
+
+class StubBackend(llm_backends.LLMBackend):
+    """ספק מקומי לבדיקות: עונה אחרי השהיה קבועה או נכשל"""
+
+    def __init__(self, name, delay=0.0, answer=None, fail=False):
+        super().__init__(name)
+        self.delay = delay
+        self.answer = answer or f'answer from {name}'
+        self.fail = fail
+        self.cancelled = threading.Event()
+
+    def complete(self, messages, cancel):
+        if cancel.wait(self.delay):
+            self.cancelled.set()
+            raise llm_backends.BackendCancelled(self.name)
+        if self.fail:
+            raise llm_backends.BackendError(f'{self.name} failed')
+        return self.answer
+
+
+class HedgedRouterTests(TestCase):
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        slow = StubBackend('slow', delay=2.0)
+        fast = StubBackend('fast', delay=0.01)
+        router = llm_backends.HedgedRouter([slow, fast], default_hedge_delay=0.05)
+
+        self.assertEqual(router.complete([]), 'answer from fast')
+        self.assertTrue(slow.cancelled.wait(1.0))
+        self.assertEqual(fast.stats.hedges, 1)
+        self.assertEqual(fast.stats.wins, 1)
+
+    def test_cancelled_loser_releases_its_slot_while_running(self):
+        stalled, finished = threading.Event(), threading.Event()
+
+        class StalledResponse:
+            headers = {'Content-Type': 'text/event-stream'}
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                finished.set()
+
+            def raise_for_status(self):
+                pass
+
+            def iter_lines(self, decode_unicode=False):
+                yield 'data: {"choices": [{"delta": {"content": "חלקי"}}]}'
+                # השרת איטי: הבלוק הבא מגיע רק אחרי שהקריאה כבר הפסידה
+                stalled.wait(2)
+                yield 'data: {"choices": [{"delta": {"content": " המשך"}}]}'
+
+        slow = llm_backends.OpenAICompatibleBackend('http://llm.invalid/v1/chat/completions', 'model', name='slow')
+        fast = StubBackend('fast', delay=0.01)
+        router = llm_backends.HedgedRouter([slow, fast], default_hedge_delay=0.05)
+        semaphore = admission.OutboundSemaphore(2, tempfile.mkdtemp())
+        with mock.patch.object(admission, '_semaphore', semaphore), \
+                mock.patch.object(admission, 'take_token', return_value=(True, 0)), \
+                mock.patch('requests.Session.post', return_value=StalledResponse()):
+            self.assertEqual(router.complete([]), 'answer from fast')
+            # הקריאה שהפסידה עדיין תקועה בקריאה מהרשת, אבל המקום כבר שוחרר
+            self.assertFalse(finished.is_set())
+            self.assertEqual(semaphore.live_counts()['in_flight'], 0)
+            stalled.set()
+            self.assertTrue(finished.wait(2))
+        # ההשהיה של המפסיד נרשמת כחסם תחתון ולא נעלמת מהדגימות
+        self.assertEqual(len(slow.stats.latencies), 1)
+        self.assertGreaterEqual(slow.stats.latencies[0], 0.05)
+        self.assertEqual(slow.stats.outcomes, deque())
+
+    def test_streamed_response_is_assembled(self):
+        class Streamed:
+            headers = {'Content-Type': 'text/event-stream'}
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                pass
+
+            def raise_for_status(self):
+                pass
+
+            def iter_lines(self, decode_unicode=False):
+                yield 'data: {"choices": [{"delta": {"content": "דוח "}}]}'
+                yield ''
+                yield 'data: {"choices": [{"delta": {"content": "מלא"}}], "usage": {"total_tokens": 7}}'
+                yield 'data: [DONE]'
+
+        backend = llm_backends.OpenAICompatibleBackend('http://llm.invalid/v1/chat/completions', 'model')
+        cancel = llm_backends.CancelToken()
+        with mock.patch.object(admission, 'take_token', return_value=(True, 0)), \
+                mock.patch.object(admission, '_semaphore', admission.OutboundSemaphore(1, tempfile.mkdtemp())), \
+                mock.patch('requests.Session.post', return_value=Streamed()) as post:
+            self.assertEqual(backend.complete([], cancel), 'דוח מלא')
+        self.assertEqual(cancel.usage, {'total_tokens': 7})
+        self.assertTrue(post.call_args.kwargs['json']['stream'])
+
+    def test_failing_primary_falls_through_and_is_demoted(self):
+        broken = StubBackend('broken', fail=True)
+        backup = StubBackend('backup')
+        router = llm_backends.HedgedRouter([broken, backup], default_hedge_delay=5.0)
+
+        for _ in range(3):
+            self.assertEqual(router.complete([]), 'answer from backup')
+        # אחרי הכשל הראשון הספק השבור כבר לא ראשי
+        self.assertEqual(len(broken.stats.outcomes), 1)
+        self.assertEqual(router.ordered_backends()[0], backup)
+
+    def test_hedge_delay_follows_latency_percentile(self):
+        backend = StubBackend('primary')
+        router = llm_backends.HedgedRouter([backend], default_hedge_delay=5.0, min_hedge_delay=0.0)
+        self.assertEqual(router.hedge_delay(backend), 5.0)
+        for latency in [0.1, 0.2, 0.3, 0.4, 1.0]:
+            backend.stats.record_success(latency)
+        self.assertEqual(router.hedge_delay(backend), 1.0)
+
+
+class RecordReplayTests(TestCase):
+
+    def test_recorded_exchanges_replay_offline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'llm.jsonl')
+            live = StubBackend('live', delay=0.02, answer='דוח מוקלט')
+            router = llm_backends.HedgedRouter([live], recorder=llm_backends.ExchangeRecorder(path))
+            messages = [{'role': 'user', 'content': 'דוח עבור מסעדה'}]
+            router.complete(messages)
+
+            [exchange] = llm_backends.load_recordings(path)
+            self.assertEqual(exchange['backend'], 'live')
+            self.assertGreaterEqual(exchange['latency'], 0.02)
+
+            replay = llm_backends.ReplayBackend(path, latency='recorded', speed=2.0)
+            replay_router = llm_backends.HedgedRouter([replay])
+            self.assertEqual(replay_router.complete(messages), 'דוח מוקלט')
+            self.assertGreaterEqual(replay.stats.latencies[0], 0.01)
+            with self.assertRaises(llm_backends.BackendError):
+                replay_router.complete([{'role': 'user', 'content': 'בקשה אחרת'}])
+
+
+class RetrievalIndexTests(TestCase):
+
+    def test_index_round_trip_and_token_budget(self):
+        gas = LicensingRequirement.objects.create(
+            title='גז', description='מתקן גז בבית אוכל יותקן בידי מתקין גפ"מ מורשה'
+        )
+        alcohol = LicensingRequirement.objects.create(
+            title='אלכוהול', description='הגשת משקאות משכרים לצריכה במקום\nשילוט האוסר מכירה לקטינים'
+        )
+        LicensingRequirement.objects.create(title='שילוט', description='שלט העסק יוצב בכניסה')
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(RETRIEVAL_INDEX_DIR=directory):
+            summary = retrieval.build_index(retrieval.corpus_paragraphs())
+            self.assertEqual(summary['paragraphs'], 4)
+
+            hits = retrieval.search('המשקאות המשכרים', k=2)
+            self.assertEqual(hits[0]['requirement_id'], alcohol.pk)
+
+            profile = {'business_type': 'מסעדה', 'uses_gas': True, 'serves_alcohol': True}
+            context = retrieval.retrieve_context(profile, exclude_requirements=[gas.pk], token_budget=15)
+            self.assertTrue(context)
+            self.assertNotIn(gas.pk, [hit['requirement_id'] for hit in context])
+            self.assertLessEqual(sum(retrieval.estimate_tokens(hit['text']) for hit in context), 15)
+
+
+class NearDuplicateTests(TestCase):
+
+    def test_near_identical_paragraphs_are_merged(self):
+        clause = 'בעל העסק יתקין מערכת כיבוי אש אוטומטית במטבח בהתאם להנחיות רשות הכבאות וההצלה'
+        requirements = [
+            {'description': clause},
+            {'description': 'שילוט העסק יוצב בכניסה הראשית'},
+            {'description': clause + '.'},
+            {'description': clause + ' מעת לעת'},
+        ]
+        compacted, summary = dedup.compact_requirements(requirements)
+
+        self.assertEqual(summary['output_rows'], 2)
+        self.assertEqual(summary['compaction_ratio'], 2.0)
+        canonical = compacted[0]
+        self.assertEqual(canonical['source_index'], 3)
+        self.assertEqual(canonical['duplicate_indices'], '0;2')
+
+
+class IngestionTests(TestCase):
+    databases = {'default', 'archive'}
+
+    def write_csv(self, directory, name, rows):
+        with open(os.path.join(directory, name), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['title', 'description', 'priority'])
+            writer.writerows(rows)
+
+    def test_rerun_touches_only_changed_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.write_csv(directory, 'a.csv', [['גז', 'התקנת מתקן גז מאושר', 'high']])
+            self.write_csv(directory, 'b.csv', [['שלט', 'שלט העסק בכניסה', 'low'], ['ניקיון', 'ניקיון יומי', 'low']])
+            first = ingest.ingest_directory(directory, workers=1)
+            self.assertEqual(first['b.csv']['created'], 2)
+            untouched = LicensingRequirement.objects.get(source_file='a.csv')
+
+            self.write_csv(directory, 'b.csv', [['שלט', 'שלט העסק בכניסה', 'medium'], ['חדש', 'דרישה חדשה', 'low']])
+            second = ingest.ingest_directory(directory, workers=1)
+
+        self.assertEqual(second['a.csv'], 'skipped')
+        self.assertEqual(
+            {key: second['b.csv'][key] for key in ('created', 'updated', 'deleted')},
+            {'created': 1, 'updated': 1, 'deleted': 1},
+        )
+        self.assertEqual(LicensingRequirement.objects.get(source_file='a.csv').pk, untouched.pk)
+        self.assertEqual(RequirementChange.objects.filter(action='updated').count(), 1)
+        self.assertEqual(stats.diff_counters(stats.compute_from_scratch(), stats.current_counters()), [])
+
+
+class ThresholdExtractionTests(TestCase):
+
+    def test_hebrew_phrases_and_provenance(self):
+        text = 'בית אוכל ששטחו מעל 100 מ"ר ובו עד 50 מקומות ישיבה'
+        values, provenance = thresholds.extract_thresholds(text)
+        self.assertEqual(values, {'min_area': 101, 'max_capacity': 50})
+        area = next(span for span in provenance if span['field'] == 'min_area')
+        self.assertEqual(text[area['start']:area['end']], 'מעל 100 מ"ר')
+
+        self.assertEqual(thresholds.extract_thresholds('בין 50 ל-200 מ"ר')[0], {'min_area': 50, 'max_area': 200})
+        self.assertEqual(thresholds.extract_thresholds('יש להגיש תוך 30 ימים')[0], {})
+
+    def test_clause_numbers_are_not_thresholds(self):
+        self.assertEqual(thresholds.extract_thresholds('סעיף 3.2 עד 100 איש')[0], {'max_capacity': 100})
+        self.assertEqual(
+            thresholds.extract_thresholds('לפי תקנה 2.4.1 בין 50 ל-200 מ"ר')[0], {'min_area': 50, 'max_area': 200}
+        )
+        self.assertEqual(thresholds.extract_thresholds('פרט 4.1-5 מ"ר')[0], {})
+
+    def test_linear_meters_are_not_area(self):
+        for text in [
+            'יש להציב מטפה במרחק של עד 2 מטרים מהכיריים',
+            'גובה המעקה לפחות 1 מטר',
+            'רוחב המעבר שאינו עולה על 6 מטרים',
+        ]:
+            self.assertEqual(thresholds.extract_thresholds(text)[0], {}, msg=text)
+        self.assertEqual(thresholds.extract_thresholds('בשטח 120 מטר רבוע ומעלה')[0], {'min_area': 120})
+
+    def test_ranges_need_units_or_between(self):
+        self.assertEqual(thresholds.extract_thresholds('תקנה 12 עד 100 איש')[0], {'max_capacity': 100})
+        self.assertEqual(thresholds.extract_thresholds('בשעות 8 עד 22 ל 50 איש')[0], {})
+        self.assertEqual(thresholds.extract_thresholds('עד 50 אישורים')[0], {})
+        self.assertEqual(
+            thresholds.extract_thresholds('50 מ"ר עד 200 מ"ר')[0], {'min_area': 50, 'max_area': 200}
+        )
+        # תא בעמודת שטח: טווח ללא יחידה אינו מפורש
+        self.assertEqual(thresholds.find_spans('50-200', dimension=thresholds.AREA), [])
+        self.assertEqual(thresholds.find_spans('עד 80', dimension=thresholds.AREA)[0]['field'], 'max_area')
+
+    def test_ingested_rows_get_indexed_size_fields(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'sizes.csv'), 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['title', 'description', 'capacity_requirements'])
+                writer.writerow(['מטפים', 'התקנת מטפים בעסק ששטחו 300 מ"ר ומעלה', ''])
+                writer.writerow(['שירותים', 'שירותים נפרדים לגברים ולנשים', '200 מקומות'])
+            ingest.ingest_directory(directory, workers=1)
+
+        extinguishers = LicensingRequirement.objects.get(title='מטפים')
+        self.assertEqual(extinguishers.min_area, 300)
+        self.assertEqual(extinguishers.size_provenance[0]['source'], 'description')
+        self.assertEqual(LicensingRequirement.objects.get(title='שירותים').min_capacity, 200)
+
+
+class ReportEditingTests(TestCase):
+    REPORT = (
+        '# תמצית\nעסק בשטח 120 מ"ר.\n\n'
+        '# בטיחות אש\nהתקנת מטפים.\n\n'
+        '# גז\nהעסק אינו משתמש בגז.\n\n'
+        '# המלצות כלליות\nשמירה על ניקיון.'
+    )
+
+    def setUp(self):
+        self.restaurant = BusinessType.objects.create(name='מסעדה')
+        self.report = AssessmentReport.objects.create(
+            assessment=make_assessment(self.restaurant), ai_generated_content=self.REPORT
+        )
+
+    def own_report(self):
+        session = self.client.session
+        session[OWNED_REPORTS_SESSION_KEY] = [self.report.pk]
+        session.save()
+
+    def stub_generator(self, answer):
+        backend = StubBackend('stub', answer=answer)
+        generator = ai_service.PerplexityReportGenerator(router=llm_backends.HedgedRouter([backend]))
+        return mock.patch.object(ai_service, '_generator_instance', generator)
+
+    def test_affected_sections_follow_changed_values(self):
+        sections = report_sections.split_sections(self.REPORT)
+        self.assertEqual([heading for heading, _ in sections], ['# תמצית', '# בטיחות אש', '# גז', '# המלצות כלליות'])
+        self.assertEqual(report_sections.join_sections(sections), self.REPORT)
+        self.assertEqual(report_sections.affected_sections(sections, {'area_sqm': (120, 200)}, [], []), ['# תמצית'])
+        self.assertEqual(report_sections.affected_sections(sections, {'uses_gas': (False, True)}, [], []), ['# גז'])
+
+    def test_edit_regenerates_only_affected_section(self):
+        gas = LicensingRequirement.objects.create(title='אישור בודק גז', description='אישור בודק גז', requires_gas=True)
+        gas.business_types.add(self.restaurant)
+        self.own_report()
+        form = self.client.get(reverse('questionnaire:edit_assessment', args=[self.report.pk]))
+        self.assertContains(form, 'value="120"')
+
+        with self.stub_generator('# תמצית\nעסק בשטח 120 מ"ר עם גז.\n\n# גז\nנדרש אישור בודק גז.'):
+            response = self.client.post(reverse('questionnaire:edit_assessment', args=[self.report.pk]), {
+                'business_name': 'מסעדת בדיקה',
+                'business_type': str(self.restaurant.pk),
+                'area_sqm': '120',
+                'seating_capacity': '40',
+                'uses_gas': 'true',
+            })
+        self.assertRedirects(response, reverse('questionnaire:view_report', args=[self.report.pk]))
+
+        self.report.refresh_from_db()
+        self.assertTrue(self.report.assessment.uses_gas)
+        self.assertEqual(list(self.report.relevant_requirements.all()), [gas])
+        self.assertIn('נדרש אישור בודק גז.', self.report.ai_generated_content)
+        self.assertIn('# בטיחות אש\nהתקנת מטפים.', self.report.ai_generated_content)
+
+        first, second = self.report.versions.order_by('number')
+        self.assertEqual(first.content, self.REPORT)
+        self.assertFalse(first.assessment_snapshot['uses_gas'])
+        self.assertEqual(second.regenerated_sections, ['# תמצית', '# גז'])
+        self.assertEqual(second.requirement_ids, [gas.pk])
+
+    def test_only_owner_or_staff_can_edit(self):
+        url = reverse('questionnaire:edit_assessment', args=[self.report.pk])
+        response = self.client.post(url, {'business_name': 'השתלטות', 'business_type': str(self.restaurant.pk)})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertNotContains(self.client.get(reverse('questionnaire:view_report', args=[self.report.pk])), url)
+        self.report.assessment.refresh_from_db()
+        self.assertNotEqual(self.report.assessment.business_name, 'השתלטות')
+
+        self.own_report()
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertContains(self.client.get(reverse('questionnaire:view_report', args=[self.report.pk])), url)
+
+        self.client.logout()
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_flagged_report_is_regenerated_in_full(self):
+        AssessmentReport.objects.filter(pk=self.report.pk).update(needs_regeneration=True, corpus_version=0)
+        self.report.refresh_from_db()
+        RequirementChange.objects.create(requirement_id=1, action='updated', before={}, after={'x': 1})
+        with self.stub_generator('# תמצית\nדוח חדש.'):
+            result = editing.apply_edit(self.report, {'area_sqm': 200})
+        self.assertEqual(result['regenerated'], [report_sections.FULL_REGENERATION])
+        self.report.refresh_from_db()
+        self.assertFalse(self.report.needs_regeneration)
+        self.assertEqual(self.report.corpus_version, corpus.current_version())
+
+    def test_partial_edit_keeps_corpus_version(self):
+        RequirementChange.objects.create(requirement_id=1, action='updated', before={}, after={'x': 1})
+        with self.stub_generator('# תמצית\nעסק בשטח 200 מ"ר.'):
+            result = editing.apply_edit(self.report, {'area_sqm': 200})
+        self.assertEqual(result['regenerated'], ['# תמצית'])
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.corpus_version, 0)
+
+    def test_unchanged_edit_skips_generation(self):
+        result = editing.apply_edit(self.report, {'business_name': 'מסעדת בדיקה', 'area_sqm': 120})
+        self.assertEqual(result['changed_fields'], {})
+        self.assertFalse(ReportVersion.objects.exists())
+
+
+class JurisdictionPartitionTests(TestCase):
+
+    def setUp(self):
+        self.restaurant = BusinessType.objects.create(name='מסעדה')
+        self.tel_aviv = Jurisdiction.objects.create(name='תל אביב-יפו', code='tel-aviv')
+        self.haifa = Jurisdiction.objects.create(name='חיפה', code='haifa')
+
+    def requirement(self, title, jurisdiction=None):
+        req = LicensingRequirement.objects.create(title=title, description=title, jurisdiction=jurisdiction)
+        req.business_types.add(self.restaurant)
+        return req
+
+    def test_matching_uses_city_and_national_rules_only(self):
+        national = self.requirement('רישיון עסק')
+        local = self.requirement('חוק עזר תל אביב', self.tel_aviv)
+        self.requirement('חוק עזר חיפה', self.haifa)
+
+        in_tel_aviv = make_assessment(self.restaurant, jurisdiction=self.tel_aviv)
+        self.assertCountEqual(find_relevant_requirements(in_tel_aviv), [national, local])
+        self.assertEqual(find_relevant_requirements(make_assessment(self.restaurant)), [national])
+
+    def test_city_update_invalidates_only_that_city(self):
+        self.requirement('רישיון עסק')
+        tel_aviv_version = corpus.jurisdiction_version(self.tel_aviv.pk)
+        counts = preview.preview_counts('מסעדה', 100, 30, {}, jurisdiction_value='tel-aviv')
+        self.assertEqual(counts['total'], 1)
+
+        self.requirement('חוק עזר חיפה', self.haifa)
+        self.assertEqual(corpus.jurisdiction_version(self.tel_aviv.pk), tel_aviv_version)
+        self.assertGreater(corpus.jurisdiction_version(self.haifa.pk), tel_aviv_version)
+        self.assertEqual(RequirementChange.objects.last().jurisdiction_id, self.haifa.pk)
+
+        self.requirement('חוק עזר תל אביב', self.tel_aviv)
+        self.assertGreater(corpus.jurisdiction_version(self.tel_aviv.pk), tel_aviv_version)
+        counts = preview.preview_counts('מסעדה', 100, 30, {}, jurisdiction_value='tel-aviv')
+        self.assertEqual(counts['total'], 2)
+
+    def test_retrieval_reads_only_partition_indexes(self):
+        paragraphs = [
+            (1, 'שילוט עסק בחזית', self.haifa.pk),
+            (2, 'שילוט עסק ארצי', None),
+            (3, 'שילוט עסק ברחוב', self.tel_aviv.pk),
+        ]
+        with tempfile.TemporaryDirectory() as directory, override_settings(RETRIEVAL_INDEX_DIR=directory):
+            summary = retrieval.build_index(paragraphs)
+            self.assertEqual(summary['partitions'], 3)
+            self.assertEqual(
+                retrieval.partition_keys(), sorted([retrieval.NATIONAL, str(self.haifa.pk), str(self.tel_aviv.pk)])
+            )
+            hits = retrieval.search('שילוט', k=5, jurisdiction_id=self.tel_aviv.pk)
+            self.assertCountEqual([hit['requirement_id'] for hit in hits], [2, 3])
+            self.assertEqual([hit['requirement_id'] for hit in retrieval.search('שילוט', k=5, jurisdiction_id=None)], [2])
+            self.assertEqual(len(retrieval.search('שילוט', k=5)), 3)
+
+    def test_partition_scores_are_normalized_before_merging(self):
+        # בעיר מונח נדיר (IDF גבוה), בארצי מונח נפוץ - הציונים הגולמיים אינם ברי השוואה
+        paragraphs = [(pk, f'פסקה כללית מספר {pk}', self.tel_aviv.pk) for pk in range(1, 9)]
+        paragraphs += [(9, 'מנדף במטבח', self.tel_aviv.pk), (10, 'מנדף במטבח', None), (11, 'מנדף ושילוט', None)]
+        with tempfile.TemporaryDirectory() as directory, override_settings(RETRIEVAL_INDEX_DIR=directory):
+            retrieval.build_index(paragraphs)
+            city = retrieval.get_index(self.tel_aviv.pk).search('מנדף במטבח', k=1)[0]['score']
+            national = retrieval.get_index(None).search('מנדף במטבח', k=1)[0]['score']
+            self.assertGreater(city, 2 * national)
+
+            hits = retrieval.search('מנדף במטבח', k=5, jurisdiction_id=self.tel_aviv.pk)
+            scores = {hit['requirement_id']: hit['score'] for hit in hits}
+            self.assertEqual((scores[9], scores[10]), (1.0, 1.0))
+            self.assertLess(scores[11], 1.0)
+
+    def test_city_rebuild_reloads_only_that_index(self):
+        self.requirement('שילוט ארצי')
+        self.requirement('שילוט חיפה', self.haifa)
+        self.requirement('שילוט תל אביב', self.tel_aviv)
+        with tempfile.TemporaryDirectory() as directory, override_settings(RETRIEVAL_INDEX_DIR=directory):
+            retrieval.build_index(retrieval.corpus_paragraphs(), corpus_version=corpus.jurisdiction_version)
+            self.assertEqual(retrieval.stale_partitions(), [])
+            national, haifa = retrieval.get_index(None), retrieval.get_index(self.haifa.pk)
+            tel_aviv = retrieval.get_index(self.tel_aviv.pk)
+
+            added = self.requirement('שילוט נוסף בתל אביב', self.tel_aviv)
+            stale = retrieval.stale_partitions()
+            self.assertEqual(stale, [self.tel_aviv.pk])
+            # כך שזמן השינוי של הקובץ שנבנה מחדש יהיה שונה בוודאות
+            time.sleep(0.01)
+            out = StringIO()
+            call_command('build_retrieval_index', '--stale', stdout=out)
+            self.assertIn('in 1 partitions', out.getvalue())
+            self.assertIs(retrieval.get_index(None), national)
+            self.assertIs(retrieval.get_index(self.haifa.pk), haifa)
+            self.assertIsNot(retrieval.get_index(self.tel_aviv.pk), tel_aviv)
+            hits = retrieval.search('שילוט', k=5, jurisdiction_id=self.tel_aviv.pk)
+            self.assertIn(added.pk, [hit['requirement_id'] for hit in hits])
+            self.assertEqual(retrieval.stale_partitions(), [])
+
+
+class CompressedReportTests(TestCase):
+
+    def test_body_is_compressed_and_deferred(self):
+        body = 'יש להגיש בקשה לרישיון עסק לרשות המקומית.\n' * 200
+        report = AssessmentReport.objects.create(
+            assessment=make_assessment(BusinessType.objects.create(name='מסעדה')), ai_generated_content=body
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT ai_generated_content FROM {AssessmentReport._meta.db_table} WHERE id = %s', [report.pk]
+            )
+            stored = bytes(cursor.fetchone()[0])
+        self.assertTrue(stored.startswith(b'z'))
+        self.assertLess(len(stored), len(body.encode('utf-8')) // 10)
+
+        listed = AssessmentReport.objects.get(pk=report.pk)
+        self.assertIn('ai_generated_content', listed.get_deferred_fields())
+        with self.assertNumQueries(1):
+            self.assertEqual(listed.ai_generated_content, body)
+        self.assertIn('ai_generated_content', report.assessment.__class__.objects.get().assessmentreport.get_deferred_fields())
+        self.assertEqual(AssessmentReport.objects.with_content().get(pk=report.pk).ai_generated_content, body)
+
+    def test_legacy_plain_rows_are_readable(self):
+        report = AssessmentReport.objects.create(
+            assessment=make_assessment(BusinessType.objects.create(name='מסעדה')), ai_generated_content='x'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {AssessmentReport._meta.db_table} SET ai_generated_content = %s WHERE id = %s',
+                ['דוח ישן', report.pk],
+            )
+        self.assertEqual(AssessmentReport.objects.with_content().get(pk=report.pk).ai_generated_content, 'דוח ישן')
+
+
+class ArchiveTests(TestCase):
+    databases = {'default', 'archive'}
+
+    def test_old_assessments_move_to_archive(self):
+        restaurant = BusinessType.objects.create(name='מסעדה')
+        requirement = LicensingRequirement.objects.create(
+            title='רישיון עסק', description='בקשה לרישיון עסק', authority='עירייה', category='municipal',
+        )
+        old = make_assessment(restaurant, business_name='עסק ישן')
+        report = AssessmentReport.objects.create(assessment=old, ai_generated_content='דוח ישן ' * 50)
+        report.relevant_requirements.add(requirement)
+        editing.record_version(report, ['*'])
+        BusinessAssessment.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=400))
+        recent = make_assessment(restaurant, business_name='עסק חדש')
+
+        before = stats.current_counters()
+        result = archive.archive_older_than(archive.cutoff(365), batch_size=1)
+        self.assertEqual(result, {'batches': 1, 'assessments': 1, 'reports': 1})
+        self.assertEqual(list(BusinessAssessment.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertFalse(AssessmentReport.objects.filter(pk=report.pk).exists())
+        # המונים הם לכל התקופה: הארכוב אינו משנה אותם, והחישוב מחדש כולל את הארכיון
+        self.assertEqual(stats.current_counters(), before)
+        self.assertEqual(stats.current_counters()[(stats.ASSESSMENT_TOTAL, '')], 2)
+        self.assertEqual(stats.diff_counters(stats.compute_from_scratch(), stats.current_counters()), [])
+
+        rows = list(bulk_export.iter_rows(bulk_export.export_querysets()))
+        self.assertEqual([row[2] for row in rows], ['עסק ישן', 'עסק חדש'])
+        self.assertEqual(rows[0][-2], str(requirement.pk))
+        self.assertEqual(len(list(bulk_export.iter_rows(bulk_export.export_querysets(include_archive=False)))), 1)
+
+        archived = AssessmentReport.objects.with_content().using('archive').get(pk=report.pk)
+        self.assertEqual(archived.ai_generated_content, 'דוח ישן ' * 50)
+        self.assertEqual(list(archived.relevant_requirements.values_list('pk', flat=True)), [requirement.pk])
+        self.assertEqual(archived.versions.count(), 1)
+
+        response = self.client.get(reverse('questionnaire:view_report', args=[report.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['archived'])
+        self.assertContains(response, 'עסק ישן')
+
+        # הרצה חוזרת לא מוצאת עוד מה להעביר
+        self.assertEqual(archive.archive_older_than(archive.cutoff(365))['assessments'], 0)
+
+
+class BusinessTypeResolverTests(TestCase):
+
+    def setUp(self):
+        self.cafe = BusinessType.objects.create(name='בית קפה')
+        BusinessTypeAlias.objects.create(business_type=self.cafe, name='cafe')
+
+    def test_variants_resolve_to_one_type_without_queries(self):
+        business_types.resolve('בית קפה')
+        with self.assertNumQueries(0):
+            for value in ['בית-קפה', ' בית  קפה ', 'Café', 'CAFE', str(self.cafe.pk)]:
+                self.assertEqual(business_types.resolve(value), self.cafe)
+        self.assertIsNone(business_types.resolve('גלידריה'))
+
+    def test_unknown_name_is_created_once(self):
+        created = business_types.resolve('גלידריה', create=True)
+        self.assertEqual(business_types.resolve('גְּלִידְרִיָּה', create=True), created)
+        self.assertEqual(BusinessType.objects.filter(key='גלידריה').count(), 1)
+
+    def test_types_from_other_processes(self):
+        business_types.resolve('בית קפה')
+        # נוסף בתהליך אחר: בלי signals בתהליך הזה
+        with mock.patch.object(business_types, 'invalidate'):
+            bakery = BusinessType.objects.create(name='מאפייה')
+        self.assertEqual(business_types.resolve(str(bakery.pk), create=True), bakery)
+        self.assertIsNone(business_types.resolve('987654', create=True))
+        self.assertFalse(BusinessType.objects.filter(name='987654').exists())
+
+        BusinessType.objects.filter(pk=self.cafe.pk).update(name='קפה', key='קפה')
+        stats.bump(business_types.STAMP_SCOPE, business_types.STAMP_KEY, 1)
+        with override_settings(BUSINESS_TYPE_STAMP_SECONDS=0):
+            self.assertEqual(business_types.resolve('קפה'), self.cafe)
+
+    def test_fallback_categories_use_whole_names(self):
+        LicensingRequirement.objects.create(title='בר', description='רישיון אלכוהול', category='bar')
+        general = LicensingRequirement.objects.create(title='כללי', description='רישיון עסק', category='general')
+        # "עברית" מכילה "בר" אך אינה בר
+        assessment = make_assessment(business_types.resolve('עברית', create=True))
+        self.assertEqual(find_relevant_requirements(assessment), [general])
+
+
+class RequestProfilingTests(TestCase):
+
+    def setUp(self):
+        report = AssessmentReport.objects.create(
+            assessment=make_assessment(BusinessType.objects.create(name='מסעדה')), ai_generated_content='דוח'
+        )
+        self.url = reverse('questionnaire:view_report', args=[report.pk])
+
+    def test_staff_flag_stores_profile_viewable_in_admin(self):
+        self.client.get(self.url, HTTP_X_PROFILE='1')
+        self.assertFalse(RequestProfile.objects.exists())
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        response = self.client.get(self.url, HTTP_X_PROFILE='1', HTTP_X_REQUEST_ID='profiled-request-1')
+        self.assertEqual(response['X-Profile-ID'], 'profiled-request-1')
+        profile = RequestProfile.objects.get(request_id='profiled-request-1')
+        self.assertEqual((profile.status_code, profile.trigger), (200, 'header'))
+        self.assertGreater(profile.sql_count, 0)
+        self.assertTrue(any('view_report' in function['label'] for function in profile.profile['functions']))
+
+        page = self.client.get(reverse('admin:questionnaire_requestprofile_change', args=[profile.pk]))
+        self.assertContains(page, 'view_report')
+        self.assertContains(page, 'SELECT')
+
+
+class AdminPaginatorTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_row_estimate_is_a_cached_count(self):
+        from .admin import EstimatedCountPaginator
+
+        restaurant = BusinessType.objects.create(name='מסעדה')
+        # מזהה גבוה ומחיקות - MAX(pk) היה מציג הרבה יותר שורות מבפועל
+        first = make_assessment(restaurant)
+        make_assessment(restaurant, id=5000)
+        first.delete()
+        make_assessment(restaurant)
+
+        queryset = BusinessAssessment.objects.all()
+        self.assertEqual(EstimatedCountPaginator._estimate_rows(queryset), 2)
+        make_assessment(restaurant)
+        with self.assertNumQueries(0):
+            self.assertEqual(EstimatedCountPaginator._estimate_rows(queryset), 2)
+
+
+class SubmissionCoalescingTests(TestCase):
+
+    def setUp(self):
+        BusinessType.objects.create(name='מסעדה')
+
+    @mock.patch('questionnaire.views.generate_ai_report', return_value='דוח')
+    def test_resubmitted_form_returns_the_same_report(self, generate):
+        form = {
+            'business_name': 'מסעדת בדיקה', 'business_type': 'מסעדה', 'area_sqm': '100', 'seating_capacity': '30',
+            'idempotency_key': 'a1b2c3d4e5f6a7b8c9d0',
+        }
+        first = self.client.post(reverse('questionnaire:submit_assessment'), form)
+        second = self.client.post(reverse('questionnaire:submit_assessment'), form)
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(first['Location'], second['Location'])
+        self.assertEqual(BusinessAssessment.objects.count(), 1)
+        generate.assert_called_once()
+
+        # השולח יכול לערוך את הדוח, גם כשהשליחה החוזרת מגיעה מסשן חדש
+        report = AssessmentReport.objects.get()
+        edit_url = reverse('questionnaire:edit_assessment', args=[report.pk])
+        self.assertEqual(self.client.get(edit_url).status_code, 200)
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get(edit_url).status_code, 403)
+        self.client.post(reverse('questionnaire:submit_assessment'), form)
+        self.assertEqual(self.client.get(edit_url).status_code, 200)
+
+    def test_waiters_share_the_leader_result(self):
+        now = time.time()
+        InFlightCall.objects.create(key='done', status='done', owner='other', result='משותף', expires_at=now + 60)
+        compute = mock.Mock(return_value='חדש')
+        self.assertEqual(single_flight.run('done', compute), 'משותף')
+        compute.assert_not_called()
+        self.assertEqual(admission.admission_counters().get('coalesced'), 1)
+
+        # lease של תהליך שנפל נלקח מחדש
+        InFlightCall.objects.create(key='stale', status='running', owner='crashed', result='', expires_at=now - 1)
+        self.assertEqual(single_flight.run('stale', compute), 'חדש')
+        self.assertEqual(InFlightCall.objects.get(key='stale').status, 'done')
+
+    def test_failed_leader_releases_the_lease(self):
+        with self.assertRaises(RuntimeError):
+            single_flight.run('failing', mock.Mock(side_effect=RuntimeError('down')))
+        self.assertFalse(InFlightCall.objects.filter(key='failing').exists())
+
+
+class CostSummaryTests(TestCase):
+
+    def test_parsing(self):
+        self.assertEqual(amounts.parse_cost('500-1,000 ש"ח'), (500, 1000))
+        self.assertEqual(amounts.parse_cost('עד 3 אלף ₪'), (0, 3000))
+        self.assertEqual(amounts.parse_cost('החל מ-200 ש"ח'), (200, None))
+        self.assertEqual(amounts.parse_cost('לפי תעריף'), (None, None))
+        self.assertEqual(amounts.parse_duration('2-4 שבועות'), (14, 28))
+        self.assertEqual(amounts.parse_duration('חודשיים'), (60, 60))
+        self.assertEqual(amounts.parse_duration('30 ימי עבודה'), (30, 30))
+        self.assertEqual(amounts.parse_duration('2 שבועות עד חודשיים'), (14, 60))
+        self.assertEqual(amounts.parse_duration('3 ימים עד שבוע'), (3, 7))
+        self.assertEqual(amounts.parse_duration('עד חודשיים'), (0, 60))
+        self.assertEqual(amounts.parse_duration('30 יום מיום הגשת הבקשה'), (30, 30))
+
+    def test_unit_words_inside_other_words_are_not_durations(self):
+        for text in ['עד סיום הבדיקה', 'בהתאם לשנה', 'בכפוף לאישור השבועי', 'מחדשים כיומיים']:
+            self.assertEqual(amounts.parse_duration(text), (None, None), msg=text)
+
+    def test_parse_amounts_command_fills_stale_fields(self):
+        requirement = LicensingRequirement.objects.create(
+            title='רישיון עסק', description='א', estimated_cost='500 ש"ח', processing_time='עד סיום הבדיקה',
+        )
+        # ערכים שחושבו בגרסה קודמת של המפענח
+        LicensingRequirement.objects.filter(pk=requirement.pk).update(cost_min=None, days_min=1, days_max=1)
+        out = StringIO()
+        call_command('parse_amounts', stdout=out)
+        requirement.refresh_from_db()
+        self.assertEqual(requirement.days_min, 1)
+        self.assertIn('Would update 1', out.getvalue())
+
+        call_command('parse_amounts', '--apply', stdout=StringIO())
+        requirement.refresh_from_db()
+        self.assertEqual((requirement.cost_min, requirement.days_min, requirement.days_max), (500, None, None))
+
+    def test_report_totals_are_rendered(self):
+        restaurant = BusinessType.objects.create(name='מסעדה')
+        report = AssessmentReport.objects.create(assessment=make_assessment(restaurant), ai_generated_content='דוח')
+        report.relevant_requirements.set([
+            LicensingRequirement.objects.create(
+                title='רישיון עסק', description='א', estimated_cost='500-1000 ש"ח', processing_time='2-4 שבועות',
+            ),
+            LicensingRequirement.objects.create(
+                title='כיבוי אש', description='ב', estimated_cost='₪1,500', processing_time='30 יום',
+            ),
+            LicensingRequirement.objects.create(title='תברואה', description='ג'),
+        ])
+        summary = costs.summarize(report.relevant_requirements.all())
+        self.assertEqual((summary['cost_low'], summary['cost_high'], summary['unpriced']), (2000, 2500, 1))
+        self.assertEqual((summary['days_low'], summary['days_high'], summary['days_total']), (30, 30, 58))
+
+        response = self.client.get(reverse('questionnaire:view_report', args=[report.pk]))
+        self.assertContains(response, '₪2,000 – ₪2,500')
+        self.assertContains(response, '30 ימים')
+
+
+class SizeComplianceTests(TestCase):
+
+    def setUp(self):
+        self.restaurant = BusinessType.objects.create(name='מסעדה')
+
+    def requirement(self, title, category='general', **limits):
+        req = LicensingRequirement.objects.create(title=title, description=title, category=category, **limits)
+        req.business_types.add(self.restaurant)
+        return req
+
+    def test_findings(self):
+        small = self.requirement('מסלול מקוצר', max_area=125)
+        large = self.requirement('הסדרי כיבוי', category='fire', min_capacity=42)
+        small_only = self.requirement('היתר מזון לעסק קטן', category='health', max_capacity=30)
+        self.requirement('מבנה גדול', category='building', min_area=500)
+        assessment = make_assessment(self.restaurant, area_sqm=120, seating_capacity=40)
+
+        result = compliance.check(assessment, sized_requirements(assessment))
+        self.assertEqual(
+            [(f['requirement'], f['kind']) for f in result['violations']], [(small_only, 'exceeds_max')]
+        )
+        self.assertCountEqual(
+            [(f['requirement'], f['kind']) for f in result['warnings']],
+            [(small, 'near_max'), (large, 'below_min')],
+        )
+        # הדרישה שמעט מחוץ לטווח לא נכללת בדוח, רק באזהרה
+        self.assertNotIn(large, find_relevant_requirements(assessment))
+
+    def test_alternative_requirement_is_not_a_violation(self):
+        self.requirement('מסלול מקוצר', max_area=50)
+        self.requirement('מסלול רגיל', min_area=51)
+        assessment = make_assessment(self.restaurant, area_sqm=300)
+        self.assertEqual(compliance.check(assessment, sized_requirements(assessment)), {'violations': [], 'warnings': []})
+
+    def test_rendered_in_report(self):
+        self.requirement('היתר מזון לעסק קטן', max_capacity=30)
+        assessment = make_assessment(self.restaurant)
+        report = AssessmentReport.objects.create(assessment=assessment, ai_generated_content='דוח')
+        response = self.client.get(reverse('questionnaire:view_report', args=[report.pk]))
+        self.assertContains(response, 'בדיקת התאמה לגודל העסק')
+        self.assertContains(response, 'חורג מהמקסימום של 30 מקומות ישיבה')
+
+
+class LoggingFilterTests(TestCase):
+
+    def make_record(self, msg='Assessment submitted', args=(), exc_info=None, level=logging.INFO, **extra):
+        record = logging.LogRecord('questionnaire.views', level, __file__, 1, msg, args, exc_info)
+        record.__dict__.update(extra)
+        return record
+
+    def test_redaction_covers_profile_args_and_exceptions(self):
+        redact = RedactingFilter(['business_name', 'business_type', 'area_sqm', 'seating_capacity'])
+        record = self.make_record(business_name='פלאפל', business_type='מסעדה', area_sqm='120', seating_capacity='40')
+        redact.filter(record)
+        for field in ('business_name', 'business_type', 'area_sqm', 'seating_capacity'):
+            self.assertTrue(getattr(record, field).startswith('h:'))
+
+        record = self.make_record('Calling %s with %s', ('api', 'Bearer abc.def'))
+        redact.filter(record)
+        self.assertEqual(record.getMessage(), 'Calling api with Bearer [REDACTED]')
+
+        try:
+            raise RuntimeError('bad key pplx-123abc')
+        except RuntimeError:
+            record = self.make_record('failed', exc_info=sys.exc_info())
+        redact.filter(record)
+        self.assertIn('pplx-[REDACTED]', record.exc_text)
+        self.assertNotIn('123abc', logging.Formatter().format(record))
+
+    def test_sampling_caps_noisy_debug_messages(self):
+        sampling = SamplingFilter(level='DEBUG', rate=1.0, per_second=3)
+        with mock.patch('business_licensing.logging_utils.time.monotonic', return_value=100.0):
+            passed = [sampling.filter(self.make_record(level=logging.DEBUG)) for _ in range(5)]
+        self.assertEqual(passed, [True, True, True, False, False])
+        self.assertTrue(sampling.filter(self.make_record()))
+        self.assertFalse(SamplingFilter(level='DEBUG', rate=0.0).filter(self.make_record(level=logging.DEBUG)))
+
+    def test_request_id_reaches_response_and_log_records(self):
+        records = []
+        handler = logging.Handler()
+        handler.addFilter(RequestIdFilter())
+        handler.emit = records.append
+        view_logger = logging.getLogger('questionnaire.views')
+        view_logger.addHandler(handler)
+        self.addCleanup(view_logger.removeHandler, handler)
+        self.addCleanup(view_logger.setLevel, view_logger.level)
+        view_logger.setLevel(logging.DEBUG)
+
+        response = self.client.post(reverse('questionnaire:submit_assessment'), HTTP_X_REQUEST_ID='client-request-42')
+        self.assertEqual(response['X-Request-ID'], 'client-request-42')
+        self.assertTrue(records)
+        self.assertEqual({record.request_id for record in records}, {'client-request-42'})
+
+        response = self.client.get(reverse('questionnaire:home'), HTTP_X_REQUEST_ID='bad id!')
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+
+class ReportExportTests(TestCase):
+
+    def setUp(self):
+        self.export_dir = tempfile.mkdtemp()
+        override = override_settings(REPORT_EXPORT_DIR=self.export_dir, REPORT_EXPORT_KEEP=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.report = AssessmentReport.objects.create(
+            assessment=make_assessment(BusinessType.objects.create(name='מסעדה')), ai_generated_content='דוח'
+        )
+        self.url = reverse('questionnaire:export_report_docx', args=[self.report.pk])
+
+    def test_fingerprint_tracks_report_content(self):
+        before = report_export.report_fingerprint(self.report)
+        self.assertEqual(report_export.report_fingerprint(self.report), before)
+        self.report.ai_generated_content = 'דוח מעודכן'
+        self.assertNotEqual(report_export.report_fingerprint(self.report), before)
+
+    def test_download_is_built_once_and_revalidated(self):
+        with mock.patch.object(report_export, 'build_docx', wraps=report_export.build_docx) as build:
+            first = self.client.get(self.url)
+            self.assertEqual(first.status_code, 200)
+            b''.join(first.streaming_content)
+            second = self.client.get(self.url)
+            b''.join(second.streaming_content)
+            self.assertEqual(build.call_count, 1)
+            self.assertEqual(first['ETag'], second['ETag'])
+
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(build.call_count, 1)
+
+    def test_superseded_versions_are_pruned(self):
+        for number in range(4):
+            AssessmentReport.objects.filter(pk=self.report.pk).update(ai_generated_content=f'גרסה {number}')
+            self.report.refresh_from_db()
+            path, _ = report_export.get_report_docx(self.report)
+            os.utime(path, (number, number))
+        remaining = sorted(os.listdir(self.export_dir))
+        self.assertEqual(len(remaining), 2)
+        self.assertIn(os.path.basename(path), remaining)
+
+
+class BulkExportTests(TestCase):
+    databases = {'default', 'archive'}
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.restaurant = BusinessType.objects.create(name='מסעדה')
+        self.cafe = BusinessType.objects.create(name='בית קפה')
+        self.requirement = LicensingRequirement.objects.create(title='רישיון עסק', description='רישיון עסק')
+        self.recent = make_assessment(self.restaurant, business_name='מסעדה חדשה')
+        AssessmentReport.objects.create(assessment=self.recent).relevant_requirements.set([self.requirement])
+        self.old = make_assessment(self.cafe, business_name='קפה ותיק')
+        BusinessAssessment.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=400))
+        self.url = reverse('questionnaire:export_assessments')
+
+    def csv_rows(self, response):
+        content = b''.join(response.streaming_content).decode('utf-8').lstrip('\ufeff')
+        return list(csv.reader(content.splitlines()))
+
+    def test_csv_is_streamed_with_matched_requirements(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        header, *rows = self.csv_rows(response)
+        self.assertEqual(header, bulk_export.HEADER)
+        by_name = {row[2]: dict(zip(header, row)) for row in rows}
+        self.assertEqual(set(by_name), {'מסעדה חדשה', 'קפה ותיק'})
+        self.assertEqual(by_name['מסעדה חדשה']['requirement_ids'], str(self.requirement.pk))
+        self.assertEqual(by_name['קפה ותיק']['report_id'], '')
+
+    def test_date_and_type_filters(self):
+        since = (timezone.now() - timedelta(days=30)).date().isoformat()
+        rows = self.csv_rows(self.client.get(self.url, {'from': since}))[1:]
+        self.assertEqual([row[2] for row in rows], ['מסעדה חדשה'])
+        rows = self.csv_rows(self.client.get(self.url, {'business_type': self.cafe.pk}))[1:]
+        self.assertEqual([row[2] for row in rows], ['קפה ותיק'])
+        self.assertEqual(self.client.get(self.url, {'business_type': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'from': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'to': '2026-02-30'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'format': 'pdf'}).status_code, 400)
+
+    def test_xlsx_export(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get(self.url, {'format': 'xlsx'})
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.values)
+        self.assertEqual(list(rows[0]), bulk_export.HEADER)
+        self.assertEqual(len(rows), 3)
+
+    def test_requires_staff(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class PreviewCountTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.restaurant = BusinessType.objects.create(name='מסעדה')
+        for title, limits in [('כללי', {}), ('שטח גדול', {'min_area': 100}), ('קטן', {'max_capacity': 50})]:
+            req = LicensingRequirement.objects.create(title=title, description=title, **limits)
+            req.business_types.add(self.restaurant)
+
+    def test_quantize_to_threshold_buckets(self):
+        points = [50, 100, 201]
+        self.assertEqual(preview.quantize(None, points), ('any', None))
+        self.assertEqual(preview.quantize(10, points), (0, 1))
+        self.assertEqual(preview.quantize(120, points), (2, 100))
+        self.assertEqual(preview.quantize(200, points), (2, 100))
+        self.assertEqual(preview.quantize(500, points), (3, 201))
+
+    def test_values_in_one_bucket_share_a_cache_entry(self):
+        features = {}
+        first = preview.preview_counts(str(self.restaurant.pk), 120, 40, features)
+        self.assertEqual(first['total'], 3)
+        # אותו טווח שטח ותפוסה - רק בדיקת גרסת המחיצה
+        with self.assertNumQueries(1):
+            self.assertEqual(preview.preview_counts(str(self.restaurant.pk), 180, 20, features), first)
+        self.assertEqual(preview.preview_counts(str(self.restaurant.pk), 90, 60, features)['total'], 1)
+
+    def test_api_endpoint(self):
+        url = reverse('questionnaire:api_preview')
+        # תפוסה לא תקינה = עוד לא מולאה, ללא סינון לפיה
+        response = self.client.get(url, {'business_type': self.restaurant.pk, 'area': '90', 'capacity': 'x'})
+        self.assertEqual(response.json()['total'], 2)
+        self.assertEqual(self.client.get(url).status_code, 400)
@@ -8,5 +8,11 @@ urlpatterns = [
     path('questionnaire/', views.questionnaire, name='questionnaire'),
     path('submit/', views.submit_assessment, name='submit_assessment'),
     path('report/<int:report_id>/', views.view_report, name='view_report'),
+    path('report/<int:report_id>/edit/', views.edit_assessment, name='edit_assessment'),
+    path('report/<int:report_id>/export.docx', views.export_report_docx, name='export_report_docx'),
     path('api/requirements/', views.api_get_requirements, name='api_requirements'),
+    path('api/preview/', views.api_preview_requirements, name='api_preview'),
+    path('dashboard/', views.stats_dashboard, name='stats_dashboard'),
+    path('api/stats/', views.api_stats, name='api_stats'),
+    path('export/assessments/', views.export_assessments, name='export_assessments'),
 ]
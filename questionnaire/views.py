@@ -1,16 +1,37 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, FileResponse, StreamingHttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import quote_etag
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.db import models
-from .models import BusinessType, BusinessAssessment, LicensingRequirement, AssessmentReport
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import IntegrityError, models, transaction
+from .models import BusinessType, BusinessAssessment, Jurisdiction, LicensingRequirement, AssessmentReport, ALL_FEATURES_MASK, FEATURE_FLAGS
+from . import archive, business_types, compliance, costs, stats
+from .rules import profile_from_assessment, rule_matches
+from .corpus import current_version as current_corpus_version, partition as jurisdiction_partition
+from .preview import preview_counts
+from .editing import apply_edit, record_version
 from services.ai_service import generate_ai_report
+from services.report_export import DOCX_CONTENT_TYPE, get_report_docx, report_fingerprint
+from services import bulk_export, single_flight
+from services.admission import ADMISSION_SCOPE, AdmissionRejected, admission_counters, admit_submission
+from services.report_sections import FULL_REGENERATION
 import json
 import logging
+import re
+import uuid
 
 logger = logging.getLogger(__name__)
 
+_VALID_IDEMPOTENCY_KEY = re.compile(r'^[A-Za-z0-9\-_]{16,64}$')
+
+# הדוחות שנוצרו בסשן - רק הם (או צוות) ניתנים לעריכה
+OWNED_REPORTS_SESSION_KEY = 'owned_reports'
+MAX_OWNED_REPORTS = 50
+
 
 def home(request):
     """דף הבית"""
@@ -19,122 +40,216 @@ def home(request):
 
 def questionnaire(request):
     """עמוד השאלון"""
-    business_types = BusinessType.objects.all()
+    type_choices = BusinessType.objects.all()
     context = {
-        'business_types': business_types
+        'business_types': type_choices,
+        'jurisdictions': Jurisdiction.objects.all(),
+        'idempotency_key': uuid.uuid4().hex,
     }
     return render(request, 'questionnaire.html', context)
 
 
+def _overloaded_response(request, rejection):
+    """תשובת 429 כשהמערכת בעומס או שהלקוח חרג מהמכסה"""
+    messages.error(request, f'המערכת עמוסה כרגע, אנא נסו שוב בעוד {rejection.retry_after} שניות')
+    # ההערכה לא נוצרה - שליחה חוזרת של אותו טופס משתמשת באותו מפתח
+    response = render(
+        request,
+        'questionnaire.html',
+        {
+            'business_types': BusinessType.objects.all(),
+            'jurisdictions': Jurisdiction.objects.all(),
+            'idempotency_key': _idempotency_key(request.POST) or uuid.uuid4().hex,
+        },
+        status=429,
+    )
+    response['Retry-After'] = str(rejection.retry_after)
+    return response
+
+
+def _read_assessment_form(post):
+    """
+    קריאת שדות השאלון ובדיקת תקינותם
+    
+    Returns:
+        (מילון שדות, הודעת שגיאה או None); business_type הוא הערך הגולמי מהטופס
+    """
+    business_name = post.get('business_name', '').strip()
+    business_type_id = post.get('business_type', '')
+    area_sqm = post.get('area_sqm', '')
+    seating_capacity = post.get('seating_capacity', '')
+    
+    logger.debug("Assessment submitted", extra={
+        'business_name': business_name,
+        'business_type': business_type_id,
+        'area_sqm': area_sqm,
+        'seating_capacity': seating_capacity,
+        'fields': sorted(post.keys()),
+    })
+    
+    # בדיקת תקינות נתונים
+    if not all([business_name, business_type_id, area_sqm, seating_capacity]):
+        return None, 'אנא מלאו את כל השדות הנדרשים'
+    
+    try:
+        area_sqm = int(area_sqm)
+        seating_capacity = int(seating_capacity)
+        
+        if area_sqm <= 0 or seating_capacity <= 0:
+            raise ValueError("מספרים חייבים להיות חיוביים")
+            
+    except ValueError:
+        return None, 'אנא הזינו מספרים תקינים עבור השטח ומספר המקומות'
+    
+    data = {
+        'business_name': business_name,
+        'business_type': business_type_id,
+        'area_sqm': area_sqm,
+        'seating_capacity': seating_capacity,
+        'jurisdiction': resolve_jurisdiction(post.get('jurisdiction', '').strip()),
+    }
+    # מאפיינים מיוחדים
+    for _, field, _ in FEATURE_FLAGS:
+        data[field] = post.get(field, 'false') == 'true'
+    return data, None
+
+
+def _resolve_business_type(business_type_id):
+    """סוג העסק לפי מזהה, שם או כינוי; נוצר אם אינו קיים"""
+    return business_types.resolve(business_type_id, create=True)
+
+
+def resolve_jurisdiction(value):
+    """רשות לפי מזהה, קוד או שם; None לערך ריק או לא מוכר (דרישות ארציות בלבד)"""
+    if not value:
+        return None
+    lookup = models.Q(code=value) | models.Q(name=value)
+    if value.isdigit():
+        lookup |= models.Q(pk=value)
+    return Jurisdiction.objects.filter(lookup).first()
+
+
+def _idempotency_key(post):
+    key = post.get('idempotency_key', '').strip()
+    return key if _VALID_IDEMPOTENCY_KEY.match(key) else ''
+
+
+def _grant_report(request, report_id):
+    """רישום הדוח כשייך לסשן (שולח הטופס)"""
+    owned = [pk for pk in request.session.get(OWNED_REPORTS_SESSION_KEY, []) if pk != report_id]
+    request.session[OWNED_REPORTS_SESSION_KEY] = (owned + [report_id])[-MAX_OWNED_REPORTS:]
+
+
+def _can_edit(request, report):
+    """עריכה מותרת לשולח הטופס באותו סשן או לצוות"""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    return report.pk in request.session.get(OWNED_REPORTS_SESSION_KEY, [])
+
+
+def _submitted_report_response(request, key):
+    """
+    שליחה חוזרת של טופס שכבר נשלח: ממתינים לדוח של השליחה הראשונה
+    (שעשויה להיות עדיין בביצוע, גם בתהליך אחר) ומפנים אליו
+    """
+    def probe():
+        assessment_id = BusinessAssessment.objects.filter(idempotency_key=key).values_list('pk', flat=True).first()
+        if assessment_id is None:
+            # השליחה הראשונה נכשלה והערכה נמחקה
+            return False
+        return AssessmentReport.objects.filter(assessment_id=assessment_id).values_list('pk', flat=True).first()
+
+    report_id = single_flight.wait_for(probe)
+    if report_id:
+        logger.info("Duplicate submission", extra={'report_id': report_id})
+        # מי שמחזיק במפתח הטופס הוא שולח הטופס המקורי
+        _grant_report(request, report_id)
+        return redirect('questionnaire:view_report', report_id=report_id)
+    messages.error(request, 'השליחה הקודמת של הטופס לא הושלמה, אנא נסו שוב')
+    return redirect('questionnaire:questionnaire')
+
+
 @require_http_methods(["POST"])
 def submit_assessment(request):
     """קבלת נתוני השאלון ויצירת הערכה"""
     try:
-        # קבלת נתונים מהטופס
-        business_name = request.POST.get('business_name', '').strip()
-        business_type_id = request.POST.get('business_type', '')
-        area_sqm = request.POST.get('area_sqm', '')
-        seating_capacity = request.POST.get('seating_capacity', '')
-        
-        # Debug - הדפסת הנתונים שהתקבלו
-        print(f"DEBUG: business_name={business_name}")
-        print(f"DEBUG: business_type_id={business_type_id}")
-        print(f"DEBUG: area_sqm={area_sqm}")
-        print(f"DEBUG: seating_capacity={seating_capacity}")
-        print(f"DEBUG: POST data keys: {list(request.POST.keys())}")
+        data, error = _read_assessment_form(request.POST)
+        if error:
+            messages.error(request, error)
+            return redirect('questionnaire:questionnaire')
         
-        # מאפיינים מיוחדים
-        uses_gas = request.POST.get('uses_gas', 'false') == 'true'
-        serves_meat = request.POST.get('serves_meat', 'false') == 'true'
-        offers_delivery = request.POST.get('offers_delivery', 'false') == 'true'
-        has_outdoor_seating = request.POST.get('has_outdoor_seating', 'false') == 'true'
-        serves_alcohol = request.POST.get('serves_alcohol', 'false') == 'true'
+        # לחיצה כפולה או שליחה חוזרת של אותו טופס
+        key = _idempotency_key(request.POST)
+        if key and BusinessAssessment.objects.filter(idempotency_key=key).exists():
+            return _submitted_report_response(request, key)
         
-        # בדיקת תקינות נתונים
-        if not all([business_name, business_type_id, area_sqm, seating_capacity]):
-            messages.error(request, 'אנא מלאו את כל השדות הנדרשים')
-            return redirect('questionnaire:questionnaire')
+        # בקרת כניסה - לפני כל כתיבה למסד הנתונים
+        admit_submission(request.META.get('REMOTE_ADDR', 'unknown'))
         
-        try:
-            area_sqm = int(area_sqm)
-            seating_capacity = int(seating_capacity)
-            
-            if area_sqm <= 0 or seating_capacity <= 0:
-                raise ValueError("מספרים חייבים להיות חיוביים")
-                
-        except ValueError:
-            messages.error(request, 'אנא הזינו מספרים תקינים עבור השטח ומספר המקומות')
+        data['business_type'] = _resolve_business_type(data['business_type'])
+        if data['business_type'] is None:
+            messages.error(request, 'סוג העסק שנבחר אינו קיים, אנא בחרו שוב')
             return redirect('questionnaire:questionnaire')
         
-        # קבלת סוג העסק
-        try:
-            # נסה למצוא לפי ID ראשון
-            try:
-                business_type = BusinessType.objects.get(pk=business_type_id)
-                print(f"Found business type by ID: {business_type}")
-            except (BusinessType.DoesNotExist, ValueError):
-                # נסה למצוא לפי שם
-                business_type = BusinessType.objects.get(name=business_type_id)
-                print(f"Found business type by name: {business_type}")
-        except BusinessType.DoesNotExist:
-            # יצירת סוג עסק בסיסי אם לא קיים
-            print(f"Creating new business type: {business_type_id}")
-            business_type = BusinessType.objects.create(
-                name=business_type_id,
-                description=f"סוג עסק: {business_type_id}"
-            )
-        
         # יצירת הערכת עסק
-        assessment = BusinessAssessment.objects.create(
-            business_name=business_name,
-            business_type=business_type,
-            area_sqm=area_sqm,
-            seating_capacity=seating_capacity,
-            uses_gas=uses_gas,
-            serves_meat=serves_meat,
-            offers_delivery=offers_delivery,
-            has_outdoor_seating=has_outdoor_seating,
-            serves_alcohol=serves_alcohol
-        )
+        try:
+            with transaction.atomic():
+                assessment = BusinessAssessment.objects.create(idempotency_key=key or None, **data)
+        except IntegrityError:
+            # שליחה מקבילה עם אותו מפתח הקדימה אותנו
+            return _submitted_report_response(request, key)
         
         # מציאת דרישות רלוונטיות
+        corpus_version = current_corpus_version()
         relevant_requirements = find_relevant_requirements(assessment)
         
-        # יצירת דוח עם Perplexity AI
-        print(f"Creating AI report for: {assessment.business_name}")
-        
-        # יצירת דוח עם Perplexity AI בלבד
-        from services.ai_service import generate_ai_report
-        ai_content = generate_ai_report(assessment, relevant_requirements)
-        print("AI report generated successfully with Perplexity!")
+        # יצירת דוח עם Perplexity AI בלבד; שליחות זהות שבביצוע חולקות קריאה אחת
+        logger.debug("Generating AI report", extra={
+            'assessment_id': assessment.pk,
+            'requirement_count': len(relevant_requirements),
+        })
+        try:
+            ai_content = single_flight.run(
+                single_flight.report_key(assessment, relevant_requirements, corpus_version),
+                lambda: generate_ai_report(assessment, relevant_requirements),
+            )
+        except Exception:
+            # הקריאה נכשלה או נדחתה בתור היציאה - לא משאירים הערכה ללא דוח,
+            # כך ששליחה חוזרת עם אותו מפתח תנסה שוב
+            assessment.delete()
+            raise
         
         report = AssessmentReport.objects.create(
             assessment=assessment,
-            ai_generated_content=ai_content
+            ai_generated_content=ai_content,
+            corpus_version=corpus_version
         )
         
         # קישור דרישות רלוונטיות לדוח
         if relevant_requirements:
             report.relevant_requirements.set(relevant_requirements)
+        record_version(report, [FULL_REGENERATION])
         
-        print(f"Report created successfully with ID: {report.id}")
+        logger.info("Report created", extra={'report_id': report.id, 'assessment_id': assessment.pk})
+        _grant_report(request, report.id)
         messages.success(request, f'🎉 השאלון נשלח בהצלחה! נמצאו {len(relevant_requirements)} דרישות רלוונטיות לעסק שלכם.')
         
         return redirect('questionnaire:view_report', report_id=report.id)
         
+    except AdmissionRejected as e:
+        logger.warning("Submission rejected", extra={'reason': e.reason, 'retry_after': e.retry_after})
+        return _overloaded_response(request, e)
     except Exception as e:
-        print(f"CRITICAL ERROR in submit_assessment: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("submit_assessment failed")
         messages.error(request, f'אירעה שגיאה: {str(e)}')
         return redirect('questionnaire:questionnaire')
 
 
-def find_relevant_requirements(assessment):
-    """מציאת דרישות רלוונטיות לעסק"""
+def _candidate_requirements(assessment):
+    """הדרישות לסוג העסק, לרשות ולמאפיינים שלו - לפני סינון הגודל"""
     
-    # התחלה עם כל הדרישות
-    requirements = LicensingRequirement.objects.all()
+    # התחלה עם המחיצה של הרשות: הדרישות המקומיות שלה והארציות
+    requirements = LicensingRequirement.objects.filter(jurisdiction_partition(assessment.jurisdiction_id))
     
     # סינון לפי סוג עסק (אם מוגדר)
     business_type_requirements = requirements.filter(
@@ -143,19 +258,31 @@ def find_relevant_requirements(assessment):
     
     # אם לא נמצאו דרישות ספציפיות לסוג העסק, נשתמש בדרישות כלליות
     if not business_type_requirements.exists():
-        # נחפש לפי שם סוג העסק
-        business_type_name = assessment.business_type.name.lower()
-        if 'מסעדה' in business_type_name or 'restaurant' in business_type_name:
-            requirements = requirements.filter(category__in=['restaurant', 'health', 'safety'])
-        elif 'בר' in business_type_name or 'bar' in business_type_name:
-            requirements = requirements.filter(category__in=['bar', 'safety'])
-        elif 'קפה' in business_type_name or 'cafe' in business_type_name:
-            requirements = requirements.filter(category__in=['restaurant', 'health'])
-        else:
-            requirements = requirements.filter(category__in=['general', 'safety'])
+        # קטגוריות לפי המפתח המנורמל של סוג העסק (כינויים כבר אוחדו אליו)
+        requirements = requirements.filter(
+            category__in=business_types.fallback_categories_for(assessment.business_type)
+        )
     else:
         requirements = business_type_requirements
     
+    # סינון לפי מאפיינים מיוחדים - דרישה רלוונטית רק אם כל המאפיינים שהיא
+    # דורשת קיימים בעסק, כלומר mask & ~profile_mask == 0
+    missing_features = ALL_FEATURES_MASK & ~assessment.feature_mask
+    return requirements.alias(
+        missing_features=models.F('feature_mask').bitand(missing_features)
+    ).filter(missing_features=0)
+
+
+def _applicable(requirements, assessment):
+    # כללי תחולה - מוערכים מקומית על ידי predicates מהודרים
+    profile = profile_from_assessment(assessment)
+    return [req for req in requirements if rule_matches(req.applicability_rule, profile)]
+
+
+def find_relevant_requirements(assessment):
+    """מציאת דרישות רלוונטיות לעסק"""
+    requirements = _candidate_requirements(assessment)
+    
     # סינון לפי שטח
     if assessment.area_sqm:
         requirements = requirements.filter(
@@ -172,61 +299,148 @@ def find_relevant_requirements(assessment):
             models.Q(max_capacity__isnull=True) | models.Q(max_capacity__gte=assessment.seating_capacity)
         )
     
-    # סינון לפי מאפיינים מיוחדים
-    filtered_requirements = []
-    for req in requirements:
-        # בדיקת התאמה למאפיינים מיוחדים
-        if req.requires_gas and not assessment.uses_gas:
-            continue
-        if req.meat_related and not assessment.serves_meat:
-            continue
-        if req.delivery_related and not assessment.offers_delivery:
-            continue
-        if req.outdoor_related and not assessment.has_outdoor_seating:
-            continue
-        if req.alcohol_related and not assessment.serves_alcohol:
-            continue
-            
-        filtered_requirements.append(req)
-    
-    return filtered_requirements
+    return _applicable(requirements, assessment)
+
+
+def sized_requirements(assessment):
+    """
+    הדרישות עם מגבלת שטח או תפוסה שחלות על העסק בכל השאר - כולל אלה שהעסק
+    מחוץ לטווח שלהן ו-find_relevant_requirements משמיטה (לבדיקת ההתאמה)
+    """
+    requirements = _candidate_requirements(assessment).filter(compliance.SIZED)
+    return _applicable(requirements, assessment)
+
+
+def get_report_or_archived(report_id, queryset=None):
+    """דוח מהמסד הראשי, ואם הועבר לארכיון - מהארכיון (לקריאה בלבד)"""
+    queryset = queryset if queryset is not None else AssessmentReport.objects.with_content()
+    report = queryset.filter(id=report_id).first() or archive.get_archived_report(report_id, queryset)
+    if report is None:
+        raise Http404('דוח לא נמצא')
+    return report
 
 
 def view_report(request, report_id):
     """הצגת דוח הערכה"""
+    report = get_report_or_archived(report_id)
+    relevant_requirements = report.relevant_requirements.all()
+    
+    # קיבוץ דרישות לפי קטגוריה
+    requirements_by_category = {}
+    for req in relevant_requirements:
+        category = req.get_category_display()
+        if category not in requirements_by_category:
+            requirements_by_category[category] = []
+        requirements_by_category[category].append(req)
+    
+    # קיבוץ דרישות לפי עדיפות
+    requirements_by_priority = {
+        'high': relevant_requirements.filter(priority='high'),
+        'medium': relevant_requirements.filter(priority='medium'),
+        'low': relevant_requirements.filter(priority='low'),
+    }
+    
+    context = {
+        'report': report,
+        'assessment': report.assessment,
+        'relevant_requirements': relevant_requirements,
+        'requirements_by_category': requirements_by_category,
+        'requirements_by_priority': requirements_by_priority,
+        'total_requirements': len(relevant_requirements),
+        'costs': costs.summarize(relevant_requirements),
+        'compliance': compliance.check(report.assessment, sized_requirements(report.assessment)),
+        'archived': archive.is_archived(report),
+        'can_edit': _can_edit(request, report),
+    }
+    
+    return render(request, 'report.html', context)
+
+
+@require_http_methods(["GET", "POST"])
+def edit_assessment(request, report_id):
+    """עריכת פרטי העסק של דוח קיים ועדכון הסעיפים שהושפעו בלבד"""
+    report = get_object_or_404(
+        AssessmentReport.objects.with_content().select_related('assessment', 'assessment__business_type'),
+        id=report_id,
+    )
+    if not _can_edit(request, report):
+        logger.warning("Edit forbidden", extra={'report_id': report.pk})
+        return HttpResponseForbidden('אין הרשאה לערוך את הדוח')
+    assessment = report.assessment
+    context = {
+        'report': report,
+        'assessment': assessment,
+        'business_types': BusinessType.objects.all(),
+        'jurisdictions': Jurisdiction.objects.all(),
+        'features': [
+            (field, BusinessAssessment._meta.get_field(field).verbose_name, getattr(assessment, field))
+            for _, field, _ in FEATURE_FLAGS
+        ],
+        'version_count': report.versions.count(),
+    }
+    if request.method == 'GET':
+        return render(request, 'edit_assessment.html', context)
+    
     try:
-        report = get_object_or_404(AssessmentReport, id=report_id)
-        relevant_requirements = report.relevant_requirements.all()
+        data, error = _read_assessment_form(request.POST)
+        if error:
+            messages.error(request, error)
+            return render(request, 'edit_assessment.html', context, status=400)
         
-        # קיבוץ דרישות לפי קטגוריה
-        requirements_by_category = {}
-        for req in relevant_requirements:
-            category = req.get_category_display()
-            if category not in requirements_by_category:
-                requirements_by_category[category] = []
-            requirements_by_category[category].append(req)
-        
-        # קיבוץ דרישות לפי עדיפות
-        requirements_by_priority = {
-            'high': relevant_requirements.filter(priority='high'),
-            'medium': relevant_requirements.filter(priority='medium'),
-            'low': relevant_requirements.filter(priority='low'),
-        }
-        
-        context = {
-            'report': report,
-            'assessment': report.assessment,
-            'relevant_requirements': relevant_requirements,
-            'requirements_by_category': requirements_by_category,
-            'requirements_by_priority': requirements_by_priority,
-            'total_requirements': len(relevant_requirements),
-        }
-        
-        return render(request, 'report.html', context)
-        
-    except AssessmentReport.DoesNotExist:
-        messages.error(request, 'דוח לא נמצא')
-        return redirect('questionnaire:home')
+        admit_submission(request.META.get('REMOTE_ADDR', 'unknown'))
+        data['business_type'] = _resolve_business_type(data['business_type'])
+        if data['business_type'] is None:
+            messages.error(request, 'סוג העסק שנבחר אינו קיים, אנא בחרו שוב')
+            return render(request, 'edit_assessment.html', context, status=400)
+        result = apply_edit(report, data)
+    except AdmissionRejected as e:
+        logger.warning("Edit rejected", extra={'reason': e.reason, 'retry_after': e.retry_after})
+        messages.error(request, f'המערכת עמוסה כרגע, אנא נסו שוב בעוד {e.retry_after} שניות')
+        response = render(request, 'edit_assessment.html', context, status=429)
+        response['Retry-After'] = str(e.retry_after)
+        return response
+    except Exception as e:
+        logger.exception("edit_assessment failed")
+        messages.error(request, f'אירעה שגיאה: {str(e)}')
+        return render(request, 'edit_assessment.html', context, status=500)
+    
+    if not result['changed_fields']:
+        messages.info(request, 'לא בוצעו שינויים בפרטי העסק')
+    elif result['regenerated'] == [FULL_REGENERATION]:
+        messages.success(request, 'פרטי העסק עודכנו והדוח נוצר מחדש')
+    else:
+        messages.success(
+            request,
+            f"פרטי העסק עודכנו: {len(result['added'])} דרישות נוספו, {len(result['removed'])} הוסרו, "
+            f"{len(result['regenerated'])} סעיפים בדוח עודכנו"
+        )
+    return redirect('questionnaire:view_report', report_id=report.id)
+
+
+@require_http_methods(["GET", "HEAD"])
+def export_report_docx(request, report_id):
+    """הורדת הדוח כקובץ Word - נוצר פעם אחת לכל גרסה של הדוח"""
+    report = get_report_or_archived(
+        report_id, AssessmentReport.objects.with_content().select_related('assessment', 'assessment__business_type'),
+    )
+    fingerprint = report_fingerprint(report)
+    etag = quote_etag(fingerprint)
+    
+    # גרסה שכבר אצל הלקוח - בלי לבנות או לקרוא את הקובץ
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    
+    path, _ = get_report_docx(report, fingerprint)
+    response = FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f'licensing-report-{report.id}.docx',
+        content_type=DOCX_CONTENT_TYPE,
+    )
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @csrf_exempt
@@ -237,10 +451,15 @@ def api_get_requirements(request):
             business_type = request.GET.get('business_type', '')
             area = request.GET.get('area', '')
             capacity = request.GET.get('capacity', '')
+            jurisdiction = request.GET.get('jurisdiction', '')
             
             # Query basic requirements
             requirements = LicensingRequirement.objects.all()
             
+            if jurisdiction:
+                resolved = resolve_jurisdiction(jurisdiction)
+                requirements = requirements.filter(jurisdiction_partition(resolved.pk if resolved else None))
+            
             if business_type:
                 requirements = requirements.filter(category=business_type)
             
@@ -267,6 +486,7 @@ def api_get_requirements(request):
                     'priority': req.get_priority_display(),
                     'estimated_cost': req.estimated_cost,
                     'processing_time': req.processing_time,
+                    'jurisdiction_id': req.jurisdiction_id,
                 })
             
             return JsonResponse({
@@ -283,3 +503,136 @@ def api_get_requirements(request):
     
     return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
 
+
+def _labelled_stats():
+    """המונים מלוח הבקרה עם תוויות קריאות"""
+    data = stats.dashboard_data()
+    data[ADMISSION_SCOPE] = admission_counters()
+    
+    type_counts = data.get(stats.ASSESSMENT_BY_TYPE, {})
+    type_names = dict(
+        BusinessType.objects.filter(pk__in=[int(pk) for pk in type_counts])
+        .values_list('pk', 'name')
+    )
+    feature_names = {
+        field.name: str(field.verbose_name)
+        for field in BusinessAssessment._meta.fields
+    }
+    category_names = dict(LicensingRequirement.CATEGORY_CHOICES)
+    priority_names = dict(LicensingRequirement.PRIORITY_CHOICES)
+    admission_names = {
+        'admitted': 'שליחות שהתקבלו',
+        'waiting': 'ממתינות לקריאה יוצאת',
+        'in_flight': 'קריאות יוצאות פעילות',
+        'rejected_client': 'נדחו - מכסת לקוח',
+        'rejected_overload': 'נדחו - עומס',
+        'rejected_quota': 'נדחו - מכסת ספק',
+        'rejected_concurrency': 'נדחו - זמן המתנה',
+        'coalesced': 'אוחדו עם שליחה זהה',
+    }
+    
+    def labelled(scope, labels=None):
+        counts = data.get(scope, {})
+        rows = [
+            {'key': key, 'label': (labels or {}).get(key, key) or 'לא צוין', 'count': count}
+            for key, count in counts.items() if count
+        ]
+        return sorted(rows, key=lambda row: -row['count'])
+    
+    return {
+        'totals': {
+            'assessments': data.get(stats.ASSESSMENT_TOTAL, {}).get('', 0),
+            'reports': data.get(stats.REPORT_TOTAL, {}).get('', 0),
+            'requirements': data.get(stats.REQUIREMENT_TOTAL, {}).get('', 0),
+            'report_requirement_links': data.get(stats.REPORT_REQUIREMENT_LINKS, {}).get('', 0),
+        },
+        'assessments_by_type': labelled(
+            stats.ASSESSMENT_BY_TYPE, {str(pk): name for pk, name in type_names.items()}
+        ),
+        'assessments_by_feature': labelled(stats.ASSESSMENT_BY_FEATURE, feature_names),
+        'assessments_by_area_band': [
+            {'key': label, 'label': label, 'count': data.get(stats.ASSESSMENT_BY_AREA_BAND, {}).get(label, 0)}
+            for _, label in stats.AREA_BANDS
+        ],
+        'requirements_by_authority': labelled(stats.REQUIREMENT_BY_AUTHORITY),
+        'requirements_by_category': labelled(stats.REQUIREMENT_BY_CATEGORY, category_names),
+        'requirements_by_priority': labelled(stats.REQUIREMENT_BY_PRIORITY, priority_names),
+        'admission': labelled(ADMISSION_SCOPE, admission_names),
+    }
+
+
+@require_http_methods(["GET"])
+def api_preview_requirements(request):
+    """API endpoint קל לספירת הדרישות לפי התשובות החלקיות בשאלון"""
+    def positive_int(name):
+        try:
+            value = int(request.GET.get(name, ''))
+        except ValueError:
+            return None
+        return value if value > 0 else None
+    
+    features = {
+        field: request.GET.get(field, 'false') == 'true'
+        for _, field, _ in FEATURE_FLAGS
+    }
+    result = preview_counts(
+        request.GET.get('business_type', '').strip(),
+        positive_int('area'),
+        positive_int('capacity'),
+        features,
+        jurisdiction_value=request.GET.get('jurisdiction', '').strip(),
+    )
+    if result is None:
+        return JsonResponse({'success': False, 'error': 'business_type is required'}, status=400)
+    
+    response = JsonResponse({'success': True, **result})
+    patch_cache_control(response, private=True, max_age=60)
+    return response
+
+
+@staff_member_required
+def stats_dashboard(request):
+    """לוח בקרה תפעולי - נקרא מטבלת המונים בלבד"""
+    return render(request, 'dashboard.html', _labelled_stats())
+
+
+@staff_member_required
+def api_stats(request):
+    """API endpoint לנתוני לוח הבקרה"""
+    return JsonResponse({'success': True, 'stats': _labelled_stats()})
+
+
+@staff_member_required
+def export_assessments(request):
+    """ייצוא הערכות ודרישות מותאמות ב-CSV (בזרימה) או XLSX"""
+    export_format = request.GET.get('format', 'csv')
+    date_from = request.GET.get('from', '')
+    date_to = request.GET.get('to', '')
+    type_ids = request.GET.getlist('business_type')
+    
+    try:
+        # parse_date מחזיר None על קלט בפורמט שגוי וזורק ValueError על תאריך לא קיים
+        dates = [parse_date(value) if value else None for value in (date_from, date_to)]
+        type_ids = [int(pk) for pk in type_ids if pk]
+    except ValueError:
+        return HttpResponseBadRequest('פרמטרי סינון לא תקינים')
+    if any(value and parsed is None for value, parsed in zip((date_from, date_to), dates)):
+        return HttpResponseBadRequest('פרמטרי סינון לא תקינים')
+    date_from, date_to = dates
+    
+    querysets = bulk_export.export_querysets(date_from, date_to, type_ids)
+    rows = bulk_export.iter_rows(querysets)
+    
+    if export_format == 'xlsx':
+        return FileResponse(
+            bulk_export.xlsx_tempfile(rows),
+            as_attachment=True,
+            filename='assessments.xlsx',
+            content_type=bulk_export.XLSX_CONTENT_TYPE,
+        )
+    if export_format != 'csv':
+        return HttpResponseBadRequest('פורמט לא נתמך')
+    
+    response = StreamingHttpResponse(bulk_export.stream_csv(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="assessments.csv"'
+    return response
@@ -0,0 +1,290 @@
+"""
+בקרת כניסה וקצב לקריאות יוצאות ל-LLM
+
+- דלי אסימונים (token bucket) משותף לכל התהליכים דרך מסד הנתונים,
+  עבור מכסת הספק ועבור הגבלת שליחות לכל לקוח
+- סמפור גלובלי של קריאות יוצאות במקביל, חוצה תהליכים בעזרת נעילות קבצים
+- מוני דחיות בטבלת הסטטיסטיקות. עומק התור והקריאות הפעילות נספרים מנעילות
+  הקבצים עצמן, כך שתהליך שנהרג לא משאיר מונה תקוע
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Greatest, Least
+from django.db.models.lookups import GreaterThanOrEqual
+
+from questionnaire import stats
+from questionnaire.models import RateBucket, StatCounter
+
+try:
+    import fcntl
+except ImportError:  # Windows - נופלים לסמפור בתוך התהליך בלבד
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_SCOPE = 'admission'
+# מדדים חיים - מחושבים מהנעילות ולא נשמרים בטבלת המונים
+LIVE_KEYS = ('waiting', 'in_flight')
+
+
+class AdmissionRejected(Exception):
+    """הבקשה נדחתה בגלל עומס או מכסה"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def record(key, delta=1):
+    """עדכון מונה בקרת כניסה (דחיות, עומק תור)"""
+    stats.bump(ADMISSION_SCOPE, key, delta)
+
+
+def take_token(key, rate_per_second, capacity, cost=1.0):
+    """
+    ניסיון למשוך אסימונים מדלי. העדכון הוא משפט UPDATE מותנה יחיד, ולכן
+    אטומי גם בין תהליכים.
+
+    Returns:
+        (הצליח, שניות עד שיהיו מספיק אסימונים)
+    """
+    now = time.time()
+    refilled = Least(
+        models.Value(float(capacity)),
+        models.F('tokens') + (models.Value(now) - models.F('updated_at')) * rate_per_second,
+    )
+    updated = RateBucket.objects.filter(
+        GreaterThanOrEqual(refilled, cost), key=key
+    ).update(tokens=refilled - cost, updated_at=Greatest(models.F('updated_at'), models.Value(now)))
+    if updated:
+        return True, 0.0
+
+    bucket = RateBucket.objects.filter(key=key).first()
+    if bucket is None:
+        try:
+            with transaction.atomic():
+                RateBucket.objects.create(key=key, tokens=capacity - cost, updated_at=now)
+            return True, 0.0
+        except IntegrityError:
+            return take_token(key, rate_per_second, capacity, cost)
+
+    available = min(capacity, bucket.tokens + (now - bucket.updated_at) * rate_per_second)
+    return False, (cost - available) / rate_per_second
+
+
+def _probe(path):
+    """האם קובץ הנעילה מוחזק כרגע על ידי תהליך חי"""
+    try:
+        handle = open(path, 'a+')
+    except OSError:
+        return False
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return True
+    finally:
+        handle.close()
+    return False
+
+
+class OutboundSemaphore:
+    """
+    הגבלת מספר הקריאות היוצאות במקביל לכל התהליכים: N קבצי נעילה,
+    כל קריאה מחזיקה נעילה בלעדית על אחד מהם. כל ממתין מחזיק נעילה על
+    קובץ waiter משלו; הנעילות משתחררות עם התהליך גם אם נהרג.
+    """
+
+    def __init__(self, slots, lock_dir):
+        self.slots = slots
+        self.lock_dir = Path(lock_dir)
+        self._local = threading.BoundedSemaphore(slots)
+        self._counts_lock = threading.Lock()
+        self._counts = dict.fromkeys(LIVE_KEYS, 0)
+
+    def _bump(self, key, delta):
+        # מונים בתוך התהליך - רק כשאין fcntl
+        with self._counts_lock:
+            self._counts[key] += delta
+
+    @contextmanager
+    def _waiting(self):
+        if fcntl is None:
+            self._bump('waiting', 1)
+            try:
+                yield
+            finally:
+                self._bump('waiting', -1)
+            return
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        name = f'{os.getpid()}-{uuid.uuid4().hex}.lock'
+        pending, path = self.lock_dir / f'new-{name}', self.lock_dir / f'waiter-{name}'
+        handle = open(pending, 'a+')
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        # השם הסופי ניתן רק אחרי הנעילה, כדי שהספירה לא תמחק קובץ חדש
+        os.replace(pending, path)
+        try:
+            yield
+        finally:
+            path.unlink(missing_ok=True)
+            handle.close()
+
+    def live_counts(self):
+        """{'waiting': ממתינים, 'in_flight': קריאות פעילות} בכל התהליכים"""
+        if fcntl is None:
+            with self._counts_lock:
+                return dict(self._counts)
+        if not self.lock_dir.exists():
+            return dict.fromkeys(LIVE_KEYS, 0)
+        waiting = 0
+        for path in self.lock_dir.glob('waiter-*.lock'):
+            if _probe(path):
+                waiting += 1
+            else:
+                # הממתין נהרג לפני שניקה אחריו
+                path.unlink(missing_ok=True)
+        in_flight = sum(_probe(self.lock_dir / f'slot-{slot}.lock') for slot in range(self.slots))
+        return {'waiting': waiting, 'in_flight': in_flight}
+
+    def _try_lock_slot(self):
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        for slot in range(self.slots):
+            handle = open(self.lock_dir / f'slot-{slot}.lock', 'a+')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return handle
+            except OSError:
+                handle.close()
+        return None
+
+    @contextmanager
+    def acquire(self, timeout):
+        """
+        מקום פנוי לקריאה יוצאת. מחזיר פונקציית שחרור, שאפשר לקרוא לה גם
+        לפני היציאה מההקשר (למשל כשהקריאה בוטלה וה-thread עוד ממתין לרשת)
+        """
+        deadline = time.monotonic() + timeout
+        handle = None
+        try:
+            with self._waiting():
+                if fcntl is None:
+                    if not self._local.acquire(timeout=timeout):
+                        raise AdmissionRejected('concurrency', timeout)
+                else:
+                    handle = self._try_lock_slot()
+                    while handle is None:
+                        if time.monotonic() >= deadline:
+                            raise AdmissionRejected('concurrency', timeout)
+                        time.sleep(0.05)
+                        handle = self._try_lock_slot()
+        except AdmissionRejected:
+            record('rejected_concurrency')
+            raise
+        if fcntl is None:
+            self._bump('in_flight', 1)
+
+        release_lock = threading.Lock()
+        released = False
+
+        def release():
+            nonlocal released
+            with release_lock:
+                if released:
+                    return
+                released = True
+            if handle is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+            else:
+                self._bump('in_flight', -1)
+                self._local.release()
+
+        try:
+            yield release
+        finally:
+            release()
+
+
+_semaphore = None
+
+
+def get_outbound_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = OutboundSemaphore(
+            _setting('LLM_MAX_CONCURRENCY', 4),
+            _setting('LLM_LOCK_DIR', Path(settings.BASE_DIR) / 'run' / 'llm-slots'),
+        )
+    return _semaphore
+
+
+@contextmanager
+def outbound_call():
+    """
+    עטיפה לכל קריאה יוצאת ל-LLM: מכסת ספק + סמפור מקביליות.
+    מחזירה את פונקציית השחרור של המקום (ראו OutboundSemaphore.acquire)
+    """
+    per_minute = _setting('LLM_RATE_PER_MINUTE', 50)
+    allowed, retry_after = take_token('provider', per_minute / 60.0, per_minute)
+    if not allowed:
+        record('rejected_quota')
+        raise AdmissionRejected('quota', retry_after)
+    with get_outbound_semaphore().acquire(_setting('LLM_SLOT_TIMEOUT', 60)) as release:
+        yield release
+
+
+def admission_counters():
+    """מוני בקרת הכניסה: admitted ו-rejected_* מהטבלה, waiting ו-in_flight מהנעילות"""
+    counters = dict(
+        StatCounter.objects.filter(scope=ADMISSION_SCOPE).exclude(key__in=LIVE_KEYS).values_list('key', 'value')
+    )
+    counters.update(get_outbound_semaphore().live_counts())
+    return counters
+
+
+def reset_live_counters():
+    """מחיקת שורות waiting / in_flight שנשמרו בטבלה בגרסאות קודמות"""
+    return StatCounter.objects.filter(scope=ADMISSION_SCOPE, key__in=LIVE_KEYS).delete()[0]
+
+
+def queue_depth():
+    """מספר הקריאות שממתינות כרגע למקום פנוי"""
+    return get_outbound_semaphore().live_counts()['waiting']
+
+
+def admit_submission(client_key):
+    """
+    בדיקת כניסה לשליחת שאלון - נעשית לפני כל כתיבה למסד הנתונים.
+    זורקת AdmissionRejected אם הלקוח חרג מהמכסה או שהמערכת בעומס.
+    """
+    per_minute = _setting('SUBMISSIONS_PER_CLIENT_PER_MINUTE', 5)
+    allowed, retry_after = take_token(f'client:{client_key}', per_minute / 60.0, per_minute)
+    if not allowed:
+        record('rejected_client')
+        raise AdmissionRejected('client_rate', retry_after)
+
+    if queue_depth() >= _setting('LLM_QUEUE_LIMIT', 8):
+        record('rejected_overload')
+        raise AdmissionRejected('overload', _setting('LLM_OVERLOAD_RETRY_AFTER', 30))
+
+    per_minute = _setting('LLM_RATE_PER_MINUTE', 50)
+    bucket = RateBucket.objects.filter(key='provider').first()
+    if bucket is not None:
+        available = min(per_minute, bucket.tokens + (time.time() - bucket.updated_at) * per_minute / 60.0)
+        if available < 1:
+            record('rejected_quota')
+            raise AdmissionRejected('quota', (1 - available) * 60.0 / per_minute)
+
+    record('admitted')
@@ -1,76 +1,57 @@
 """
-שירות AI לייצור דוחות חכמים עם Perplexity API
+שירות AI לייצור דוחות חכמים עם Perplexity API (ובספקים נוספים דרך llm_backends)
 """
 import logging
-import requests
-import json
 from typing import Dict, List, Optional
-from decouple import config
+
+from .admission import AdmissionRejected
+from .llm_backends import BackendError, HedgedRouter, PerplexityBackend, build_router
+from .report_sections import join_sections, split_sections
+from .retrieval import retrieve_context
+
+# תוויות שדות לתיאור שינויים ב-prompt
+FIELD_LABELS = {
+    'business_name': 'שם העסק',
+    'business_type': 'סוג העסק',
+    'jurisdiction': 'רשות מקומית',
+    'area_sqm': 'שטח (מ"ר)',
+    'seating_capacity': 'מקומות ישיבה',
+    'uses_gas': 'שימוש בגז',
+    'serves_meat': 'הגשת בשר',
+    'offers_delivery': 'משלוחים',
+    'has_outdoor_seating': 'ישיבה בחוץ',
+    'serves_alcohol': 'הגשת אלכוהול',
+}
 
 logger = logging.getLogger(__name__)
 
 
 class PerplexityReportGenerator:
     """
-    מחלקה לייצור דוחות בעזרת Perplexity API
+    מחלקה לייצור דוחות בעזרת ספקי LLM (Perplexity כברירת מחדל)
     """
     
-    def __init__(self, api_key: str = None, model: str = "sonar"):
+    def __init__(self, api_key: str = None, model: str = "sonar", router: Optional[HedgedRouter] = None):
         """
-        אתחול שירות Perplexity
+        אתחול השירות
         
         Args:
             api_key: API key של Perplexity (יילקח מ-.env אם לא סופק)
             model: שם המודל (ברירת מחדל: sonar)
+            router: נתב ספקים; אם לא סופק - ספק Perplexity יחיד
         """
-        self.api_key = api_key or config('PERPLEXITY_API_KEY', default='')
-        self.model = model or config('PERPLEXITY_MODEL', default='sonar')
-        self.base_url = "https://api.perplexity.ai/chat/completions"
+        self.router = router or HedgedRouter([PerplexityBackend(api_key=api_key, model=model)])
         
-        if not self.api_key:
-            logger.warning("Perplexity API key not found. Please set PERPLEXITY_API_KEY in .env file")
+        if not self.router.available_backends():
+            logger.warning("No LLM backend configured. Please set PERPLEXITY_API_KEY in .env file")
     
     def _make_request(self, messages: List[Dict]) -> str:
-        """ביצוע בקשה ל-Perplexity API"""
+        """ביצוע בקשה דרך נתב הספקים"""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": messages
-            }
-            
-            # לוג הבקשה לדיבוג
-            print(f"Sending request to Perplexity:")
-            print(f"Model: {self.model}")
-            print(f"Messages count: {len(messages)}")
-            print(f"API Key configured: {'Yes' if self.api_key else 'No'}")
-            print(f"First message preview: {str(messages[0])[:200]}...")
-            
-            response = requests.post(self.base_url, json=payload, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result['choices'][0]['message']['content']
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Perplexity API request failed: {e}")
-            # הדפס תגובה מפורטת לדיבוג
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_details = e.response.json()
-                    logger.error(f"API Error Details: {error_details}")
-                    print(f"API Error Details: {error_details}")
-                except:
-                    logger.error(f"API Response Text: {e.response.text}")
-                    print(f"API Response Text: {e.response.text}")
-            raise Exception(f"Perplexity API error: {e}")
-        except KeyError as e:
-            logger.error(f"Unexpected response format: {e}")
-            raise Exception("Invalid response from Perplexity API")
+            return self.router.complete(messages)
+        except BackendError as e:
+            logger.error(f"LLM request failed: {e}")
+            raise Exception(f"LLM API error: {e}")
     
     def generate_report(self, business_data: Dict, requirements: List[Dict]) -> str:
         """
@@ -84,7 +65,7 @@ class PerplexityReportGenerator:
             דוח טקסט מפורט ומותאם
         """
         try:
-            if not self.api_key:
+            if not self.router.available_backends():
                 raise Exception("API key not configured")
             
             # הכנת הודעות לAPI
@@ -96,6 +77,8 @@ class PerplexityReportGenerator:
             # החזרת התוכן הגולמי מ-Perplexity ללא עיצוב נוסף
             return ai_content
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"Error generating report with Perplexity: {e}")
             raise Exception(f"Failed to generate AI report: {e}")
@@ -108,6 +91,7 @@ class PerplexityReportGenerator:
         business_type = business_data.get('business_type', 'עסק')
         area = business_data.get('area_sqm', 0)
         capacity = business_data.get('seating_capacity', 0)
+        jurisdiction = business_data.get('jurisdiction') or 'לא צוינה (דרישות ארציות בלבד)'
         
         # מאפיינים מיוחדים
         features = []
@@ -138,8 +122,6 @@ class PerplexityReportGenerator:
             capacity_req = req.get('capacity_requirements', '')
             special_req = req.get('special_requirements', '')
             priority = req.get('priority', '')
-            cost = req.get('cost_estimate', '')
-            time = req.get('processing_time', '')
             
             if title:
                 req_text = f"{i}. {title}"
@@ -155,47 +137,104 @@ class PerplexityReportGenerator:
                     req_text += f"\n   דרישות מיוחדות: {special_req}"
                 if priority:
                     req_text += f"\n   עדיפות: {priority}"
-                if cost:
-                    req_text += f"\n   עלות: {cost}"
-                if time:
-                    req_text += f"\n   זמן: {time}"
                 requirements_summary.append(req_text)
         
         requirements_text = '\n\n'.join(requirements_summary) if requirements_summary else "אין דרישות ספציפיות"
         
+        # פסקאות נוספות מטקסט התקנות (אחזור BM25)
+        context_paragraphs = business_data.get('context_paragraphs') or []
+        context_text = '\n\n'.join(f"- {hit['text']}" for hit in context_paragraphs)
+        if context_text:
+            context_text = f"""
+
+קטעים רלוונטיים נוספים מטקסט התקנות (לרקע בלבד):
+{context_text}"""
+        
         user_message = f"""אני צריך עזרה ביצירת דוח רישוי עסקים לעסק בישראל:
 
 פרטי העסק:
 - שם: {business_name}
 - סוג: {business_type}
+- רשות מקומית: {jurisdiction}
 - שטח: {area} מ"ר
 - תפוסה: {capacity} מקומות ישיבה
 - מאפיינים: {features_text}
 
 דרישות שנמצאו ({len(requirements)} סה"כ):
-{requirements_text}
+{requirements_text}{context_text}
 
 אנא צור דוח מקצועי בעברית שמבוסס בדיוק על הדרישות שפורטו לעיל.
 
 חשוב: 
 - השתמש רק בדרישות המפורטות למעלה ולא במידע כללי
-- שים לב במיוחד לדרישות שטח ותפוסה אם מצוינות
-- בדוק אם העסק עונה על הגבלות שנקבעו בדרישות
-- אם יש סתירה בין גודל העסק לדרישות - ציין זאת בבירור
+- אל תחשב עלויות וזמני טיפול ואל תבדוק התאמה בין גודל העסק למגבלות השטח והתפוסה - שניהם מוצגים בדוח בנפרד
 
 הדוח צריך לכלול:
 1. תמצית מנהלים - כולל בדיקה אם העסק עונה על הדרישות הבסיסיות
 2. דרישות עיקריות - רק אלה שמופיעות ברשימה
-3. הערכות עלויות וזמנים - על בסיס הדרישות הקיימות
-4. תוכנית פעולה מעשית
-5. המלצות והתראות אם יש בעיות
+3. תוכנית פעולה מעשית
+4. המלצות והתראות אם יש בעיות
 
 הדוח צריך להיות מקצועי, מדויק ומבוסס על הנתונים בלבד."""
 
         return [
             {
                 "role": "system",
-                "content": "אתה יועץ רישוי עסקים מומחה בישראל. אתה מנתח רק את הדרישות הספציפיות שנתונות לך ולא מוסיף מידע כללי מבחוץ. אם יש סתירה בין פרטי העסק לדרישות המפורטות - אתה מציין זאת בבירור. התשובות שלך תמיד בעברית, מדויקות ומבוססות רק על הנתונים שסופקו."
+                "content": "אתה יועץ רישוי עסקים מומחה בישראל. אתה מנתח רק את הדרישות הספציפיות שנתונות לך ולא מוסיף מידע כללי מבחוץ. התשובות שלך תמיד בעברית, מדויקות ומבוססות רק על הנתונים שסופקו."
+            },
+            {
+                "role": "user",
+                "content": user_message
+            }
+        ]
+    
+    def generate_sections(self, business_data: Dict, changes: Dict, sections: List) -> List:
+        """
+        עדכון סעיפים בודדים של דוח קיים אחרי עריכת פרטי העסק
+        
+        Returns:
+            רשימת (כותרת, גוף) של הסעיפים המעודכנים
+        """
+        if not self.router.available_backends():
+            raise Exception("API key not configured")
+        content = self._make_request(self._create_section_messages(business_data, changes, sections))
+        return split_sections(content)
+    
+    def _create_section_messages(self, business_data: Dict, changes: Dict, sections: List) -> List[Dict]:
+        """הודעות לעדכון סעיפים - רק השינויים והסעיפים המושפעים"""
+        changed_lines = [
+            f"- {FIELD_LABELS.get(field, field)}: {old} ← {new}"
+            for field, (old, new) in changes.get('changed_fields', {}).items()
+        ]
+        added_lines = [
+            f"- {req['title'][:200]} (רשות: {req.get('authority') or 'לא צוין'}, עדיפות: {req.get('priority', '')})"
+            + (f"\n  {req['description'][:300]}" if req.get('description') and req['description'] != req['title'] else '')
+            for req in changes.get('added', [])
+        ]
+        removed_lines = [f"- {title[:200]}" for title in changes.get('removed', [])]
+        
+        user_message = f"""הדוח הבא נכתב עבור העסק "{business_data.get('business_name', 'העסק')}" ({business_data.get('business_type', '')}, {business_data.get('area_sqm', 0)} מ"ר, {business_data.get('seating_capacity', 0)} מקומות ישיבה).
+פרטי העסק תוקנו, ויש לעדכן רק את הסעיפים המופיעים למטה.
+
+שינויים בפרטי העסק:
+{chr(10).join(changed_lines) or '- אין'}
+
+דרישות שנוספו:
+{chr(10).join(added_lines) or '- אין'}
+
+דרישות שאינן חלות עוד:
+{chr(10).join(removed_lines) or '- אין'}
+
+הסעיפים לעדכון:
+
+{join_sections(sections)}
+
+החזר את אותם סעיפים בדיוק, עם אותן שורות כותרת ובאותו סדר, כשהתוכן מעודכן לשינויים לעיל. אל תוסיף סעיפים אחרים."""
+        
+        return [
+            {
+                "role": "system",
+                "content": "אתה יועץ רישוי עסקים מומחה בישראל. אתה מעדכן סעיפים בדוח קיים לפי השינויים שנמסרו בלבד, בעברית, ושומר על המבנה והסגנון של הדוח."
             },
             {
                 "role": "user",
@@ -227,12 +266,45 @@ class PerplexityReportGenerator:
 _generator_instance = None
 
 def get_ai_generator():
-    """קבלת מופע יחיד של הגנרטור"""
+    """קבלת מופע יחיד של הגנרטור (הנתב שומר סטטיסטיקה לכל התהליך)"""
     global _generator_instance
     if _generator_instance is None:
-        _generator_instance = PerplexityReportGenerator()
+        _generator_instance = PerplexityReportGenerator(router=build_router())
     return _generator_instance
 
+def business_data_from_assessment(business_assessment) -> Dict:
+    """המרת הערכת עסק לנתונים עבור ה-prompt"""
+    return {
+        'business_name': business_assessment.business_name,
+        'business_type': business_assessment.business_type.name,
+        'jurisdiction': business_assessment.jurisdiction.name if business_assessment.jurisdiction_id else '',
+        'jurisdiction_id': business_assessment.jurisdiction_id,
+        'area_sqm': business_assessment.area_sqm,
+        'seating_capacity': business_assessment.seating_capacity,
+        'uses_gas': business_assessment.uses_gas,
+        'serves_meat': business_assessment.serves_meat,
+        'offers_delivery': business_assessment.offers_delivery,
+        'has_outdoor_seating': business_assessment.has_outdoor_seating,
+        'serves_alcohol': business_assessment.serves_alcohol,
+    }
+
+
+def requirements_as_dicts(requirements_list) -> List[Dict]:
+    """המרת דרישות לפורמט ה-prompt"""
+    return [
+        {
+            'title': req.title,
+            'description': req.description,
+            'authority': req.authority,
+            'priority': req.priority,
+            'category': req.category,
+            'estimated_cost': req.estimated_cost,
+            'processing_time': req.processing_time,
+        }
+        for req in requirements_list
+    ]
+
+
 def generate_ai_report(business_assessment, requirements_list) -> str:
     """
     פונקציה נוחה ליצירת דוח AI
@@ -246,36 +318,53 @@ def generate_ai_report(business_assessment, requirements_list) -> str:
     """
     try:
         # המרת נתונים לפורמט מתאים
-        business_data = {
-            'business_name': business_assessment.business_name,
-            'business_type': business_assessment.business_type.name,
-            'area_sqm': business_assessment.area_sqm,
-            'seating_capacity': business_assessment.seating_capacity,
-            'uses_gas': business_assessment.uses_gas,
-            'serves_meat': business_assessment.serves_meat,
-            'offers_delivery': business_assessment.offers_delivery,
-            'has_outdoor_seating': business_assessment.has_outdoor_seating,
-            'serves_alcohol': business_assessment.serves_alcohol,
-        }
+        business_data = business_data_from_assessment(business_assessment)
+        requirements = requirements_as_dicts(requirements_list)
         
-        # המרת דרישות לפורמט מתאים
-        requirements = []
-        for req in requirements_list:
-            requirements.append({
-                'title': req.title,
-                'description': req.description,
-                'authority': req.authority,
-                'priority': req.priority,
-                'category': req.category,
-                'estimated_cost': req.estimated_cost,
-                'processing_time': req.processing_time,
-            })
+        try:
+            business_data['context_paragraphs'] = retrieve_context(
+                business_data, exclude_requirements=[req.pk for req in requirements_list]
+            )
+        except Exception:
+            logger.warning("Retrieval failed, continuing without context", exc_info=True)
         
         # יצירת הדוח
         generator = get_ai_generator()
         return generator.generate_report(business_data, requirements)
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error in AI report generation: {e}")
         # אין דוח גיבוי - רק Perplexity
         raise Exception(f"Failed to generate AI report: {e}")
+
+
+def generate_ai_sections(business_assessment, changes: Dict, sections: List) -> List:
+    """
+    יצירה מחדש של סעיפים נבחרים בדוח קיים
+    
+    Args:
+        business_assessment: ההערכה אחרי העריכה
+        changes: changed_fields, added, removed (כמו ב-questionnaire.editing)
+        sections: רשימת (כותרת, גוף) של הסעיפים לעדכון
+        
+    Returns:
+        רשימת (כותרת, גוף) כפי שהמודל החזיר
+    """
+    try:
+        generator = get_ai_generator()
+        return generator.generate_sections(
+            business_data_from_assessment(business_assessment),
+            {
+                'changed_fields': changes['changed_fields'],
+                'added': requirements_as_dicts(changes['added']),
+                'removed': [req.title for req in changes['removed']],
+            },
+            sections,
+        )
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error in AI section regeneration: {e}")
+        raise Exception(f"Failed to regenerate report sections: {e}")
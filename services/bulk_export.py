@@ -0,0 +1,131 @@
+"""
+ייצוא המוני של הערכות עסקים והדרישות שהותאמו להן
+
+השורות נשלפות במנות בעזרת ‎.iterator(chunk_size=...)‎ והדרישות נטענות מראש
+לכל מנה בנפרד, כך שצריכת הזיכרון קבועה ללא תלות במספר השורות.
+
+הייצוא כולל גם הערכות שהועברו לארכיון (כשהוא מוגדר): קודם הארכיון ואחריו
+המסד הראשי, כך שהשורות נשארות מסודרות בקירוב לפי זמן היצירה.
+"""
+import csv
+import tempfile
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Prefetch, QuerySet
+
+from questionnaire.archive import archive_ready
+from questionnaire.models import FEATURE_FLAGS, BusinessAssessment, LicensingRequirement
+from questionnaire.routers import ARCHIVE_DB
+
+DEFAULT_CHUNK_SIZE = 500
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+HEADER = [
+    'assessment_id', 'created_at', 'business_name', 'business_type',
+    'area_sqm', 'seating_capacity',
+    *[field for _, field, _ in FEATURE_FLAGS],
+    'report_id', 'requirement_count', 'requirement_ids', 'requirement_titles',
+]
+
+
+def export_queryset(date_from=None, date_to=None, business_types=None, using=None):
+    """שאילתת הייצוא עם סינון לפי טווח תאריכים וסוגי עסקים"""
+    queryset = (
+        BusinessAssessment.objects.using(using)
+        .select_related('business_type', 'assessmentreport')
+        .prefetch_related(Prefetch(
+            'assessmentreport__relevant_requirements',
+            queryset=LicensingRequirement.objects.only('id', 'title').order_by('id'),
+        ))
+        .order_by('pk')
+    )
+    if date_from:
+        queryset = queryset.filter(created_at__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__date__lte=date_to)
+    if business_types:
+        queryset = queryset.filter(business_type__in=business_types)
+    # טעינת שדות הדוח הכבדים אינה נחוצה לייצוא
+    return queryset.defer('assessmentreport__ai_generated_content')
+
+
+def export_querysets(date_from=None, date_to=None, business_types=None, include_archive=True):
+    """שאילתות הייצוא לכל המסדים: הארכיון (אם מוכן) ואחריו המסד הראשי"""
+    databases = [DEFAULT_DB_ALIAS]
+    if include_archive and archive_ready():
+        databases.insert(0, ARCHIVE_DB)
+    return [export_queryset(date_from, date_to, business_types, using=db) for db in databases]
+
+
+def iter_rows(querysets, chunk_size=DEFAULT_CHUNK_SIZE):
+    """מחולל שורות לייצוא - שורה לכל הערכה, משאילתה אחת או מרשימת שאילתות"""
+    if isinstance(querysets, QuerySet):
+        querysets = [querysets]
+    for queryset in querysets:
+        yield from _iter_queryset_rows(queryset, chunk_size)
+
+
+def _iter_queryset_rows(queryset, chunk_size):
+    for assessment in queryset.iterator(chunk_size=chunk_size):
+        report = getattr(assessment, 'assessmentreport', None)
+        requirements = list(report.relevant_requirements.all()) if report else []
+        yield [
+            assessment.pk,
+            assessment.created_at.isoformat(),
+            assessment.business_name,
+            assessment.business_type.name,
+            assessment.area_sqm,
+            assessment.seating_capacity,
+            *[getattr(assessment, field) for _, field, _ in FEATURE_FLAGS],
+            report.pk if report else '',
+            len(requirements),
+            ';'.join(str(req.pk) for req in requirements),
+            ' | '.join(req.title for req in requirements),
+        ]
+
+
+class _Echo:
+    """אובייקט דמוי-קובץ שמחזיר את מה שנכתב אליו, עבור csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """מחולל שורות CSV מקודדות, מתאים ל-StreamingHttpResponse"""
+    writer = csv.writer(_Echo())
+    # BOM כדי ש-Excel יזהה עברית בקידוד UTF-8
+    yield '\ufeff' + writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_csv(rows, file_obj):
+    """כתיבת הייצוא לקובץ פתוח"""
+    for line in stream_csv(rows):
+        file_obj.write(line)
+
+
+def write_xlsx(rows, destination):
+    """
+    כתיבת הייצוא ל-XLSX במצב write-only של openpyxl,
+    שבו כל שורה נכתבת לדיסק מיד ואינה נשמרת בזיכרון
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('assessments')
+    sheet.sheet_view.rightToLeft = True
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(destination)
+
+
+def xlsx_tempfile(rows):
+    """יצירת קובץ XLSX זמני (נמחק בסגירה) מוכן לשליחה"""
+    temp = tempfile.TemporaryFile(suffix='.xlsx')
+    write_xlsx(rows, temp)
+    temp.seek(0)
+    return temp
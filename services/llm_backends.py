@@ -0,0 +1,564 @@
+"""
+ספקי LLM ונתב עם בקשות מגודרות (hedged requests)
+
+כל ספק מממש את LLMBackend.complete(messages, cancel). הנתב שולח את הבקשה
+לספק הראשי, ואם אין תשובה עד אחוזון ההשהיה של הספק (למשל p95) הוא שולח
+בקשה כפולה לספק הבא. התשובה התקינה הראשונה מנצחת והשנייה מבוטלת.
+סטטיסטיקת השהיה ושגיאות לכל ספק קובעת את סדר הניתוב ואת זמן הגידור.
+
+ExchangeRecorder שומר כל החלפה מוצלחת (הודעות, תשובה, השהיה, שימוש) לקובץ
+JSONL, ו-ReplayBackend מגיש אותן מחדש בלי רשת - להרצת מדידות, בדיקות עומס
+ובדיקות רגרסיה של prompts באופן דטרמיניסטי.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+import requests
+from decouple import config
+
+from .admission import AdmissionRejected, outbound_call
+
+logger = logging.getLogger(__name__)
+
+# threads לקריאות יוצאות; מספר הקריאות בפועל מוגבל ע"י הסמפור ב-admission
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm-call')
+
+
+class BackendError(Exception):
+    """כשל בקריאה לספק LLM"""
+
+
+class BackendCancelled(BackendError):
+    """הקריאה בוטלה כי ספק אחר כבר החזיר תשובה"""
+
+
+class CancelToken:
+    """אות ביטול לקריאה שהפסידה; ספקים רושמים פעולות ביטול (למשל סגירת חיבור)"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        # שימוש בטוקנים שהספק דיווח בקריאה הזו (לתיעוד)
+        self.usage = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.debug("Cancel callback failed", exc_info=True)
+
+
+class BackendStats:
+    """השהיות אחרונות ושיעור שגיאות של ספק (בטוח ל-threads)"""
+
+    def __init__(self, window=200, failure_threshold=3, cooldown=30.0):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.wins = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def record_cancelled(self, elapsed):
+        """
+        קריאה שבוטלה לפני שסיימה: הזמן שעבר הוא חסם תחתון להשהיה שלה.
+        בלעדיו הזנב האיטי נעלם מהדגימות, האחוזון יורד והגידור מופעל יותר ויותר
+        """
+        with self._lock:
+            self.latencies.append(elapsed)
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    def record_win(self):
+        with self._lock:
+            self.wins += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def percentile(self, p):
+        """אחוזון השהיה בשניות, או None אם אין מספיק דגימות"""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < 5:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def error_rate(self):
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return self.outcomes.count(False) / len(self.outcomes)
+
+    def circuit_open(self):
+        """ספק שנכשל שוב ושוב מושבת לזמן קצר"""
+        with self._lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def snapshot(self):
+        return {
+            'calls': len(self.outcomes),
+            'error_rate': round(self.error_rate(), 3),
+            'p50_ms': _ms(self.percentile(50)),
+            'p95_ms': _ms(self.percentile(95)),
+            'circuit_open': self.circuit_open(),
+            'wins': self.wins,
+            'hedges': self.hedges,
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000)
+
+
+class LLMBackend:
+    """ממשק ספק LLM"""
+
+    name = 'backend'
+
+    def __init__(self, name: Optional[str] = None):
+        if name:
+            self.name = name
+        self.stats = BackendStats()
+
+    @property
+    def available(self) -> bool:
+        """האם הספק מוגדר (למשל יש מפתח API)"""
+        return True
+
+    def complete(self, messages: List[Dict], cancel: CancelToken) -> str:
+        """שליחת הודעות והחזרת תוכן התשובה; זורקת BackendError בכשל"""
+        raise NotImplementedError
+
+
+class ChatCompletionsBackend(LLMBackend):
+    """
+    ספק עם API בפורמט chat/completions (Perplexity, שרת תואם OpenAI)
+
+    התשובה נקראת בזרימה (stream): בין חלק לחלק נבדק אות הביטול, וכל קריאה
+    מהחיבור מוגבלת ל-read_timeout, כך שקריאה שהפסידה משחררת את ה-thread
+    זמן קצר אחרי הביטול. המקום בסמפור היוצא משוחרר מיד עם הביטול.
+    """
+
+    def __init__(self, base_url: str, model: str, api_key: str = '', name: Optional[str] = None,
+                 timeout: float = 30, require_key: bool = True, read_timeout: float = 10):
+        super().__init__(name or model)
+        self.base_url = base_url
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.read_timeout = min(read_timeout, timeout)
+        self.require_key = require_key
+
+    @property
+    def available(self):
+        return bool(self.api_key) or not self.require_key
+
+    def complete(self, messages, cancel):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        payload = {"model": self.model, "messages": messages, "stream": True}
+
+        logger.debug("Sending LLM request", extra={
+            'backend': self.name,
+            'model': self.model,
+            'message_count': len(messages),
+            'prompt_chars': sum(len(message.get('content', '')) for message in messages),
+        })
+
+        session = requests.Session()
+        cancel.on_cancel(session.close)
+        try:
+            with outbound_call() as release_slot:
+                cancel.on_cancel(release_slot)
+                if cancel.cancelled:
+                    raise BackendCancelled(self.name)
+                deadline = time.monotonic() + self.timeout
+                response = session.post(
+                    self.base_url, json=payload, headers=headers, stream=True,
+                    timeout=(self.read_timeout, self.read_timeout),
+                )
+                with response:
+                    response.raise_for_status()
+                    content, usage = self._read(response, cancel, deadline)
+            logger.info("LLM request completed", extra={
+                'backend': self.name,
+                'model': self.model,
+                'usage': usage,
+            })
+            cancel.usage = usage
+            return content
+        except requests.exceptions.RequestException as e:
+            if cancel.cancelled:
+                raise BackendCancelled(self.name)
+            if getattr(e, 'response', None) is not None:
+                logger.error("LLM API error details", extra={
+                    'backend': self.name, 'status': e.response.status_code, 'body': e.response.text[:500],
+                })
+            raise BackendError(f"{self.name}: {e}")
+        except (KeyError, IndexError, ValueError) as e:
+            raise BackendError(f"{self.name}: invalid response ({e})")
+        finally:
+            session.close()
+
+    def _read(self, response, cancel, deadline):
+        """
+        קריאת התשובה: אירועי SSE (data: {...}) עם חלקי התוכן, או JSON רגיל
+        משרת שמתעלם מ-stream. Returns: (תוכן, usage)
+        """
+        if 'text/event-stream' not in response.headers.get('Content-Type', ''):
+            result = response.json()
+            return result['choices'][0]['message']['content'], result.get('usage')
+
+        parts, usage = [], None
+        for line in response.iter_lines(decode_unicode=True):
+            if cancel.cancelled:
+                raise BackendCancelled(self.name)
+            if time.monotonic() > deadline:
+                raise BackendError(f"{self.name}: timed out after {self.timeout}s")
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            chunk = json.loads(data)
+            usage = chunk.get('usage') or usage
+            if chunk.get('choices'):
+                parts.append(chunk['choices'][0].get('delta', {}).get('content') or '')
+        return ''.join(parts), usage
+
+
+class PerplexityBackend(ChatCompletionsBackend):
+    """Perplexity API"""
+
+    BASE_URL = "https://api.perplexity.ai/chat/completions"
+
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None, name: Optional[str] = None,
+                 timeout: float = 30, read_timeout: float = 10):
+        super().__init__(
+            self.BASE_URL,
+            model or config('PERPLEXITY_MODEL', default='sonar'),
+            api_key=api_key or config('PERPLEXITY_API_KEY', default=''),
+            name=name,
+            timeout=timeout,
+            read_timeout=read_timeout,
+        )
+
+
+class OpenAICompatibleBackend(ChatCompletionsBackend):
+    """שרת תואם OpenAI (למשל מודל מקומי); מפתח API אופציונלי"""
+
+    def __init__(self, base_url: str, model: str, api_key: str = '', name: Optional[str] = None,
+                 timeout: float = 30, read_timeout: float = 10):
+        super().__init__(
+            base_url, model, api_key=api_key, name=name, timeout=timeout, require_key=False,
+            read_timeout=read_timeout,
+        )
+
+
+class HedgedRouter:
+    """
+    ניתוב בין ספקים: הראשי לפי שיעור שגיאות וסדר ההגדרה, וגידור לספק הבא
+    כשהראשי חורג מאחוזון ההשהיה שלו
+    """
+
+    def __init__(self, backends: List[LLMBackend], hedge_percentile: float = 95,
+                 default_hedge_delay: float = 5.0, min_hedge_delay: float = 0.5,
+                 max_error_rate: float = 0.5, max_attempts: int = 2, recorder=None):
+        self.backends = list(backends)
+        self.recorder = recorder
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_error_rate = max_error_rate
+        self.max_attempts = max_attempts
+
+    def available_backends(self):
+        return [backend for backend in self.backends if backend.available]
+
+    def ordered_backends(self):
+        """ספקים זמינים לפי בריאות; בתוך אותה רמה - לפי סדר ההגדרה"""
+        return sorted(
+            self.available_backends(),
+            key=lambda backend: (backend.stats.circuit_open(), backend.stats.error_rate() > self.max_error_rate),
+        )
+
+    def hedge_delay(self, backend):
+        """זמן ההמתנה לספק לפני שליחת בקשה כפולה"""
+        delay = backend.stats.percentile(self.hedge_percentile)
+        if delay is None:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, delay)
+
+    def _call(self, backend, messages, cancel):
+        started = time.monotonic()
+        try:
+            content = backend.complete(messages, cancel)
+        except (BackendCancelled, AdmissionRejected):
+            # דחייה מקומית אינה כשל של הספק
+            raise
+        except Exception:
+            if not cancel.cancelled:
+                backend.stats.record_failure()
+            raise
+        if cancel.cancelled:
+            raise BackendCancelled(backend.name)
+        if not content:
+            backend.stats.record_failure()
+            raise BackendError(f"{backend.name}: empty response")
+        backend.stats.record_success(time.monotonic() - started)
+        return content
+
+    def complete(self, messages: List[Dict]) -> str:
+        """התשובה התקינה הראשונה מבין הספקים; זורקת BackendError אם כולם נכשלו"""
+        candidates = self.ordered_backends()[:self.max_attempts]
+        if not candidates:
+            raise BackendError("No LLM backend configured")
+
+        pending = {}
+        errors = []
+
+        def launch(backend, hedged=False):
+            cancel = CancelToken()
+            future = _executor.submit(self._call, backend, messages, cancel)
+            pending[future] = (backend, cancel, time.monotonic())
+            if hedged:
+                backend.stats.record_hedge()
+                logger.info("Hedging LLM request", extra={'backend': backend.name})
+
+        launch(candidates[0])
+        remaining = candidates[1:]
+        timeout = self.hedge_delay(candidates[0]) if remaining else None
+
+        while pending:
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # הראשי איטי מהרגיל - בקשה כפולה לספק הבא
+                launch(remaining.pop(0), hedged=True)
+                timeout = None
+                continue
+            for future in done:
+                backend, winner, started = pending.pop(future)
+                try:
+                    content = future.result()
+                except Exception as e:
+                    logger.warning("LLM backend failed", extra={'backend': backend.name, 'error': str(e)})
+                    errors.append(e)
+                    continue
+                backend.stats.record_win()
+                now = time.monotonic()
+                for loser, cancel, loser_started in pending.values():
+                    cancel.cancel()
+                    loser.stats.record_cancelled(now - loser_started)
+                if self.recorder is not None:
+                    self._record(messages, content, backend, time.monotonic() - started, winner.usage)
+                return content
+            if remaining and not pending:
+                # הספק נכשל לפני זמן הגידור - עוברים מיד לבא
+                launch(remaining.pop(0))
+                timeout = None
+
+        rejected = [e for e in errors if isinstance(e, AdmissionRejected)]
+        if rejected and len(rejected) == len(errors):
+            raise rejected[0]
+        raise BackendError("; ".join(str(e) for e in errors) or "all backends failed")
+
+    def _record(self, messages, content, backend, latency, usage):
+        try:
+            self.recorder.record(messages, content, backend.name, latency, usage)
+        except OSError:
+            # תקלה בהקלטה לא מפילה את הבקשה
+            logger.warning("Failed to record LLM exchange", exc_info=True)
+
+    def stats(self):
+        return {backend.name: backend.stats.snapshot() for backend in self.backends}
+
+
+def messages_key(messages: List[Dict]) -> str:
+    """מפתח יציב לרשימת הודעות - לזיהוי החלפה מוקלטת"""
+    canonical = json.dumps(messages, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ExchangeRecorder:
+    """הוספת החלפות מוצלחות לקובץ JSONL, שורה לכל החלפה"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def record(self, messages, content, backend, latency, usage=None):
+        line = json.dumps({
+            'key': messages_key(messages),
+            'recorded_at': datetime.now(timezone.utc).isoformat(),
+            'backend': backend,
+            'latency': round(latency, 4),
+            'usage': usage,
+            'messages': messages,
+            'response': content,
+        }, ensure_ascii=False)
+        # כתיבה אחת במצב append - שורות שלמות גם כשכמה תהליכים מקליטים יחד
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+def load_recordings(path) -> List[Dict]:
+    """כל ההחלפות בקובץ הקלטה; שורות פגומות (למשל שורה אחרונה קטועה) מדולגות"""
+    exchanges = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                exchange = json.loads(line)
+            except ValueError:
+                continue
+            if 'response' in exchange and 'messages' in exchange:
+                exchange.setdefault('key', messages_key(exchange['messages']))
+                exchanges.append(exchange)
+    return exchanges
+
+
+class ReplayBackend(LLMBackend):
+    """
+    ספק שמגיש תשובות מוקלטות לפי מפתח ההודעות
+
+    Args:
+        latency: None - תשובה מיידית; 'recorded' - ההשהיה שנמדדה בהחלפה
+            עצמה; 'sampled' - דגימה מהתפלגות ההשהיות בקובץ (עם seed קבוע)
+        speed: מקדם האצה של ההשהיה (2.0 = פי שניים מהר יותר)
+        strict: בקשה שאין לה הקלטה נכשלת; אחרת מוגשות ההקלטות לפי הסדר
+    """
+
+    name = 'replay'
+
+    def __init__(self, path, latency: Optional[str] = None, speed: float = 1.0, strict: bool = True,
+                 seed: int = 0, name: Optional[str] = None):
+        super().__init__(name)
+        if latency not in (None, 'recorded', 'sampled'):
+            raise ValueError(f"Unknown latency mode: {latency}")
+        self.path = str(path)
+        self.latency = latency
+        self.speed = speed
+        self.strict = strict
+        self.exchanges = load_recordings(self.path)
+        self.by_key = defaultdict(list)
+        for exchange in self.exchanges:
+            self.by_key[exchange['key']].append(exchange)
+        self._served = defaultdict(int)
+        self._sequence = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return bool(self.exchanges)
+
+    def _next(self, key):
+        """הקלטה לבקשה; כמה הקלטות לאותו מפתח מוגשות לפי הסדר, במחזוריות"""
+        with self._lock:
+            candidates = self.by_key.get(key)
+            if candidates:
+                exchange = candidates[self._served[key] % len(candidates)]
+                self._served[key] += 1
+            elif self.strict:
+                return None, 0.0
+            else:
+                exchange = self.exchanges[self._sequence % len(self.exchanges)]
+                self._sequence += 1
+            if self.latency == 'sampled':
+                delay = self._random.choice(self.exchanges).get('latency', 0.0)
+            elif self.latency == 'recorded':
+                delay = exchange.get('latency', 0.0)
+            else:
+                delay = 0.0
+        return exchange, delay / self.speed
+
+    def complete(self, messages, cancel):
+        exchange, delay = self._next(messages_key(messages))
+        if exchange is None:
+            raise BackendError(f"{self.name}: no recording for request")
+        if delay and cancel.wait(delay):
+            raise BackendCancelled(self.name)
+        cancel.usage = exchange.get('usage')
+        return exchange['response']
+
+
+BACKEND_KINDS = {
+    'perplexity': PerplexityBackend,
+    'openai': OpenAICompatibleBackend,
+    'replay': ReplayBackend,
+}
+
+
+def build_backend(spec: Dict) -> LLMBackend:
+    """בניית ספק מהגדרה ב-settings.LLM_BACKENDS"""
+    spec = dict(spec)
+    kind = spec.pop('kind')
+    api_key_env = spec.pop('api_key_env', None)
+    if api_key_env:
+        spec['api_key'] = config(api_key_env, default='')
+    return BACKEND_KINDS[kind](**spec)
+
+
+def build_router(settings_obj=None) -> HedgedRouter:
+    """בניית נתב מ-LLM_BACKENDS ופרמטרי הגידור שב-settings"""
+    if settings_obj is None:
+        from django.conf import settings as settings_obj
+    specs = getattr(settings_obj, 'LLM_BACKENDS', None) or [{'kind': 'perplexity'}]
+    record_path = getattr(settings_obj, 'LLM_RECORD_PATH', None)
+    return HedgedRouter(
+        [build_backend(spec) for spec in specs],
+        hedge_percentile=getattr(settings_obj, 'LLM_HEDGE_PERCENTILE', 95),
+        default_hedge_delay=getattr(settings_obj, 'LLM_HEDGE_DEFAULT_DELAY', 5.0),
+        recorder=ExchangeRecorder(record_path) if record_path else None,
+    )
@@ -0,0 +1,217 @@
+"""
+ייצוא דוחות הערכה לקובץ Word עם מאגר גרסאות שמור בדיסק
+
+כל גרסה של דוח מזוהה בגיבוב (hash) של התוכן שממנו הוא נבנה. הקובץ נוצר
+פעם אחת לכל גרסה ונשמר תחת מזהה הדוח והגיבוב, כך שהורדות חוזרות הן שליחת
+קובץ בלבד. לכל דוח נשמרות רק REPORT_EXPORT_KEEP הגרסאות האחרונות.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from questionnaire import compliance, costs
+from questionnaire.corpus import jurisdiction_version
+
+logger = logging.getLogger(__name__)
+
+# להעלות בכל שינוי בפריסת המסמך, כדי שגרסאות ישנות ייווצרו מחדש
+EXPORT_LAYOUT_VERSION = 3
+
+DEFAULT_KEEP = 3
+
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+PRIORITY_SECTIONS = [
+    ('high', 'דרישות בעדיפות גבוהה'),
+    ('medium', 'דרישות בעדיפות בינונית'),
+    ('low', 'דרישות בעדיפות נמוכה'),
+]
+
+
+def export_dir() -> Path:
+    path = Path(getattr(settings, 'REPORT_EXPORT_DIR', settings.BASE_DIR / 'exports'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _requirement_rows(report):
+    return list(
+        report.relevant_requirements.order_by('pk').values(
+            'pk', 'title', 'description', 'authority', 'priority',
+            'estimated_cost', 'processing_time',
+        )
+    )
+
+
+def _compliance(report):
+    from questionnaire.views import sized_requirements
+
+    return compliance.check(report.assessment, sized_requirements(report.assessment))
+
+
+def report_fingerprint(report, requirements=None) -> str:
+    """
+    גיבוב של כל הנתונים שמרכיבים את המסמך - משמש כמזהה גרסה וכ-ETag.
+    ממצאי ההתאמה לגודל תלויים בפרטי העסק ובמחיצת המאגר של הרשות, ולכן
+    נכנסת גרסת המחיצה במקום לחשב אותם בכל הורדה.
+    """
+    assessment = report.assessment
+    if requirements is None:
+        requirements = _requirement_rows(report)
+    payload = {
+        'layout': EXPORT_LAYOUT_VERSION,
+        'report': report.pk,
+        'content': report.ai_generated_content,
+        'business': {
+            'name': assessment.business_name,
+            'type': assessment.business_type.name,
+            'area': assessment.area_sqm,
+            'capacity': assessment.seating_capacity,
+            'features': assessment.feature_mask,
+        },
+        'requirements': requirements,
+        'corpus': jurisdiction_version(assessment.jurisdiction_id),
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _rtl(paragraph):
+    """סימון פסקה ככתובה מימין לשמאל"""
+    paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    properties = paragraph._p.get_or_add_pPr()
+    bidi = OxmlElement('w:bidi')
+    bidi.set(qn('w:val'), '1')
+    properties.append(bidi)
+    return paragraph
+
+
+def build_docx(report, requirements, destination):
+    """בניית מסמך Word לדוח ושמירתו בנתיב שסופק"""
+    assessment = report.assessment
+    findings = _compliance(report)
+    doc = Document()
+
+    _rtl(doc.add_heading(f'דוח הערכת רישוי - {assessment.business_name}', level=0))
+
+    _rtl(doc.add_heading('פרטי העסק', level=1))
+    features = [
+        str(field.verbose_name)
+        for field in assessment._meta.fields
+        if field.name in ('uses_gas', 'serves_meat', 'offers_delivery', 'has_outdoor_seating', 'serves_alcohol')
+        and getattr(assessment, field.name)
+    ]
+    for label, value in [
+        ('שם העסק', assessment.business_name),
+        ('סוג העסק', assessment.business_type.name),
+        ('שטח', f'{assessment.area_sqm} מ"ר'),
+        ('מקומות ישיבה', assessment.seating_capacity),
+        ('מאפיינים מיוחדים', ', '.join(features) if features else 'אין מאפיינים מיוחדים'),
+    ]:
+        _rtl(doc.add_paragraph(f'{label}: {value}'))
+
+    if report.ai_generated_content:
+        _rtl(doc.add_heading('דוח חכם שנוצר על ידי AI', level=1))
+        for block in report.ai_generated_content.split('\n'):
+            if block.strip():
+                _rtl(doc.add_paragraph(block.strip()))
+
+    summary = costs.summarize(report.relevant_requirements.all())
+    if summary['priced'] or summary['timed']:
+        _rtl(doc.add_heading('עלויות וזמני טיפול משוערים', level=1))
+        if summary['priced']:
+            _rtl(doc.add_paragraph(
+                f"עלות כוללת: {summary['cost_range']} (לפי {summary['priced']} דרישות עם עלות ידועה)"
+            ))
+        if summary['timed']:
+            sequential = f"; עד {summary['days_sequential']} אם בזה אחר זה" if summary['days_sequential'] else ''
+            _rtl(doc.add_paragraph(f"זמן טיפול: {summary['days_range']} כשההליכים מתנהלים במקביל{sequential}"))
+
+    if findings['violations'] or findings['warnings']:
+        _rtl(doc.add_heading('בדיקת התאמה לגודל העסק', level=1))
+        for prefix, group in (('הפרה', 'violations'), ('אזהרה', 'warnings')):
+            for finding in findings[group]:
+                _rtl(doc.add_paragraph(f"{prefix} - {finding['requirement'].title}: {finding['message']}"))
+
+    for priority, title in PRIORITY_SECTIONS:
+        section = [req for req in requirements if req['priority'] == priority]
+        if not section:
+            continue
+        _rtl(doc.add_heading(f'{title} ({len(section)})', level=1))
+        for req in section:
+            _rtl(doc.add_paragraph(req['title'], style='List Number'))
+            if req['description'] and req['description'] != req['title']:
+                _rtl(doc.add_paragraph(req['description']))
+            details = [
+                f'{label}: {req[key]}'
+                for key, label in [
+                    ('authority', 'רשות מוסמכת'),
+                    ('estimated_cost', 'עלות משוערת'),
+                    ('processing_time', 'זמן טיפול'),
+                ]
+                if req[key]
+            ]
+            if details:
+                _rtl(doc.add_paragraph(' | '.join(details)))
+
+    _rtl(doc.add_paragraph(
+        f'הדוח מבוסס על הנתונים שסופקו ועדכני לתאריך {report.created_at:%d/%m/%Y}'
+    ))
+
+    # כתיבה אטומית - קובץ זמני ואז החלפה
+    fd, temp_path = tempfile.mkstemp(dir=destination.parent, suffix='.tmp')
+    os.close(fd)
+    try:
+        doc.save(temp_path)
+        os.replace(temp_path, destination)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+
+def _export_path(report, fingerprint):
+    return export_dir() / f'report-{report.pk}-{fingerprint}.docx'
+
+
+def prune_exports(report, keep=None):
+    """מחיקת הגרסאות הישנות של הדוח מעבר ל-keep האחרונות; מחזיר כמה נמחקו"""
+    if keep is None:
+        keep = getattr(settings, 'REPORT_EXPORT_KEEP', DEFAULT_KEEP)
+    files = sorted(
+        export_dir().glob(f'report-{report.pk}-*.docx'), key=lambda path: path.stat().st_mtime, reverse=True
+    )
+    for path in files[keep:]:
+        path.unlink(missing_ok=True)
+    return len(files[keep:])
+
+
+def get_report_docx(report, fingerprint=None):
+    """
+    החזרת נתיב קובץ ה-Word של הגרסה הנוכחית של הדוח ויצירתו רק אם חסר
+
+    Args:
+        fingerprint: גיבוב שכבר חושב (למשל לבדיקת ETag לפני ההורדה)
+    Returns:
+        (נתיב הקובץ, גיבוב הגרסה)
+    """
+    requirements = None
+    if fingerprint is None:
+        requirements = _requirement_rows(report)
+        fingerprint = report_fingerprint(report, requirements)
+    path = _export_path(report, fingerprint)
+    if not path.exists():
+        logger.info("Rendering DOCX for report %s (%s)", report.pk, fingerprint[:12])
+        if requirements is None:
+            requirements = _requirement_rows(report)
+        build_docx(report, requirements, path)
+        prune_exports(report)
+    return path, fingerprint
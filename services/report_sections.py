@@ -0,0 +1,113 @@
+"""
+פירוק דוח AI לסעיפים ויצירה מחדש של הסעיפים שהושפעו מעריכה בלבד
+
+הדוח מחולק לסעיפים לפי שורות כותרת (Markdown # או שורה מודגשת). אחרי עריכת
+הערכה מחושב אילו סעיפים מזכירים נתון שהשתנה או דרישה שנוספה/הוסרה; רק הם
+נשלחים למודל, וכל השאר נשמרים כפי שהם.
+"""
+import re
+
+_HEADING_RE = re.compile(r'^\s*(?:#{1,6}\s+\S.*|\*\*[^*\n]{2,120}\*\*:?)\s*$')
+
+# מאפיינים -> מילים שמופיעות בדוח כשהמאפיין נדון
+FEATURE_WORDS = {
+    'uses_gas': ['גז'],
+    'serves_meat': ['בשר'],
+    'offers_delivery': ['משלוח'],
+    'has_outdoor_seating': ['בחוץ', 'חיצוני'],
+    'serves_alcohol': ['אלכוהול', 'משקאות משכרים'],
+}
+
+# סעיפים שמסכמים את כל רשימת הדרישות ומושפעים מכל שינוי בה
+REQUIREMENT_SECTION_WORDS = ['תמצית', 'דרישות', 'עלויות', 'עלות', 'זמנים', 'תוכנית', 'פעולה']
+
+FULL_REGENERATION = '*'
+
+
+def split_sections(content):
+    """
+    פירוק לסעיפים: רשימת (כותרת, גוף). טקסט שלפני הכותרת הראשונה
+    נשמר כסעיף עם כותרת ריקה.
+    """
+    sections = []
+    heading, lines = '', []
+    for line in (content or '').splitlines():
+        if _HEADING_RE.match(line):
+            if heading or any(part.strip() for part in lines):
+                sections.append((heading, '\n'.join(lines).strip('\n')))
+            heading, lines = line.strip(), []
+        else:
+            lines.append(line)
+    if heading or any(part.strip() for part in lines):
+        sections.append((heading, '\n'.join(lines).strip('\n')))
+    return sections
+
+
+def join_sections(sections):
+    parts = []
+    for heading, body in sections:
+        parts.append(f"{heading}\n{body}" if heading else body)
+    return '\n\n'.join(part.strip('\n') for part in parts)
+
+
+def heading_key(heading):
+    """השוואת כותרות ללא סימוני עיצוב ומספור"""
+    text = re.sub(r'[#*:]', '', heading)
+    text = re.sub(r'^\s*\d+[.)]\s*', '', text.strip())
+    return ' '.join(text.split())
+
+
+def _title_marker(title):
+    words = (title or '').split()
+    return ' '.join(words[:5]) if len(words) >= 3 else (title or '').strip()
+
+
+def affected_sections(sections, changed_fields, added, removed):
+    """
+    הכותרות של הסעיפים שיש לייצר מחדש
+
+    Args:
+        changed_fields: שדה -> (ערך ישן, ערך חדש)
+        added, removed: דרישות שנוספו / הוסרו מההתאמה
+    """
+    markers = []
+    for field, (old, new) in changed_fields.items():
+        if field in FEATURE_WORDS:
+            markers.extend(FEATURE_WORDS[field])
+        elif isinstance(old, int):
+            markers.append(re.compile(rf'(?<!\d){old}(?!\d)'))
+        elif old:
+            markers.append(str(old))
+    markers.extend(_title_marker(req.title) for req in removed if req.title)
+
+    affected = []
+    for index, (heading, body) in enumerate(sections):
+        text = f"{heading}\n{body}"
+        hit = any(
+            marker.search(text) if hasattr(marker, 'search') else marker in text
+            for marker in markers
+        )
+        if not hit and (added or removed):
+            hit = index == 0 or any(word in heading for word in REQUIREMENT_SECTION_WORDS)
+        if hit:
+            affected.append(heading)
+    return affected
+
+
+def merge_sections(sections, replacements):
+    """
+    החלפת הסעיפים שנוצרו מחדש; סעיף שהמודל לא החזיר נשאר כפי שהיה
+
+    Returns:
+        (רשימת סעיפים, כותרות שהוחלפו בפועל)
+    """
+    by_key = {heading_key(heading): body for heading, body in replacements}
+    merged, replaced = [], []
+    for heading, body in sections:
+        new_body = by_key.get(heading_key(heading))
+        if new_body is not None and new_body.strip():
+            merged.append((heading, new_body))
+            replaced.append(heading)
+        else:
+            merged.append((heading, body))
+    return merged, replaced
@@ -0,0 +1,406 @@
+"""
+אינדקס BM25 על פסקאות מאגר הדרישות, לעיגון הדוח בטקסט התקנות
+
+האינדקס הוא מטריצה דלילה בפורמט CSR לפי מונח: לכל מונח רשימת פסקאות
+ומשקל BM25 מחושב מראש, כך שדירוג שאילתה הוא סכימה של כמה שורות בלבד.
+המערכים נשמרים בקובץ בינארי וממופים לזיכרון (mmap) בטעינה, והמטא-דאטה
+(אוצר מילים וטקסט הפסקאות) בקובץ JSON לצידו.
+
+לכל רשות זוג קבצים משלה, ולדרישות הארציות זוג נפרד, עם IDF משלו. חיפוש
+במחיצה של רשות קורא רק את האינדקס שלה ואת הארצי, וכל אינדקס נטען מחדש
+בנפרד - בנייה מחדש של עיר אחת אינה נוגעת בקבצים ובמטמון של האחרות.
+"""
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 3
+BINARY_NAME = 'bm25-{}.bin'
+META_NAME = 'bm25-{}.json'
+
+# חיפוש בכל המחיצות (לעומת None - ארצי בלבד)
+ALL_JURISDICTIONS = 'all'
+NATIONAL = 'national'
+
+K1 = 1.5
+B = 0.75
+
+# תחיליות נפוצות (ו, ה, ב, ל, מ, ש, כ) - מוסרות רק ממילים ארוכות מספיק
+HEBREW_PREFIXES = 'והבלמשכ'
+MIN_STEM_LENGTH = 3
+
+STOPWORDS = {
+    'של', 'על', 'את', 'עם', 'או', 'גם', 'כי', 'אם', 'לא', 'זה', 'זו', 'אשר', 'כל', 'כאמור',
+    'יהיה', 'תהיה', 'יהיו', 'הוא', 'היא', 'הם', 'הן', 'בו', 'בה', 'לו', 'לה', 'אל', 'מן',
+    'לפי', 'לעניין', 'סעיף', 'להלן', 'the', 'of', 'and', 'or', 'to', 'in',
+}
+
+_WORD_RE = re.compile(r'[^\W\d_]+|\d+', re.UNICODE)
+
+# מונחי חיפוש לכל מאפיין בשאלון
+FEATURE_TERMS = {
+    'uses_gas': 'גז גפ"מ מתקן גז',
+    'serves_meat': 'בשר עוף דגים מוצרי בשר',
+    'offers_delivery': 'משלוחים שליחת מזון',
+    'has_outdoor_seating': 'ישיבה מחוץ שטח חיצוני מדרכה',
+    'serves_alcohol': 'משקאות משכרים אלכוהול',
+}
+
+
+def normalize(text):
+    """הסרת ניקוד וטעמים ואותיות סופיות, והמרה לאותיות קטנות"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not ('֑' <= ch <= 'ׇ'))
+    return text.translate(str.maketrans('ךםןףץ', 'כמנפצ')).lower()
+
+
+def tokenize(text):
+    """פירוק טקסט עברי למונחים: המילה עצמה וגם הגרסה ללא תחילית"""
+    tokens = []
+    for word in _WORD_RE.findall(normalize(text or '')):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        tokens.append(word)
+        if word[0] in HEBREW_PREFIXES and len(word) - 1 >= MIN_STEM_LENGTH:
+            stem = word[1:]
+            if stem not in STOPWORDS:
+                tokens.append(stem)
+    return tokens
+
+
+def estimate_tokens(text):
+    """הערכה גסה של מספר ה-tokens של המודל (עברית ~3 תווים ל-token)"""
+    return len(text) // 3 + 1
+
+
+def split_paragraphs(text):
+    return [part.strip() for part in re.split(r'\n\s*\n|\r?\n', text or '') if part.strip()]
+
+
+def index_dir():
+    return Path(getattr(settings, 'RETRIEVAL_INDEX_DIR', settings.BASE_DIR / 'indexes'))
+
+
+def corpus_paragraphs(jurisdiction_ids=None):
+    """
+    פסקאות המאגר: (מזהה דרישה, טקסט, מזהה רשות או None)
+
+    Args:
+        jurisdiction_ids: רק הרשויות האלה (None ברשימה - הדרישות הארציות)
+    """
+    from django.db.models import Q
+    from questionnaire.models import LicensingRequirement
+
+    rows = LicensingRequirement.objects.order_by('pk')
+    if jurisdiction_ids is not None:
+        scope = Q(jurisdiction__in=[jid for jid in jurisdiction_ids if jid is not None])
+        if None in jurisdiction_ids:
+            scope |= Q(jurisdiction__isnull=True)
+        rows = rows.filter(scope)
+    for pk, title, description, jurisdiction_id in rows.values_list('pk', 'title', 'description', 'jurisdiction_id'):
+        seen = set()
+        for paragraph in split_paragraphs(description) or [title]:
+            if paragraph not in seen:
+                seen.add(paragraph)
+                yield pk, paragraph, jurisdiction_id
+
+
+def _partition_key(jurisdiction_id):
+    return NATIONAL if jurisdiction_id is None else str(jurisdiction_id)
+
+
+def _partition_id(key):
+    return None if key == NATIONAL else int(key)
+
+
+def partition_keys(directory=None):
+    """המחיצות שיש להן אינדקס על הדיסק"""
+    directory = Path(directory or index_dir())
+    prefix, suffix = META_NAME.split('{}')
+    return sorted(path.name[len(prefix):-len(suffix)] for path in directory.glob(META_NAME.format('*')))
+
+
+def build_index(paragraphs, corpus_version=0, directory=None, jurisdiction_ids=None):
+    """
+    בניית האינדקסים וכתיבתם לדיסק - זוג קבצים לכל מחיצה (כתיבה אטומית)
+
+    Args:
+        paragraphs: רשימת (מזהה דרישה, טקסט[, מזהה רשות])
+        corpus_version: גרסה לכל האינדקסים, או פונקציה ממזהה רשות לגרסה
+        jurisdiction_ids: בנייה מחדש של המחיצות האלה בלבד (None - כולן,
+            ומחיצות שאין להן עוד פסקאות נמחקות)
+    Returns:
+        מילון סיכום: מספר פסקאות, מונחים ומחיצות
+    """
+    directory = Path(directory or index_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+
+    groups = {}
+    for paragraph in paragraphs:
+        requirement_id, text, jurisdiction_id = (tuple(paragraph) + (None,))[:3]
+        groups.setdefault(_partition_key(jurisdiction_id), []).append((requirement_id, text))
+
+    if jurisdiction_ids is None:
+        targets = set(groups) | set(partition_keys(directory))
+    else:
+        targets = {_partition_key(jid) for jid in jurisdiction_ids}
+
+    summary = {'paragraphs': 0, 'terms': 0, 'nnz': 0, 'partitions': 0}
+    for key in sorted(targets):
+        if key not in groups:
+            _remove_partition(directory, key)
+            continue
+        version = corpus_version(_partition_id(key)) if callable(corpus_version) else corpus_version
+        built = _build_partition(directory, key, groups[key], version)
+        for field in ('paragraphs', 'terms', 'nnz'):
+            summary[field] += built[field]
+        summary['partitions'] += 1
+    return summary
+
+
+def _build_partition(directory, key, docs, corpus_version):
+    """אינדקס של מחיצה אחת - ה-IDF מחושב על הפסקאות שלה בלבד"""
+    postings = {}
+    lengths = array('f')
+    for doc_id, (_, text) in enumerate(docs):
+        terms = Counter(tokenize(text))
+        lengths.append(sum(terms.values()))
+        for term, tf in terms.items():
+            postings.setdefault(term, []).append((doc_id, tf))
+
+    n_docs = len(docs)
+    avg_length = (sum(lengths) / n_docs) if n_docs else 0.0
+    vocabulary = sorted(postings)
+
+    indptr = array('q', [0])
+    doc_ids = array('i')
+    weights = array('f')
+    for term in vocabulary:
+        term_postings = postings[term]
+        idf = math.log(1 + (n_docs - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+        for doc_id, tf in term_postings:
+            norm = K1 * (1 - B + B * lengths[doc_id] / avg_length) if avg_length else K1
+            doc_ids.append(doc_id)
+            weights.append(idf * tf * (K1 + 1) / (tf + norm))
+        indptr.append(len(doc_ids))
+
+    meta = {
+        'format': INDEX_FORMAT_VERSION,
+        'partition': key,
+        'corpus_version': corpus_version,
+        'built_at': time.time(),
+        'vocabulary': vocabulary,
+        'docs': [list(doc) for doc in docs],
+        'nnz': len(doc_ids),
+    }
+    _atomic_write(
+        directory / BINARY_NAME.format(key),
+        lambda f: (indptr.tofile(f), doc_ids.tofile(f), weights.tofile(f)),
+    )
+    _atomic_write(
+        directory / META_NAME.format(key),
+        lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')),
+    )
+    return {'paragraphs': n_docs, 'terms': len(vocabulary), 'nnz': len(doc_ids)}
+
+
+def _remove_partition(directory, key):
+    for name in (META_NAME, BINARY_NAME):
+        try:
+            (directory / name.format(key)).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _atomic_write(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class BM25Index:
+    """אינדקס טעון של מחיצה אחת: המערכים ממופים לזיכרון ונקראים ישירות מהקובץ"""
+
+    def __init__(self, directory=None, key=NATIONAL):
+        directory = Path(directory or index_dir())
+        with open(directory / META_NAME.format(key), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format {meta.get('format')}")
+        self.key = key
+        self.corpus_version = meta['corpus_version']
+        self.docs = meta['docs']
+        self.term_ids = {term: i for i, term in enumerate(meta['vocabulary'])}
+
+        n_terms, nnz = len(self.term_ids), meta['nnz']
+        with open(directory / BINARY_NAME.format(key), 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if nnz else None
+        if self._mmap is None:
+            self.indptr, self.doc_ids, self.weights = [0] * (n_terms + 1), [], []
+            return
+        view = memoryview(self._mmap)
+        doc_ids_at = 8 * (n_terms + 1)
+        weights_at = doc_ids_at + 4 * nnz
+        self.indptr = view[:doc_ids_at].cast('q')
+        self.doc_ids = view[doc_ids_at:weights_at].cast('i')
+        self.weights = view[weights_at:weights_at + 4 * nnz].cast('f')
+
+    def __len__(self):
+        return len(self.docs)
+
+    def scores(self, query):
+        """ציון BM25 לכל פסקה שמכילה לפחות מונח אחד מהשאילתה"""
+        scores = {}
+        for term, count in Counter(tokenize(query)).items():
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            for position in range(self.indptr[term_id], self.indptr[term_id + 1]):
+                doc_id = self.doc_ids[position]
+                scores[doc_id] = scores.get(doc_id, 0.0) + count * self.weights[position]
+        return scores
+
+    def search(self, query, k=10, exclude_requirements=()):
+        """k הפסקאות המובילות: רשימת מילונים עם requirement_id, text, score"""
+        exclude = set(exclude_requirements)
+        ranked = heapq.nlargest(
+            k,
+            (item for item in self.scores(query).items() if self.docs[item[0]][0] not in exclude),
+            key=lambda item: item[1],
+        )
+        return [
+            {'requirement_id': self.docs[doc_id][0], 'text': self.docs[doc_id][1], 'score': round(score, 4)}
+            for doc_id, score in ranked
+        ]
+
+
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_index(jurisdiction_id=None):
+    """
+    האינדקס של מחיצה בתהליך הנוכחי; נטען מחדש רק אם הקובץ שלה נבנה מחדש.
+    None אם לא נבנה
+    """
+    key = _partition_key(jurisdiction_id)
+    meta_path = index_dir() / META_NAME.format(key)
+    try:
+        mtime = meta_path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    with _index_lock:
+        cached = _indexes.get(meta_path)
+        if cached is None or cached[0] != mtime:
+            cached = _indexes[meta_path] = (mtime, BM25Index(meta_path.parent, key))
+            logger.info("Retrieval index loaded", extra={
+                'partition': key, 'paragraphs': len(cached[1]), 'corpus_version': cached[1].corpus_version,
+            })
+        return cached[1]
+
+
+def search(query, k=10, exclude_requirements=(), jurisdiction_id=ALL_JURISDICTIONS):
+    """
+    חיפוש במחיצה של רשות והמחיצה הארצית, ומיזוג התוצאות
+
+    לכל מחיצה IDF משלה, ולכן ציוני BM25 גולמיים ממחיצות שונות אינם ברי
+    השוואה (מונח נדיר במחיצה קטנה מקבל משקל גבוה). לפני המיזוג כל ציון
+    מחולק בציון הגבוה ביותר של המחיצה שלו לאותה שאילתה, כך ש-score בתוצאה
+    הוא ציון יחסי בין 0 ל-1.
+
+    Args:
+        jurisdiction_id: רשות (None - ארצי בלבד, ALL_JURISDICTIONS - כל המחיצות)
+    """
+    if jurisdiction_id == ALL_JURISDICTIONS:
+        partitions = [_partition_id(key) for key in partition_keys()]
+    else:
+        partitions = [None] if jurisdiction_id is None else [None, jurisdiction_id]
+    hits = []
+    for partition_id in partitions:
+        index = get_index(partition_id)
+        if index is None:
+            continue
+        partition_hits = index.search(query, k=k, exclude_requirements=exclude_requirements)
+        top = partition_hits[0]['score'] if partition_hits else 0
+        for hit in partition_hits:
+            hit['score'] = round(hit['score'] / top, 4) if top > 0 else 0.0
+        hits.extend(partition_hits)
+    return heapq.nlargest(k, hits, key=lambda hit: hit['score'])
+
+
+def stale_partitions(directory=None):
+    """
+    המחיצות שהאינדקס שלהן חסר או ישן מגרסת המחיצה במאגר (מזהי רשויות,
+    None - הארצית)
+    """
+    from questionnaire.corpus import jurisdiction_version
+    from questionnaire.models import Jurisdiction, LicensingRequirement
+
+    directory = Path(directory or index_dir())
+    built = {}
+    for key in partition_keys(directory):
+        with open(directory / META_NAME.format(key), encoding='utf-8') as f:
+            built[_partition_id(key)] = json.load(f).get('corpus_version')
+    candidates = {None, *Jurisdiction.objects.values_list('pk', flat=True)}
+    # רשות שנמחקה - האינדקס שלה צריך להימחק
+    candidates |= set(built)
+    stale = []
+    for jurisdiction_id in candidates:
+        has_requirements = LicensingRequirement.objects.filter(jurisdiction=jurisdiction_id).exists()
+        if jurisdiction_id not in built:
+            if has_requirements:
+                stale.append(jurisdiction_id)
+        elif built[jurisdiction_id] != jurisdiction_version(jurisdiction_id) or not has_requirements:
+            stale.append(jurisdiction_id)
+    return stale
+
+
+def profile_query(business_data):
+    """שאילתת חיפוש מפרופיל העסק"""
+    parts = [business_data.get('business_type', '')]
+    parts.extend(terms for field, terms in FEATURE_TERMS.items() if business_data.get(field))
+    return ' '.join(part for part in parts if part)
+
+
+def retrieve_context(business_data, exclude_requirements=(), k=None, token_budget=None):
+    """
+    הפסקאות הרלוונטיות ביותר לפרופיל, עד k פסקאות ובמסגרת תקציב ה-tokens.
+    דרישות שכבר נכללות בהודעה מוחרגות.
+    """
+    k = k or getattr(settings, 'RETRIEVAL_TOP_K', 8)
+    token_budget = token_budget or getattr(settings, 'RETRIEVAL_TOKEN_BUDGET', 1200)
+
+    selected, used = [], 0
+    hits = search(
+        profile_query(business_data),
+        k=k,
+        exclude_requirements=exclude_requirements,
+        jurisdiction_id=business_data.get('jurisdiction_id', ALL_JURISDICTIONS),
+    )
+    for hit in hits:
+        cost = estimate_tokens(hit['text'])
+        if used + cost > token_budget:
+            continue
+        selected.append(hit)
+        used += cost
+    return selected
@@ -0,0 +1,113 @@
+"""
+איחוד בקשות זהות שבביצוע לקריאה יוצאת אחת (single-flight)
+
+הבקשה הראשונה למפתח לוקחת lease - שורה ב-InFlightCall עם אילוץ ייחודיות
+על המפתח - ומבצעת את הקריאה. בקשות זהות (גם מתהליכים אחרים) ממתינות עד
+שהשורה מסומנת כהסתיימה וקוראות ממנה את התוצאה. lease שפג תוקפו (תהליך
+שנפל) נלקח מחדש על ידי הממתין הבא; כישלון של המבצע מוחק את השורה, כך
+שאחד הממתינים מנסה בעצמו.
+"""
+import hashlib
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from questionnaire.models import InFlightCall
+
+from .admission import record
+from .ai_service import business_data_from_assessment
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.25
+# שורות שפג תוקפן נמחקות אחרי שעה (בעת לקיחת lease חדש)
+CLEANUP_AFTER = 60 * 60
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def report_key(assessment, requirements, corpus_version):
+    """מפתח לדוח: פרופיל העסק, קבוצת הדרישות וגרסת המאגר"""
+    payload = {
+        'profile': business_data_from_assessment(assessment),
+        'requirements': sorted(req.pk for req in requirements),
+        'corpus_version': corpus_version,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _acquire(key, owner, lease_seconds):
+    """ניסיון לקחת את ה-lease: שורה חדשה, או שורה שפג תוקפה"""
+    now = time.time()
+    taken = InFlightCall.objects.filter(key=key, expires_at__lt=now).update(
+        status='running', owner=owner, result='', expires_at=now + lease_seconds
+    )
+    if taken:
+        return True
+    try:
+        with transaction.atomic():
+            InFlightCall.objects.create(
+                key=key, status='running', owner=owner, result='', expires_at=now + lease_seconds
+            )
+    except IntegrityError:
+        return False
+    InFlightCall.objects.filter(expires_at__lt=now - CLEANUP_AFTER).delete()
+    return True
+
+
+def _lead(key, owner, compute):
+    try:
+        result = compute()
+    except BaseException:
+        InFlightCall.objects.filter(key=key, owner=owner).delete()
+        raise
+    InFlightCall.objects.filter(key=key, owner=owner).update(
+        status='done', result=result, expires_at=time.time() + _setting('SINGLE_FLIGHT_RESULT_SECONDS', 60)
+    )
+    return result
+
+
+def run(key, compute):
+    """
+    הפעלת compute פעם אחת לכל המבקשים של אותו מפתח
+
+    Args:
+        compute: פונקציה ללא ארגומנטים שמחזירה טקסט
+    """
+    owner = uuid.uuid4().hex
+    lease_seconds = _setting('SINGLE_FLIGHT_LEASE_SECONDS', 180)
+    deadline = time.monotonic() + _setting('SINGLE_FLIGHT_WAIT_SECONDS', 150)
+    waited = False
+    while True:
+        if _acquire(key, owner, lease_seconds):
+            return _lead(key, owner, compute)
+        row = InFlightCall.objects.filter(key=key, status='done').values_list('result', flat=True).first()
+        if row is not None:
+            record('coalesced')
+            logger.info("Coalesced identical submission", extra={'key': key[:12], 'waited': waited})
+            return row
+        if time.monotonic() >= deadline:
+            logger.warning("Gave up waiting for in-flight call", extra={'key': key[:12]})
+            return compute()
+        waited = True
+        time.sleep(POLL_INTERVAL)
+
+
+def wait_for(probe, timeout=None, interval=POLL_INTERVAL):
+    """המתנה עד ש-probe מחזיר ערך שאינו None, או None בתום הזמן"""
+    if timeout is None:
+        timeout = _setting('SINGLE_FLIGHT_WAIT_SECONDS', 150)
+    deadline = time.monotonic() + timeout
+    while True:
+        value = probe()
+        if value is not None or time.monotonic() >= deadline:
+            return value
+        time.sleep(interval)
+
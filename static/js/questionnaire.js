@@ -44,6 +44,7 @@ function setupEventListeners() {
             // Update hidden input
             document.getElementById('businessType').value = this.dataset.value;
             formData.business_type = this.dataset.value;
+            schedulePreview();
         });
     });
     
@@ -63,6 +64,7 @@ function setupEventListeners() {
                 document.getElementById(feature).value = 'true';
                 formData.features[feature] = true;
             }
+            schedulePreview();
         });
     });
     
@@ -73,11 +75,95 @@ function setupEventListeners() {
     
     document.getElementById('areaSize').addEventListener('input', function() {
         formData.area_sqm = this.value;
+        schedulePreview();
     });
     
     document.getElementById('seatingCapacity').addEventListener('input', function() {
         formData.seating_capacity = this.value;
+        schedulePreview();
     });
+    
+    const jurisdictionSelect = document.getElementById('jurisdiction');
+    if (jurisdictionSelect) {
+        jurisdictionSelect.addEventListener('change', function() {
+            formData.jurisdiction = this.value;
+            schedulePreview();
+        });
+    }
+}
+
+// Live requirements preview (debounced)
+const PREVIEW_DELAY_MS = 300;
+let previewTimer = null;
+let previewController = null;
+let lastPreviewQuery = '';
+
+const priorityNames = { high: 'גבוהה', medium: 'בינונית', low: 'נמוכה' };
+const categoryNames = {
+    restaurant: 'מסעדה', bar: 'בר', health: 'בריאות',
+    safety: 'בטיחות', municipal: 'עירונית', general: 'כללי'
+};
+
+function schedulePreview() {
+    clearTimeout(previewTimer);
+    previewTimer = setTimeout(fetchPreview, PREVIEW_DELAY_MS);
+}
+
+function fetchPreview() {
+    const container = document.getElementById('requirementsPreview');
+    if (!container || !formData.business_type) {
+        return;
+    }
+    
+    const params = new URLSearchParams({ business_type: formData.business_type });
+    if (formData.area_sqm) params.set('area', formData.area_sqm);
+    if (formData.seating_capacity) params.set('capacity', formData.seating_capacity);
+    if (formData.jurisdiction) params.set('jurisdiction', formData.jurisdiction);
+    Object.keys(formData.features).forEach(key => {
+        if (formData.features[key]) params.set(key, 'true');
+    });
+    
+    const query = params.toString();
+    if (query === lastPreviewQuery) {
+        return;
+    }
+    lastPreviewQuery = query;
+    
+    // Cancel a preview request that is still in flight
+    if (previewController) {
+        previewController.abort();
+    }
+    previewController = new AbortController();
+    
+    fetch(`${container.dataset.url}?${query}`, { signal: previewController.signal })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                renderPreview(data);
+            }
+        })
+        .catch(error => {
+            if (error.name !== 'AbortError') {
+                lastPreviewQuery = '';
+            }
+        });
+}
+
+function renderPreview(data) {
+    const container = document.getElementById('requirementsPreview');
+    document.getElementById('previewTotal').textContent = data.total;
+    
+    const priorities = Object.keys(priorityNames)
+        .filter(key => data.by_priority[key])
+        .map(key => `עדיפות ${priorityNames[key]}: ${data.by_priority[key]}`);
+    const categories = Object.keys(data.by_category)
+        .map(key => `${categoryNames[key] || key}: ${data.by_category[key]}`);
+    
+    document.getElementById('previewBreakdown').innerHTML = `
+        ${priorities.length ? `<div>${priorities.join(' | ')}</div>` : ''}
+        ${categories.length ? `<div>${categories.join(' | ')}</div>` : ''}
+    `;
+    container.style.display = 'block';
 }
 
 function changeStep(direction) {